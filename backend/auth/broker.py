@@ -1,6 +1,7 @@
-import os, msal, struct
-from typing import List
+import os, msal, struct, threading, time
+from typing import List, Tuple
 from settings import settings
+from sql.metrics import phase
 
 AUTHORITY = f"https://login.microsoftonline.com/{settings.tenant_id}"
 
@@ -18,11 +19,21 @@ class TokenBroker:
         self.cache = msal.SerializableTokenCache()
         if os.path.exists(cache_path):
             self.cache.deserialize(open(cache_path, "r").read())
-        self.app = msal.PublicClientApplication(
-            client_id=settings.client_id,
-            authority=AUTHORITY,
-            token_cache=self.cache,
-        )
+        self._app = None
+        self._lock = threading.Lock()
+
+    @property
+    def app(self) -> msal.PublicClientApplication:
+        # Built on first use: the constructor does tenant discovery over the network,
+        # which importing this module (SQL_BACKEND=local, benchmarks) must not need.
+        with self._lock:
+            if self._app is None:
+                self._app = msal.PublicClientApplication(
+                    client_id=settings.client_id,
+                    authority=AUTHORITY,
+                    token_cache=self.cache,
+                )
+            return self._app
 
     def _persist(self):
         if self.cache.has_state_changed:
@@ -30,6 +41,10 @@ class TokenBroker:
                 f.write(self.cache.serialize())
 
     def token(self, scopes: List[str]) -> str:
+        return self.token_with_expiry(scopes)[0]
+
+    def token_with_expiry(self, scopes: List[str]) -> Tuple[str, float]:
+        """Return (access_token, expires_at) where expires_at is an epoch timestamp."""
         accounts = self.app.get_accounts()
         acct = accounts[0] if accounts else None
         result = self.app.acquire_token_silent(scopes, account=acct)
@@ -43,14 +58,20 @@ class TokenBroker:
         if "access_token" not in result:
             raise RuntimeError(f"Auth failed for scopes {scopes}: {result}")
         self._persist()
-        return result["access_token"]
+        expires_at = time.time() + int(result.get("expires_in") or 3600)
+        return result["access_token"], expires_at
 
 broker = TokenBroker(settings.token_cache_path)
 
-def sql_access_token_buffer() -> bytes:
+def sql_access_token() -> Tuple[bytes, float]:
     """
     msodbcsql expects a UTF-16-LE access token prefixed by a 4-byte little-endian length.
+    Returns (token_buffer, expires_at) so pooled connections can be recycled before expiry.
     """
-    token = broker.token([SQL_SCOPE])              # raw JWT string
+    with phase("token"):
+        token, expires_at = broker.token_with_expiry([SQL_SCOPE])  # raw JWT string
     tb = token.encode("utf-16-le")                 # UTF-16-LE
-    return struct.pack("<I", len(tb)) + tb         # length prefix + bytes
+    return struct.pack("<I", len(tb)) + tb, expires_at  # length prefix + bytes
+
+def sql_access_token_buffer() -> bytes:
+    return sql_access_token()[0]
@@ -0,0 +1,276 @@
+# backend/benchmarks/query_path.py
+"""
+Throughput and latency of the SQL query path, against the local stand-in.
+
+    cd backend
+    python -m benchmarks.query_path
+    python -m benchmarks.query_path --scenario query-cold agent --requests 500 --concurrency 32
+    SQL_LOCAL_LATENCY_MS=60 SQL_LOCAL_ROWS_PER_SECOND=200000 python -m benchmarks.query_path --json
+    python -m benchmarks.query_path --smoke      # every scenario, a few requests; exits 1 on any error
+
+Everything runs in one process. HTTP scenarios go through the FastAPI app over
+httpx's ASGI transport, which covers middleware, routing, validation and JSON
+encoding but opens no sockets. The agent scenario calls sql_select_tool directly.
+SQL_BACKEND is forced to "local" (sql/standin.py; shape it with the SQL_LOCAL_*
+settings), so no Azure sign-in or network access is needed. The catalog is a temporary SQLite file holding one workspace and one
+endpoint. Each simulated client sends its own X-Session-Id, the way separate users
+would. The agent tool normally resolves workspace and database names through the
+Fabric REST API; here that lookup is replaced by the catalog row.
+
+Scenarios:
+    query-cold     POST /query, a different statement every time, result cache bypassed
+    query-cached   POST /query, five statements repeated (cache and single-flight hits)
+    query-wide     POST /query returning 5,000 order lines (fetch and JSON encoding)
+    introspect     POST /introspect/refresh (schemata, tables and columns, written to the catalog);
+                   one at a time, since concurrent refreshes of one database contend on the catalog
+    agent          sql_select_tool
+
+For each scenario the report has requests/s, latency percentiles, p50 per query
+phase from sql/metrics.py, and how many connections the pool opened versus reused.
+Read it this way:
+- "opened" climbing with load means connections are not being reused;
+- encode or fetch time moving means serialization changed;
+- query-cached drifting towards query-cold means the cache stopped hitting.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_TMP = tempfile.mkdtemp(prefix="fabric-explorer-bench-")
+os.environ["SQL_BACKEND"] = "local"
+os.environ["CATALOG_DB_URL"] = f"sqlite+aiosqlite:///{_TMP}/catalog.db"
+os.environ["SQL_HISTORY_ENABLED"] = "false"
+for _key, _value in {"TENANT_ID": "benchmark", "CLIENT_ID": "benchmark", "AZURE_OPENAI_API_KEY": "unused",
+                     "AZURE_OPENAI_ENDPOINT_BASE": "https://example.invalid"}.items():
+    os.environ.setdefault(_key, _value)
+
+import anyio     # noqa: E402
+import httpx     # noqa: E402
+
+from catalog.db import AsyncSessionLocal, init_db     # noqa: E402
+from catalog.models import SqlEndpoint, Workspace     # noqa: E402
+from main import app     # noqa: E402
+from routers import agent_graph     # noqa: E402
+from sql.cache import result_cache     # noqa: E402
+from sql.metrics import metrics     # noqa: E402
+from sql.odbc import get_backend     # noqa: E402
+from sql.pool import pool_stats     # noqa: E402
+
+WORKSPACE_ID = "00000000-0000-0000-0000-00000000be0c"
+DATABASE_ID = "00000000-0000-0000-0000-00000000db01"
+DATABASE_NAME = "AdventureWorksLT"
+BASE = f"/workspaces/{WORKSPACE_ID}/sqldb/{DATABASE_ID}"
+
+CACHED_STATEMENTS = [
+    "SELECT TOP (100) * FROM SalesLT.Product ORDER BY ListPrice DESC",
+    "SELECT CustomerID, COUNT(*) AS orders, SUM(TotalDue) AS total FROM SalesLT.SalesOrderHeader GROUP BY CustomerID",
+    "SELECT TOP (200) * FROM SalesLT.Customer ORDER BY LastName",
+    "SELECT p.Name, SUM(d.LineTotal) AS revenue FROM SalesLT.SalesOrderDetail d "
+    "JOIN SalesLT.Product p ON p.ProductID = d.ProductID GROUP BY p.Name",
+    "SELECT ShipMethod, COUNT(*) AS orders FROM SalesLT.SalesOrderHeader GROUP BY ShipMethod",
+]
+
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int
+    concurrency: int
+    seconds: float
+    latencies: List[float]
+    errors: int
+    phases: Dict[str, float] = field(default_factory=dict)
+    pool: Dict[str, int] = field(default_factory=dict)
+    first_error: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies)
+
+        def pct(q: float) -> Optional[float]:
+            return round(1000 * lat[min(len(lat) - 1, int(q * len(lat)))], 2) if lat else None
+
+        return {
+            "scenario": self.scenario,
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+            "rps": round(self.requests / self.seconds, 1) if self.seconds else None,
+            "p50_ms": pct(0.5),
+            "p90_ms": pct(0.9),
+            "p99_ms": pct(0.99),
+            "max_ms": round(1000 * lat[-1], 2) if lat else None,
+            "phase_p50_ms": self.phases,
+            "pool": self.pool,
+            "first_error": self.first_error,
+        }
+
+
+# ---------- setup ----------
+
+async def _seed_catalog() -> None:
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        if await session.get(SqlEndpoint, DATABASE_ID) is None:
+            session.add(Workspace(id=WORKSPACE_ID, name="Benchmark", state="active"))
+            session.add(SqlEndpoint(database_id=DATABASE_ID, workspace_id=WORKSPACE_ID, kind="SqlDatabase",
+                                    name=DATABASE_NAME, server="local", database=DATABASE_NAME, port=1433))
+            await session.commit()
+
+
+async def _resolve_workspace(workspace: Optional[str]):
+    return (WORKSPACE_ID, "Benchmark") if workspace == WORKSPACE_ID else None
+
+
+async def _resolve_database_in_workspace(workspace: str, database: str):
+    return (DATABASE_ID, DATABASE_NAME) if database == DATABASE_ID else None
+
+
+def _pool_counters() -> Dict[str, int]:
+    totals = {"opened": 0, "reused": 0, "timeouts": 0}
+    for p in pool_stats():
+        for k in totals:
+            totals[k] += int(p.get(k, 0))
+    return totals
+
+
+def _phase_p50(caller: str) -> Dict[str, float]:
+    out = {}
+    for h in metrics.summary()["histograms"]:
+        if h["caller"] == caller and h["p50_ms"] is not None:
+            out[h["phase"]] = h["p50_ms"]
+    return out
+
+
+# ---------- scenarios ----------
+
+Call = Callable[[int, int], Awaitable[Optional[str]]]      # (request index, client index) -> error or None
+
+
+def _http_post(client: httpx.AsyncClient, path: str, body: Callable[[int], Optional[dict]]) -> Call:
+    async def call(i: int, w: int) -> Optional[str]:
+        r = await client.post(path, json=body(i), headers={"X-Session-Id": f"bench-{w}"})
+        return None if r.status_code == 200 else f"HTTP {r.status_code}: {r.text[:200]}"
+    return call
+
+
+async def _agent_call(i: int, w: int) -> Optional[str]:
+    # Half repeated statements (cache hits), half distinct lookups.
+    sql = CACHED_STATEMENTS[i % len(CACHED_STATEMENTS)] if i % 2 else (
+        f"SELECT TOP (50) SalesOrderID, OrderDate, TotalDue FROM SalesLT.SalesOrderHeader "
+        f"WHERE CustomerID = {1 + i % 800} ORDER BY OrderDate DESC")
+    out = json.loads(await agent_graph.sql_select_tool.ainvoke(
+        {"workspace_id": WORKSPACE_ID, "database_id": DATABASE_ID, "sql": sql}))
+    return out.get("error") if isinstance(out, dict) else None
+
+
+def scenarios(client: httpx.AsyncClient) -> Dict[str, tuple]:
+    """name -> (call, executor caller whose phases are reported, concurrency cap)."""
+    return {
+        "query-cold": (_http_post(client, f"{BASE}/query", lambda i: {
+            "sql": f"SELECT TOP (50) * FROM SalesLT.SalesOrderHeader WHERE SalesOrderID >= {71774 + i} "
+                   f"ORDER BY SalesOrderID",
+            "cache": False}), "query", None),
+        "query-cached": (_http_post(client, f"{BASE}/query", lambda i: {
+            "sql": CACHED_STATEMENTS[i % len(CACHED_STATEMENTS)]}), "query", None),
+        "query-wide": (_http_post(client, f"{BASE}/query", lambda i: {
+            "sql": "SELECT TOP (5000) * FROM SalesLT.SalesOrderDetail", "maxRows": 5000,
+            "cache": False}), "query", None),
+        "introspect": (_http_post(client, f"{BASE}/introspect/refresh", lambda i: None), "introspect", 1),
+        "agent": (_agent_call, "agent", None),
+    }
+
+
+async def drive(name: str, call: Call, caller: str, requests: int, concurrency: int, warmup: int) -> Result:
+    result_cache.clear()
+    for i in range(warmup):
+        await call(requests + i, 0)
+    metrics.reset()
+    pool_before = _pool_counters()
+    pending = iter(range(requests))
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def client(w: int) -> None:
+        for i in pending:           # shared by all clients: each index is taken once
+            started = time.perf_counter()
+            try:
+                error = await call(i, w)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            latencies.append(time.perf_counter() - started)
+            if error:
+                errors.append(error.splitlines()[0])
+
+    started = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for w in range(concurrency):
+            tg.start_soon(client, w)
+    seconds = time.perf_counter() - started
+    pool_after = _pool_counters()
+    return Result(
+        scenario=name, requests=requests, concurrency=concurrency, seconds=seconds, latencies=latencies,
+        errors=len(errors), phases=_phase_p50(caller),
+        pool={k: pool_after[k] - pool_before[k] for k in pool_after},
+        first_error=errors[0] if errors else None,
+    )
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"backend: {get_backend().driver()}")
+    header = (f"{'scenario':<14}{'reqs':>7}{'conc':>6}{'errors':>8}{'req/s':>9}"
+              f"{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'opened':>8}{'reused':>8}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<14}{r['requests']:>7}{r['concurrency']:>6}{r['errors']:>8}{r['rps']:>9}"
+              f"{r['p50_ms']:>9}{r['p90_ms']:>9}{r['p99_ms']:>9}{r['max_ms']:>9}"
+              f"{r['pool']['opened']:>8}{r['pool']['reused']:>8}")
+        phases = ", ".join(f"{k} {v}" for k, v in sorted(r["phase_p50_ms"].items()))
+        print(f"{'':<14}phase p50 ms: {phases or '-'}")
+        if r["first_error"]:
+            print(f"{'':<14}first error: {r['first_error']}")
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    names = ["query-cold", "query-cached", "query-wide", "introspect", "agent"]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", nargs="+", choices=names, default=names)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Simulated clients, each with its own session")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests run first per scenario")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--smoke", action="store_true",
+                        help="Quick check that every scenario runs: 10 requests, 2 clients, 1 warmup")
+    args = parser.parse_args(argv)
+    if args.smoke:
+        args.requests, args.concurrency, args.warmup = 10, 2, 1
+
+    await _seed_catalog()
+    agent_graph._resolve_workspace = _resolve_workspace
+    agent_graph._resolve_database_in_workspace = _resolve_database_in_workspace
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark",
+                                 timeout=300) as client:
+        table = scenarios(client)
+        for name in args.scenario:
+            call, caller, cap = table[name]
+            r = await drive(name, call, caller, args.requests, min(args.concurrency, cap or args.concurrency),
+                            args.warmup)
+            results.append(r.summary())
+
+    if args.json:
+        print(json.dumps({"backend": get_backend().driver(), "results": results}, indent=2))
+    else:
+        _print_table(results)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,151 @@
+# backend/catalog/history.py
+"""
+Query history.
+
+Every published QueryTiming (sql/metrics.py) becomes one QueryHistory row. The
+metrics listener only appends to an in-memory buffer; a background task writes
+the buffer to the catalog DB in batches every SQL_HISTORY_FLUSH_INTERVAL seconds,
+so no request waits on the catalog. If the writer falls behind, the oldest
+buffered records are dropped (and counted) rather than growing without bound.
+
+Statements are grouped by fingerprint: the SQL with comments, whitespace and
+literals normalized away, so `WHERE id = 1` and `WHERE id = 2` aggregate together.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlmodel import delete
+
+from catalog.db import AsyncSessionLocal
+from catalog.models import QueryHistory
+from settings import settings
+from sql.metrics import QueryTiming, metrics
+from sql.rewrite import tokenize, strip_trailing_semicolons
+
+log = logging.getLogger(__name__)
+
+_PURGE_EVERY = 3600.0
+
+
+def normalize_for_fingerprint(sql: str) -> str:
+    """Literals become ?, lists of them collapse to one, keywords and identifiers are upper-cased."""
+    out: List[str] = []
+    for t in tokenize(strip_trailing_semicolons(sql)):
+        text = "?" if t.kind in ("string", "number") else t.text.upper() if t.kind == "word" else t.text
+        if text == "?" and len(out) >= 2 and out[-1] == "," and out[-2] == "?":
+            out.pop()                   # IN (1, 2, 3) and IN (1) share a fingerprint
+            continue
+        out.append(text)
+    return " ".join(out)
+
+
+def fingerprint_sql(sql: str) -> str:
+    return hashlib.sha1(normalize_for_fingerprint(sql).encode("utf-8")).hexdigest()[:16]
+
+
+def _ms(t: QueryTiming, name: str) -> Optional[float]:
+    v = t.phases.get(name)
+    return round(v * 1000, 2) if v is not None else None
+
+
+class HistoryWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, t: QueryTiming) -> None:
+        """Metrics listener: snapshot the record; never blocks on I/O."""
+        sql = t.sql or ""
+        row = {
+            "fingerprint": fingerprint_sql(sql) if sql else "-",
+            "database_id": t.database_id,
+            "caller": t.caller,
+            "sql_text": sql[: settings.sql_history_max_sql_chars] or None,
+            "executed_at": datetime.now(timezone.utc).isoformat(),
+            "ok": t.ok,
+            "error": t.error,
+            "cache_hit": t.cache_hit,
+            "rows": t.rows,
+            "bytes": t.bytes,
+            "total_ms": _ms(t, "total") or 0.0,
+            **{f"{p}_ms": _ms(t, p)
+               for p in ("plan", "queue", "checkout", "token", "connect", "execute", "fetch", "encode")},
+        }
+        with self._lock:
+            if len(self._pending) >= settings.sql_history_max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(row)
+
+    def _take(self, n: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._pending.popleft() for _ in range(min(n, len(self._pending)))]
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        total = 0
+        while True:
+            batch = self._take(settings.sql_history_batch_size)
+            if not batch:
+                return total
+            try:
+                async with AsyncSessionLocal() as session:
+                    session.add_all([QueryHistory(**r) for r in batch])
+                    await session.commit()
+            except Exception as e:
+                self.failed += len(batch)
+                log.warning("Dropped %s query history records: %s", len(batch), e)
+                return total
+            self.written += len(batch)
+            total += len(batch)
+
+    async def purge_expired(self) -> None:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=settings.sql_history_retention_days)).isoformat()
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(QueryHistory).where(QueryHistory.executed_at < cutoff))
+            await session.commit()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.sql_history_flush_interval)
+            await self.flush()
+            if time.monotonic() - self._last_purge > _PURGE_EVERY:
+                self._last_purge = time.monotonic()
+                try:
+                    await self.purge_expired()
+                except Exception as e:
+                    log.warning("Query history purge failed: %s", e)
+
+    def start(self) -> None:
+        if not settings.sql_history_enabled or self._task is not None:
+            return
+        metrics.add_listener(self.submit)
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        metrics.remove_listener(self.submit)
+        self._task.cancel()
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {"enabled": self._task is not None, "pending": pending, "written": self.written,
+                "dropped": self.dropped, "failed": self.failed}
+
+
+history_writer = HistoryWriter()
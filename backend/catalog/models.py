@@ -48,6 +48,17 @@ class Table(SQLModel, table=True):
     last_modified: Optional[str] = None
     sampled_at: Optional[str] = None
 
+class TablePreview(SQLModel, table=True):
+    workspace_id: str = Field(primary_key=True)
+    database_id: str = Field(primary_key=True)
+    schema_name: str = Field(primary_key=True)
+    table_name: str = Field(primary_key=True)
+    row_limit: int = 0                                 # TOP (n) the preview was taken with
+    columns_json: str = "[]"
+    rows_json: str = "[]"
+    elapsed_ms: Optional[float] = None
+    sampled_at: Optional[str] = None
+
 class Column(SQLModel, table=True):
     workspace_id: str = Field(primary_key=True)
     database_id: str = Field(primary_key=True)
@@ -61,3 +72,25 @@ class Column(SQLModel, table=True):
     numeric_precision: Optional[int] = None
     numeric_scale: Optional[int] = None
     sampled_at: Optional[str] = None
+
+class QueryHistory(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    fingerprint: str = Field(index=True)               # hash of the SQL with literals stripped
+    database_id: str = Field(index=True)
+    caller: str                                        # query | agent | introspect | export | job | ...
+    sql_text: Optional[str] = None                     # first SQL_HISTORY_MAX_SQL_CHARS characters
+    executed_at: str = Field(index=True)
+    ok: bool = True
+    error: Optional[str] = None
+    cache_hit: bool = False
+    rows: int = 0
+    bytes: int = 0
+    total_ms: float = 0.0
+    plan_ms: Optional[float] = None
+    queue_ms: Optional[float] = None
+    checkout_ms: Optional[float] = None
+    token_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    execute_ms: Optional[float] = None
+    fetch_ms: Optional[float] = None
+    encode_ms: Optional[float] = None
@@ -0,0 +1,89 @@
+# backend/catalog/preview.py
+"""
+Cached table previews.
+
+A preview is the first N rows of a table, stored as JSON in a TablePreview row
+next to the table's catalog row. Reads are served from the catalog; once a preview
+is older than SQL_PREVIEW_STALE_AFTER it is still returned, and a refresh is
+started in the background. There is at most one refresh per table at a time, and
+a request that has to wait for rows joins the running refresh instead of starting
+another one.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from catalog.db import AsyncSessionLocal
+from catalog.models import TablePreview
+from settings import settings
+from sql.encoding import dumps, encode_rows
+from sql.odbc import fetch_preview
+
+log = logging.getLogger(__name__)
+
+PreviewKey = Tuple[str, str, str, str]     # workspace_id, database_id, schema, table
+
+
+def preview_payload(p: TablePreview) -> Dict[str, Any]:
+    return {
+        "columns": json.loads(p.columns_json),
+        "rows": json.loads(p.rows_json),
+        "rowLimit": p.row_limit,
+        "sampledAt": p.sampled_at,
+        "elapsedMs": p.elapsed_ms,
+    }
+
+
+def is_stale(p: TablePreview) -> bool:
+    if not p.sampled_at:
+        return True
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(p.sampled_at)
+    return age.total_seconds() > settings.sql_preview_stale_after
+
+
+async def _refresh(key: PreviewKey, server: str, database: str, port: int, rows: int) -> Dict[str, Any]:
+    workspace_id, database_id, schema, table = key
+    started = time.perf_counter()
+    cols, data = await fetch_preview(server, database, port, schema, table, rows, database_id=database_id)
+    async with AsyncSessionLocal() as session:
+        obj = await session.get(TablePreview, key)
+        if obj is None:
+            obj = TablePreview(workspace_id=workspace_id, database_id=database_id,
+                               schema_name=schema, table_name=table)
+        obj.row_limit = rows
+        obj.columns_json = json.dumps(cols)
+        obj.rows_json = dumps(encode_rows(data[:rows]))
+        obj.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        obj.sampled_at = datetime.now(timezone.utc).isoformat()
+        session.add(obj)
+        await session.commit()
+        return preview_payload(obj)
+
+
+class PreviewRefresher:
+    def __init__(self):
+        self._inflight: Dict[PreviewKey, asyncio.Task] = {}
+
+    def refresh(self, key: PreviewKey, server: str, database: str, port: int, rows: int) -> asyncio.Task:
+        """The running refresh for `key`, or a new one. Safe to drop: failures are logged."""
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+        task = asyncio.create_task(_refresh(key, server, database, port, rows))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key: PreviewKey, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("Preview refresh for %s.%s failed: %s", key[2], key[3], task.exception())
+
+    def running(self, key: PreviewKey) -> bool:
+        return key in self._inflight
+
+
+preview_refresher = PreviewRefresher()
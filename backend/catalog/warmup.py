@@ -0,0 +1,272 @@
+# backend/catalog/warmup.py
+"""
+Connection warm-up.
+
+Opening a Fabric SQL connection (token, TLS, login) takes seconds, and the pool
+closes connections that sit idle longer than SQL_POOL_IDLE_TIMEOUT, so the first
+query after a quiet spell pays for a fresh login. The warmer keeps one pooled
+connection open for each endpoint that is actually in use:
+
+- the warm set is the SQL_WARMUP_MAX_ENDPOINTS SqlEndpoint rows used most
+  recently (within SQL_WARMUP_RECENT_HOURS). Query history seeds it at startup;
+  a metrics listener keeps it current afterwards;
+- the first round runs at startup and opens a connection per endpoint; later
+  rounds, every SQL_WARMUP_INTERVAL seconds, ping endpoints with SELECT 1
+  through the pool, which resets the connection's idle clock. Endpoints that
+  served a query since the last round are already warm and are skipped;
+- pings run in the "probe" executor lane and are skipped when the host's pool is
+  fully checked out, so they never take a slot from real work;
+- an endpoint whose workspace is inactive or that has no connection info is not
+  contacted. One that fails (paused capacity, login errors) is retried after an
+  exponential backoff capped at SQL_WARMUP_MAX_BACKOFF.
+"""
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import anyio
+from sqlalchemy import func
+from sqlmodel import select
+
+from catalog.db import AsyncSessionLocal
+from catalog.models import QueryHistory, SqlEndpoint, Workspace
+from settings import settings
+from sql.executor import QueueTimeout, executor
+from sql.metrics import QueryTiming, metrics
+from sql.odbc import pooled_connection
+from sql.pool import pool_stats
+
+log = logging.getLogger(__name__)
+
+WARMUP_CALLER = "probe"
+PAUSED_HINTS = ("capacity", "paused", "inactive", "suspended", "unavailable")
+_MAX_TRACKED = 1000
+
+
+@dataclass
+class WarmEndpoint:
+    database_id: str
+    server: Optional[str]
+    database: Optional[str]
+    port: int
+    workspace_state: Optional[str] = None
+    state: str = "pending"          # pending | warm | backoff | paused | no-connection-info
+    failures: int = 0
+    next_attempt: float = 0.0       # monotonic
+    pings: int = 0
+    last_ping_at: Optional[str] = None
+    last_ping_ms: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def stats(self, last_used: Optional[float]) -> Dict[str, Any]:
+        return {
+            "database_id": self.database_id,
+            "server": self.server,
+            "database": self.database,
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in_s": round(max(0.0, self.next_attempt - time.monotonic()), 1),
+            "pings": self.pings,
+            "last_ping_at": self.last_ping_at,
+            "last_ping_ms": self.last_ping_ms,
+            "last_used_at": datetime.fromtimestamp(last_used, timezone.utc).isoformat() if last_used else None,
+            "last_error": self.last_error,
+        }
+
+
+def _pool_saturated(server: str, port: int) -> bool:
+    for p in pool_stats():
+        if p["server"] == server and p["port"] == port:
+            return p["in_use"] >= p["max_size"]
+    return False
+
+
+def _epoch(iso: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(iso).timestamp() if iso else 0.0
+    except ValueError:
+        return 0.0
+
+
+class ConnectionWarmer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[str, float] = {}          # database_id -> wall-clock time of the last successful query
+        self._endpoints: Dict[str, WarmEndpoint] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started_at = 0.0
+        self.rounds = 0
+        self.last_round_at: Optional[str] = None
+
+    # ---------- usage ----------
+
+    def note_usage(self, t: QueryTiming) -> None:
+        """Metrics listener: remember when each endpoint last served a query."""
+        if not t.ok or not t.database_id:
+            return
+        with self._lock:
+            self._usage[t.database_id] = time.time()
+            if len(self._usage) > _MAX_TRACKED:
+                for key, _ in sorted(self._usage.items(), key=lambda kv: kv[1])[: _MAX_TRACKED // 2]:
+                    del self._usage[key]
+
+    def _last_used(self, database_id: str) -> float:
+        with self._lock:
+            return self._usage.get(database_id, 0.0)
+
+    async def _seed_from_history(self) -> None:
+        since = (datetime.now(timezone.utc) - timedelta(hours=settings.sql_warmup_recent_hours)).isoformat()
+        stmt = (
+            select(QueryHistory.database_id, func.max(QueryHistory.executed_at))
+            .where(QueryHistory.executed_at >= since, QueryHistory.ok == True)     # noqa: E712
+            .group_by(QueryHistory.database_id)
+        )
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(stmt)).all()
+        with self._lock:
+            for database_id, executed_at in rows:
+                if database_id:
+                    self._usage[database_id] = max(self._usage.get(database_id, 0.0), _epoch(executed_at))
+
+    # ---------- warm set ----------
+
+    async def _refresh_targets(self) -> None:
+        cutoff = time.time() - settings.sql_warmup_recent_hours * 3600
+        with self._lock:
+            recent = sorted((kv for kv in self._usage.items() if kv[1] >= cutoff), key=lambda kv: kv[1], reverse=True)
+        wanted = [database_id for database_id, _ in recent[: settings.sql_warmup_max_endpoints]]
+        if not wanted:
+            self._endpoints = {}
+            return
+        stmt = (
+            select(SqlEndpoint, Workspace.state)
+            .join(Workspace, Workspace.id == SqlEndpoint.workspace_id, isouter=True)
+            .where(SqlEndpoint.database_id.in_(wanted))
+        )
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(stmt)).all()
+        found = {ep.database_id: (ep, state) for ep, state in rows}
+
+        endpoints: Dict[str, WarmEndpoint] = {}
+        for database_id in wanted:
+            if database_id not in found:
+                continue            # usage keyed by a database name, or an endpoint that left the catalog
+            ep, ws_state = found[database_id]
+            we = self._endpoints.get(database_id) or WarmEndpoint(database_id, ep.server, ep.database, ep.port or 1433)
+            we.server, we.database, we.port = ep.server, ep.database, ep.port or 1433
+            we.workspace_state = ws_state
+            endpoints[database_id] = we
+        # Endpoints that dropped out are simply not pinged again; the pool reaper closes their connections.
+        self._endpoints = endpoints
+
+    # ---------- pinging ----------
+
+    async def _ping(self, we: WarmEndpoint) -> None:
+        cursors: List[Any] = []
+
+        def _run():
+            with pooled_connection(we.server, we.database, we.port) as conn:
+                cur = conn.cursor()
+                cursors.append(cur)
+                cur.execute("SELECT 1")
+                cur.fetchall()
+                cur.close()
+
+        started = time.perf_counter()
+        try:
+            with anyio.fail_after(settings.sql_warmup_ping_timeout):
+                async with executor.slot(we.server, WARMUP_CALLER):
+                    await executor.run(_run, cancellable=True, on_cancel=lambda: [c.cancel() for c in cursors])
+        except QueueTimeout:
+            return                  # probe lane busy: not the endpoint's fault, try next round
+        except Exception as e:
+            self._failed(we, str(e) or type(e).__name__)
+            return
+        we.pings += 1
+        we.failures = 0
+        we.state = "warm"
+        we.last_error = None
+        we.last_ping_ms = round((time.perf_counter() - started) * 1000, 2)
+        we.last_ping_at = datetime.now(timezone.utc).isoformat()
+        we.next_attempt = time.monotonic() + settings.sql_warmup_interval
+
+    def _failed(self, we: WarmEndpoint, error: str, state: Optional[str] = None) -> None:
+        we.failures += 1
+        we.last_error = error
+        we.state = state or ("paused" if any(h in error.lower() for h in PAUSED_HINTS) else "backoff")
+        delay = min(settings.sql_warmup_interval * 2 ** (we.failures - 1), settings.sql_warmup_max_backoff)
+        we.next_attempt = time.monotonic() + delay
+        log.info("Warm-up of %s failed (%s); retrying in %ss", we.database_id, error, delay)
+
+    async def run_round(self) -> None:
+        await self._refresh_targets()
+        now = time.monotonic()
+        due: List[WarmEndpoint] = []
+        for we in self._endpoints.values():
+            if we.next_attempt > now:
+                continue
+            if not we.server or not we.database:
+                self._failed(we, "Endpoint has no connection info", "no-connection-info")
+            elif (we.workspace_state or "").lower() == "inactive":
+                self._failed(we, "Workspace capacity is inactive", "paused")
+            elif self._last_used(we.database_id) >= max(self._started_at, time.time() - settings.sql_warmup_interval):
+                # Real traffic is keeping it open (usage seeded from history predates the pool, so it doesn't count).
+                we.state = "warm"
+                we.next_attempt = now + settings.sql_warmup_interval
+            elif not _pool_saturated(we.server, we.port):
+                due.append(we)
+
+        limiter = anyio.CapacityLimiter(max(1, settings.sql_warmup_concurrency))
+
+        async def _bounded(we: WarmEndpoint) -> None:
+            async with limiter:
+                await self._ping(we)
+
+        async with anyio.create_task_group() as tg:
+            for we in due:
+                tg.start_soon(_bounded, we)
+        self.rounds += 1
+        self.last_round_at = datetime.now(timezone.utc).isoformat()
+
+    async def _loop(self) -> None:
+        try:
+            await self._seed_from_history()
+        except Exception as e:
+            log.warning("Could not read query history for warm-up: %s", e)
+        while True:
+            try:
+                await self.run_round()
+            except Exception as e:
+                log.warning("Connection warm-up round failed: %s", e)
+            await asyncio.sleep(settings.sql_warmup_interval)
+
+    def start(self) -> None:
+        if not settings.sql_warmup_enabled or not settings.sql_pool_enabled or self._task is not None:
+            return
+        self._started_at = time.time()
+        metrics.add_listener(self.note_usage)
+        self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task is None:
+            return
+        metrics.remove_listener(self.note_usage)
+        self._task.cancel()
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "interval_s": settings.sql_warmup_interval,
+            "max_endpoints": settings.sql_warmup_max_endpoints,
+            "rounds": self.rounds,
+            "last_round_at": self.last_round_at,
+            "endpoints": [we.stats(self._last_used(we.database_id)) for we in self._endpoints.values()],
+        }
+
+
+warmer = ConnectionWarmer()
@@ -80,7 +80,7 @@ async def check_workspace_availability(workspace_id: str) -> str:
                                                     database = "master"  # Use master database for Fabric endpoints
                                                     
                                                     try:
-                                                        cols, rows = await exec_query(server, database, 1433, "SELECT 1")
+                                                        cols, rows = await exec_query(server, database, 1433, "SELECT 1", caller="probe")
                                                         return 'active'
                                                     except Exception as sql_exec_e:
                                                         error_msg = str(sql_exec_e).lower()
@@ -94,7 +94,7 @@ async def check_workspace_availability(workspace_id: str) -> str:
                                                     database = conn_str.split('Database=')[1].split(';')[0] if 'Database=' in conn_str else None
                                                     
                                                     if server and database:
-                                                        cols, rows = await exec_query(server, database, 1433, "SELECT 1")
+                                                        cols, rows = await exec_query(server, database, 1433, "SELECT 1", caller="probe")
                                                         return 'active'
                                                     else:
                                                         return 'active'  # Assume active if we can't test
@@ -127,7 +127,7 @@ async def check_workspace_availability(workspace_id: str) -> str:
                             if server and database:
                                 try:
                                     from sql.odbc import exec_query
-                                    cols, rows = await exec_query(server, database, 1433, "SELECT 1")
+                                    cols, rows = await exec_query(server, database, 1433, "SELECT 1", caller="probe")
                                     return 'active'
                                 except Exception as sql_e:
                                     error_msg = str(sql_e).lower()
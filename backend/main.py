@@ -1,4 +1,6 @@
 # backend/main.py
+import asyncio
+import anyio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from catalog.db import init_db
@@ -6,10 +8,20 @@ from routers import workspaces
 from routers import sqldb
 from routers import dbmeta
 from routers import diagnostics_sqldb
+from routers import diagnostics
 from routers import introspect
 from routers import agent_graph
 from routers import catalog
 from routers import forecasting
+from routers import metrics
+from routers import federated
+from routers import history
+from sql.pool import evict_idle_connections, close_all_pools
+from sql.jobs import jobs
+from sql.spill import check_spill_support
+from sql.fairshare import SessionKeyMiddleware
+from catalog.history import history_writer
+from catalog.warmup import warmer
 
 app = FastAPI(title="Fabric Explorer API", version="0.3.0")
 
@@ -25,15 +37,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Keys SQL work by X-Session-Id / X-User-Id / client address for fair-share scheduling
+app.add_middleware(SessionKeyMiddleware)
+
 app.include_router(workspaces.router)
 app.include_router(sqldb.router)
 app.include_router(dbmeta.router)
 app.include_router(diagnostics_sqldb.router)
+app.include_router(diagnostics.router)
 app.include_router(introspect.router)
 app.include_router(agent_graph.router)
 app.include_router(catalog.router)
 app.include_router(forecasting.router)
+app.include_router(metrics.router)
+app.include_router(federated.router)
+app.include_router(history.router)
+
+async def _reap_idle_connections(interval: int = 60):
+    while True:
+        await asyncio.sleep(interval)
+        await anyio.to_thread.run_sync(evict_idle_connections)
+        jobs.purge_expired()
 
 @app.on_event("startup")
 async def _startup():
     await init_db()
+    check_spill_support()
+    app.state.pool_reaper = asyncio.create_task(_reap_idle_connections())
+    history_writer.start()
+    warmer.start()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    app.state.pool_reaper.cancel()
+    warmer.stop()
+    await history_writer.stop()
+    await anyio.to_thread.run_sync(close_all_pools)
@@ -6,7 +6,7 @@ from uuid import uuid4
 from datetime import datetime, timezone
 import re
 
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Request
 from pydantic import BaseModel, Field
 
 # langchain / langgraph
@@ -24,6 +24,15 @@ from langgraph.prebuilt import create_react_agent
 from settings import settings
 from clients.fabric import list_workspaces, list_items
 from sql.odbc import exec_query
+from sql.cache import cached_query
+from sql.costguard import QueryTooExpensive, cut_by_limit
+from sql.fairshare import session_key
+from sql.aggregate import AggregateSpecError, parse_spec as parse_aggregate_spec, build_sql as build_aggregate_sql
+from sql.federated import FederatedQueryError, parse_sources, run_federated
+from sql.registry import run_until_disconnected
+from sql.http import check_read_only
+from sql.encoding import dumps, encode_rows
+from sql.converters import precise_decimals
 from catalog.db import get_session
 from catalog.models import SqlEndpoint
 from sqlmodel import select
@@ -352,6 +361,8 @@ def _system_prompt(base_context: List[ContextItem]) -> str:
         "- Get fresh data: catalog_tool(fresh_data=True) (refreshes cache first, then returns cached data)\n"
         "- Explore specific items: list_workspaces_tool, list_sqldb_tool, list_schemata_tool, list_tables_tool, list_columns_tool\n"
         "- Query data (read-only): sql_select_tool (single SELECT or CTE+SELECT)\n"
+        "- Join across databases: federated_query_tool (per-source columns/filters + one local SELECT)\n"
+        "- Summarize for a chart: aggregate_tool (group by / time buckets / measures computed on the server)\n"
         "- Visualize: make_chart_spec using the last table output\n\n"
         "Rules:\n"
         "- ALWAYS start by calling catalog_tool() to understand the full structure\n"
@@ -360,6 +371,9 @@ def _system_prompt(base_context: List[ContextItem]) -> str:
         "- NEVER ask for database/workspace confirmation if context items are provided - use the catalog to find the correct workspace/database\n"
         "- Use catalog_tool(fresh_data=True) if user explicitly asks for fresh/live data (refreshes cache first)\n"
         "- Keep SQL read-only; one statement; no comments\n"
+        "- For charts, get the data with aggregate_tool (one row per bar/point) instead of pulling raw rows with sql_select_tool\n"
+        f"- sql_select_tool returns at most {settings.agent_max_rows} rows; if the result says \"truncated\": true, aggregate or filter in SQL instead of relying on the partial rows\n"
+        "- If sql_select_tool returns an \"estimate\" with its error, the query was refused as too expensive: rewrite it (filters, GROUP BY on the server, fewer columns) using topOperators to see which table is scanned\n"
         "- Prefer names over IDs when possible\n"
         "- If something is ambiguous, ask ONE clarifying question, then proceed\n"
         "- Mention which tables/columns you used\n"
@@ -443,8 +457,8 @@ def _json_default(o: object) -> str:
     return str(o)
 
 def _as_json_str(data: object) -> str:
-    """Convert any data to JSON string."""
-    return json.dumps(data, default=_json_default, ensure_ascii=False)
+    """Convert any data to JSON string (query values are encoded like the /query endpoint's)."""
+    return dumps(data, fallback=_json_default)
 
 def _parse_json(s: str) -> Optional[Dict[str, object]]:
     """Safely parse JSON string."""
@@ -636,16 +650,127 @@ async def sql_select_tool(workspace_id: str, database_id: str, sql: str) -> str:
             ep = await session.get(SqlEndpoint, db_id)
             if not ep or ep.workspace_id != ws_id:
                 return _as_json_str({"error": "SQL endpoint not found for provided workspace/database."})
-            cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, s)
-
-        payload: TableData = {"columns": cols, "rows": [list(r) for r in rows], "rowCount": len(rows)}
+            max_rows = settings.agent_max_rows
+            try:
+                cols, rows, cache_info = await cached_query(ep.server, ep.database, ep.port or 1433, s,
+                                                            database_id=db_id, max_rows=max_rows, caller="agent",
+                                                            guard=True, output=settings.sql_output_mode)
+            except QueryTooExpensive as e:
+                detail = e.detail()
+                return _as_json_str({"error": detail["message"], "estimate": detail["estimate"],
+                                     "limits": detail["limits"], "sql": s})
+
+        truncated = len(rows) > max_rows or cut_by_limit(cache_info["admission"], len(rows))
+        rows = rows[:max_rows]
+        payload: TableData = {"columns": cols, "rows": encode_rows(rows), "rowCount": len(rows)}
         # include the final sql only as an extra string field for debugging
-        payload_out = {"columns": payload["columns"], "rows": payload["rows"], "rowCount": payload["rowCount"], "sql": s}
+        payload_out = {"columns": payload["columns"], "rows": payload["rows"], "rowCount": payload["rowCount"],
+                       "truncated": truncated, "preciseDecimals": precise_decimals(settings.sql_output_mode),
+                       "cache": cache_info, "sql": s}
         return _as_json_str(payload_out)
     except Exception as e:
         return _as_json_str({"error": f"{type(e).__name__}: {e}"})
 
 
+@tool
+async def aggregate_tool(
+    workspace_id: str,
+    database_id: str,
+    table: str,
+    measures: List[Dict[str, str]],
+    group_by: Optional[List[str]] = None,
+    filters: Optional[List[Dict[str, object]]] = None,
+    time_bucket: Optional[Dict[str, str]] = None,
+    limit: int = 500,
+) -> str:
+    """
+    Aggregate a table on the server for charts: returns one row per group, not raw rows.
+    table is "schema.table". measures: [{"fn": "sum|avg|min|max|count|count_distinct", "column": "amount", "as": "revenue"}].
+    group_by: ["region"]. filters: [{"column": "order_date", "op": ">=", "value": "2024-01-01"}]
+    (ops: = != < <= > >= in, not in, between, like, is null, is not null).
+    time_bucket: {"column": "order_date", "grain": "year|quarter|month|week|day|hour|minute"}.
+    Pass the result straight to make_chart_spec.
+    """
+    try:
+        ws = await _resolve_workspace(workspace_id)
+        if not ws:
+            return _as_json_str({"error": f"Unknown workspace '{workspace_id}'"})
+        ws_id, ws_name = ws
+        db = await _resolve_database_in_workspace(ws_id, database_id)
+        if not db:
+            return _as_json_str({"error": f"Unknown database '{database_id}' for workspace '{ws_name}'"})
+        db_id, db_name = db
+
+        spec = parse_aggregate_spec({"table": table, "groupBy": group_by, "measures": measures, "filters": filters,
+                                     "timeBucket": time_bucket, "limit": min(int(limit or 500), settings.agent_max_rows)})
+        s, params, dims, names = build_aggregate_sql(spec)
+        rls_result = _fake_rls_check(s, ws_name, db_name)
+        if rls_result:
+            return _as_json_str({"error": rls_result})
+
+        async with open_session() as session:
+            ep = await session.get(SqlEndpoint, db_id)
+            if not ep or ep.workspace_id != ws_id:
+                return _as_json_str({"error": "SQL endpoint not found for provided workspace/database."})
+            try:
+                cols, rows, cache_info = await cached_query(ep.server, ep.database, ep.port or 1433, s, tuple(params),
+                                                            database_id=db_id, max_rows=spec.limit, caller="agent",
+                                                            guard=True, output=settings.sql_output_mode)
+            except QueryTooExpensive as e:
+                detail = e.detail()
+                return _as_json_str({"error": detail["message"], "estimate": detail["estimate"],
+                                     "limits": detail["limits"], "sql": s})
+        truncated = len(rows) > spec.limit or cut_by_limit(cache_info["admission"], len(rows))
+        rows = rows[: spec.limit]
+        return _as_json_str({"columns": cols, "rows": encode_rows(rows), "rowCount": len(rows),
+                             "truncated": truncated, "dimensions": dims, "measures": names,
+                             "preciseDecimals": precise_decimals(settings.sql_output_mode),
+                             "cache": cache_info, "sql": s})
+    except AggregateSpecError as e:
+        return _as_json_str({"error": str(e)})
+    except Exception as e:
+        return _as_json_str({"error": f"{type(e).__name__}: {e}"})
+
+
+@tool
+async def federated_query_tool(sources: Dict[str, Dict[str, object]], sql: str) -> str:
+    """
+    Join/aggregate tables that live in DIFFERENT databases (warehouses / lakehouse SQL endpoints).
+    sources maps a short alias to {"database": NAME or ID, "table": "schema.table",
+    "columns": [only the needed columns], "where": optional T-SQL filter run on that database}.
+    sql is one SELECT over the aliases as table names (DuckDB SQL dialect), e.g.
+    SELECT c.region, SUM(o.amount) FROM o JOIN c ON o.customer_id = c.id GROUP BY c.region
+    Always list columns and filters per source so only the needed subset is fetched.
+    """
+    try:
+        raw: Dict[str, Dict[str, object]] = {}
+        for alias, spec in (sources or {}).items():
+            spec = dict(spec)
+            target = str(spec.pop("database", "") or spec.pop("databaseId", ""))
+            found = await _resolve_database_global(target) if target else None
+            if not found:
+                return _as_json_str({"error": f"Unknown database '{target}' for source '{alias}'"})
+            spec["databaseId"] = found[2]
+            raw[alias] = spec
+        parsed = parse_sources(raw)
+        async with open_session() as session:
+            for src in parsed:
+                ep = await session.get(SqlEndpoint, src.database_id)
+                if not ep or not ep.server:
+                    return _as_json_str({"error": f"SQL endpoint for source '{src.alias}' is unavailable."})
+                src.server, src.database, src.port = ep.server, ep.database, ep.port or 1433
+        for src in parsed:
+            check_read_only(src.source_sql())
+        result = await run_federated(parsed, sql, settings.agent_max_rows, caller="agent")
+        return _as_json_str({**result, "sql": sql})
+    except FederatedQueryError as e:
+        return _as_json_str({"error": str(e)})
+    except HTTPException as e:
+        return _as_json_str({"error": f"Source SQL rejected: {e.detail}"})
+    except Exception as e:
+        return _as_json_str({"error": f"{type(e).__name__}: {e}"})
+
+
 @tool
 def make_chart_spec(
     data: TableData,
@@ -722,7 +847,7 @@ async def list_schemata_tool(database: str) -> str:
             ep = await session.get(SqlEndpoint, db_id)
             if not ep or ep.workspace_id != ws_id:
                 return _as_json_str({"error": "SQL endpoint not found for provided database."})
-            cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, sql)
+            cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, sql, caller="agent")
 
         # Normalize to a single column named 'schema'
         out_rows = [[r[0]] for r in rows]
@@ -758,7 +883,7 @@ async def list_tables_tool(database: str, schema: str) -> str:
             ep = await session.get(SqlEndpoint, db_id)
             if not ep or ep.workspace_id != ws_id:
                 return _as_json_str({"error": "SQL endpoint not found for provided database."})
-            cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, sql)
+            cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, sql, caller="agent")
 
         out_rows = [[r[0], r[1]] for r in rows]
         return _as_json_str({"columns": ["schema", "table"], "rows": out_rows, "rowCount": len(out_rows)})
@@ -793,9 +918,9 @@ async def list_columns_tool(database: str, schema: str, table: str) -> str:
             ep = await session.get(SqlEndpoint, db_id)
             if not ep or ep.workspace_id != ws_id:
                 return _as_json_str({"error": "SQL endpoint not found for provided database."})
-            cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, sql)
+            cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, sql, caller="agent")
 
-        return _as_json_str({"columns": cols, "rows": [list(r) for r in rows], "rowCount": len(rows)})
+        return _as_json_str({"columns": cols, "rows": encode_rows(rows), "rowCount": len(rows)})
     except Exception as e:
         return _as_json_str({"error": f"{type(e).__name__}: {e}"})
 
@@ -1046,7 +1171,7 @@ async def set_session_context(session_id: str, items: List[ContextItem] = Body(.
 
 
 @router.post("/run", response_model=AgentRunResponse)
-async def run_agent(req: AgentRunRequest) -> AgentRunResponse:
+async def run_agent(req: AgentRunRequest, request: Request) -> AgentRunResponse:
     # Resolve session
     sid: Optional[str] = req.session_id
     # Load or init history/context
@@ -1088,18 +1213,23 @@ async def run_agent(req: AgentRunRequest) -> AgentRunResponse:
         catalog_tool,
         list_workspaces_tool, list_sqldb_tool, list_items_tool,
         list_schemata_tool, list_tables_tool, list_columns_tool,
-        sql_select_tool, make_chart_spec,
+        sql_select_tool, aggregate_tool, federated_query_tool, make_chart_spec,
         is_time_series_data, forecast_tool, make_forecast_chart_spec,
     ]
 
     # Build graph (no prompt arg; we pass SystemMessage in input instead)
     graph = create_react_agent(model=llm, tools=tools)
 
-    # Invoke asynchronously for async tools with recursion limit to prevent infinite loops
-    result = await graph.ainvoke(
-        {"messages": input_messages},
-        config={"recursion_limit": req.max_steps or 15}
-    )
+    # Invoke asynchronously for async tools with recursion limit to prevent infinite loops.
+    # If the client disconnects mid-run, the run (and any query a tool is executing) is cancelled.
+    # Queries the tools run are fair-shared per agent session rather than per HTTP client.
+    with session_key(f"agent:{sid}" if sid else None):
+        result = await run_until_disconnected(request, lambda: graph.ainvoke(
+            {"messages": input_messages},
+            config={"recursion_limit": req.max_steps or 15}
+        ))
+    if result is None:
+        raise HTTPException(499, "Client disconnected; agent run cancelled.")
 
     # The graph returns a dict with "messages"
     out_messages_obj = result.get("messages", [])
@@ -1,28 +1,45 @@
 # fabric_explorer/routers/dbmeta.py
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select, delete
 from datetime import datetime, timezone
+from uuid import uuid4
 
+from settings import settings
 from catalog.db import get_session
-from catalog.models import SqlEndpoint, Schema, Table, Column
+from catalog.models import SqlEndpoint, Schema, Table, Column, TablePreview
 from catalog.upsert import upsert_schemas, upsert_tables, upsert_columns
-from sql.odbc import fetch_schemata, fetch_tables, fetch_columns, exec_query
+from catalog.preview import preview_refresher, preview_payload, is_stale
+from sql.odbc import fetch_schemata, fetch_tables, fetch_columns, exec_query, iter_query, RowStream
+from sql.registry import registry, run_until_disconnected, QueryCancelled, QueryTimedOut
+from sql.jobs import jobs, JobQueueFull
+from sql.cache import cached_query
+from sql.costguard import QueryTooExpensive, admit, cut_by_limit
+from sql.fairshare import FairQueueFull
+from sql.aggregate import AggregateSpecError, parse_spec, build_sql
+from sql.metrics import track, phase
+from sql.encoding import column_keys, dumps, encode_rows, encode_columnar
+from sql.converters import precise_decimals
+from sql.http import check_read_only, ndjson_line, require_endpoint as _require_endpoint
+from sql.paging import (
+    PagingError, PRIMARY_KEY_SQL, analyze, sort_key, fingerprint, page_sql, encode_token, decode_token, key_indexes,
+)
+from sql.export import (
+    EXPORT_FORMATS, EXPORT_COMPRESSIONS, check_export_dependencies, encode_stream, encode_buffer,
+    export_filename, export_media_type,
+)
+from sql.arrow import (
+    ARROW_STREAM_MEDIA_TYPE, require_pyarrow, schema_from_description, iter_record_batches,
+    ipc_schema_message, ipc_batch_message, ipc_end_of_stream,
+)
 
 router = APIRouter(prefix="/workspaces/{workspace_id}/sqldb/{database_id}", tags=["dbmeta"])
-
-
-async def _require_endpoint(session: AsyncSession, workspace_id: str, database_id: str) -> SqlEndpoint:
-    ep = await session.get(SqlEndpoint, database_id)
-    if not ep or ep.workspace_id != workspace_id:
-        raise HTTPException(404, "SQL endpoint not found. Try /sqldb?fresh=1 or /sqldb/reload.")
-    if not ep.server or not ep.database:
-        raise HTTPException(
-            503,
-            "SQL endpoint has no active connection info (capacity inactive, endpoint unavailable, "
-            "or missing permissions). Try again later or activate capacity."
-        )
-    return ep
+log = logging.getLogger(__name__)
 
 
 def _now_iso() -> str:
@@ -228,39 +245,517 @@ async def refresh_columns(
     return {"status": "success", "message": f"Columns refreshed for table {schema}.{table}", "count": len(rows_raw)}
 
 
+@router.get("/schema/{schema}/tables/{table}/preview")
+async def preview_table(
+    workspace_id: str,
+    database_id: str,
+    schema: str,
+    table: str,
+    rows: Optional[int] = Query(None, ge=1, description="Rows to return (default SQL_PREVIEW_ROWS)"),
+    fresh: bool = Query(False, description="Read live rows instead of the cached preview"),
+    session: AsyncSession = Depends(get_session),
+):
+    """First rows of a table, served from the catalog and refreshed in the background when stale."""
+    ep = await _require_endpoint(session, workspace_id, database_id)
+    n = min(rows or settings.sql_preview_rows, settings.sql_preview_max_rows)
+    key = (workspace_id, database_id, schema, table)
+
+    cached = await session.get(TablePreview, key)
+    if cached is not None and cached.row_limit >= n and not fresh:
+        payload = preview_payload(cached)
+        stale = is_stale(cached)
+        if stale:
+            preview_refresher.refresh(key, ep.server, ep.database, ep.port or 1433, cached.row_limit)
+        payload["rows"] = payload["rows"][:n]
+        return {**payload, "rowCount": len(payload["rows"]), "stale": stale,
+                "refreshing": preview_refresher.running(key), "source": "catalog"}
+
+    try:
+        # Join a refresh that is already running; it may have been started for fewer rows.
+        payload = await asyncio.shield(preview_refresher.refresh(key, ep.server, ep.database, ep.port or 1433, n))
+        if payload["rowLimit"] < n:
+            payload = await asyncio.shield(preview_refresher.refresh(key, ep.server, ep.database, ep.port or 1433, n))
+    except Exception as e:
+        raise _query_error(e)
+    payload["rows"] = payload["rows"][:n]
+    return {**payload, "rowCount": len(payload["rows"]), "stale": False, "refreshing": False, "source": "live"}
+
+
 # ---------------- query endpoint (read-only by default) ----------------
 
-BLOCKLIST = ("insert", "update", "delete", "merge", "alter", "drop", "truncate", "create", "grant", "revoke")
+def _query_error(e: Exception) -> HTTPException:
+    if isinstance(e, QueryTooExpensive):
+        # The estimate is returned so the caller (often the agent) can rewrite the query.
+        return HTTPException(status_code=422, detail=e.detail())
+    if isinstance(e, FairQueueFull):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    if isinstance(e, QueryTimedOut):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, QueryCancelled):
+        return HTTPException(status_code=409, detail=str(e))
+    # Bubble up driver / token / capacity issues as friendly 503
+    return HTTPException(status_code=503, detail=str(e))
+
+
+SHAPE_QUERY = Query("rows", pattern="^(rows|columnar)$",
+                    description='columnar returns {"columns": [...], "data": {"col": [...]}} instead of row arrays')
+
+
+OUTPUT_QUERY = Query(None, pattern="^(python|fast|exact)$",
+                     description="Value conversion at fetch time (default SQL_OUTPUT_MODE); exact returns decimals as exact strings")
+
+
+def json_response(payload: dict) -> Response:
+    return Response(dumps(payload), media_type="application/json")
+
+
+def rows_payload(cols: list, rows: list, shape: str = "rows") -> dict:
+    """{"columns", "rows"} or, for the columnar shape, {"columns", "data"} keyed by unique column names."""
+    if shape == "columnar":
+        keys, data = encode_columnar(cols, rows)
+        return {"columns": keys, "data": data}
+    return {"columns": cols, "rows": encode_rows(rows)}
+
+
+async def _stream_ndjson(stream: RowStream, max_rows: Optional[int], shape: str = "rows",
+                         admission: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """Header line with columns, one line per fetched batch, then a trailer with the row count."""
+    sent = 0
+    truncated = False
+    error: Optional[BaseException] = None
+    try:
+        yield ndjson_line({"columns": column_keys(stream.columns) if shape == "columnar" else stream.columns,
+                           "preciseDecimals": precise_decimals(stream.output)})
+        async for batch in stream:
+            if max_rows is not None and sent + len(batch) > max_rows:
+                batch = batch[: max_rows - sent]
+                truncated = True
+            sent += len(batch)
+            if batch:
+                started = time.perf_counter()
+                body = rows_payload(stream.columns, batch, shape)
+                del body["columns"]
+                line = ndjson_line(body)
+                stream.timing.add("encode", time.perf_counter() - started)
+                yield line
+            if truncated:
+                break
+        yield ndjson_line({"rowCount": sent, "truncated": truncated or cut_by_limit(admission, sent)})
+    except Exception as e:
+        error = e
+        # Headers are already sent; report the failure in-band.
+        yield ndjson_line({"error": str(e), "rowCount": sent})
+    finally:
+        await stream.aclose(error)
+
+
+async def _stream_arrow(stream: RowStream, max_rows: Optional[int]) -> AsyncIterator[bytes]:
+    """Arrow IPC stream: schema message, one record batch per fetched batch, end-of-stream marker."""
+    schema_sent = False
+    error: Optional[BaseException] = None
+    try:
+        async for rb in iter_record_batches(stream, max_rows):
+            if not schema_sent:
+                yield ipc_schema_message(rb.schema)
+                schema_sent = True
+            started = time.perf_counter()
+            message = ipc_batch_message(rb)
+            stream.timing.add("encode", time.perf_counter() - started)
+            yield message
+        if not schema_sent:
+            yield ipc_schema_message(schema_from_description(stream.description or ()))
+        yield ipc_end_of_stream()
+    except Exception as e:
+        # No in-band error channel in IPC; the missing end-of-stream marker tells the reader.
+        error = e
+        log.warning("Arrow stream aborted: %s", e)
+    finally:
+        await stream.aclose(error)
 
 
 @router.post("/query")
 async def query_sql(
     workspace_id: str,
     database_id: str,
-    body: dict = Body(..., example={"sql": "SELECT TOP 100 * FROM [dbo].[YourTable] WHERE id = ?", "params": [123], "maxRows": 1000}),
+    request: Request,
+    body: dict = Body(..., example={"sql": "SELECT TOP 100 * FROM [dbo].[YourTable] WHERE id = ?", "params": [123], "maxRows": 1000, "cache": True}),
+    format: str = Query("json", pattern="^(json|ndjson|arrow)$",
+                        description="ndjson streams rows batch by batch; arrow returns an Arrow IPC stream"),
+    timings: bool = Query(False, description="Include per-phase timings (json format only)"),
+    shape: str = SHAPE_QUERY,
+    output: Optional[str] = OUTPUT_QUERY,
     session: AsyncSession = Depends(get_session),
 ):
     ep = await _require_endpoint(session, workspace_id, database_id)
     sql_txt = (body.get("sql") or "").strip()
+    # Arrow types its columns from the description, so it takes pyodbc's own values.
+    output = "python" if format == "arrow" else output or settings.sql_output_mode
     params = body.get("params") or []          # NEW
     max_rows = int(body.get("maxRows") or 10000)
+    # Optional client-chosen id, so the query can be cancelled via DELETE .../query/{queryId}
+    query_id = body.get("queryId") or None
+    if query_id and registry.is_running(query_id):
+        raise HTTPException(409, f"Query id {query_id} is already running")
+    caller = "query"
+
+    check_read_only(sql_txt)
+
+    if format in ("ndjson", "arrow"):
+        if format == "arrow":
+            try:
+                require_pyarrow()
+            except RuntimeError as e:
+                raise HTTPException(status_code=501, detail=str(e))
+        # Streams are unbounded unless the caller asks for a cap explicitly.
+        stream_max = int(body["maxRows"]) if body.get("maxRows") else None
+        try:
+            admission = await admit(ep.server, ep.database, ep.port or 1433, sql_txt, tuple(params), caller=caller)
+            stream = iter_query(ep.server, ep.database, ep.port or 1433, admission.sql, tuple(params),
+                                max_rows=stream_max, caller=admission.caller, query_id=query_id,
+                                database_id=database_id, output=output)
+            await stream.open()
+        except Exception as e:
+            raise _query_error(e)
+        # A client that drops a streaming response is noticed by the server on the next
+        # write; the generator is then closed and aclose() cancels the cursor.
+        headers = {"X-Query-Id": stream.query_id}
+        if format == "arrow":
+            return StreamingResponse(_stream_arrow(stream, stream_max), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+        return StreamingResponse(_stream_ndjson(stream, stream_max, shape, admission.describe()),
+                                 media_type="application/x-ndjson", headers=headers)
+
+    query_id = query_id or str(uuid4())
+    with track(database_id, "query") as timing:
+        timing.sql = sql_txt
+        try:
+            result = await run_until_disconnected(request, lambda: cached_query(
+                ep.server, ep.database, ep.port or 1433, sql_txt, tuple(params),
+                database_id=database_id, max_rows=max_rows, caller=caller, query_id=query_id,
+                use_cache=body.get("cache", True) is not False, guard=True, output=output))
+        except Exception as e:
+            raise _query_error(e)
+        if result is None:
+            # Client went away and the query was cancelled; nobody is listening for a body.
+            return Response(status_code=499)
+        cols, rows, cache_info = result
+        timing.cache_hit = cache_info["hit"]
+
+        truncated = len(rows) > max_rows or cut_by_limit(cache_info["admission"], len(rows))
+        rows = rows[:max_rows]
+
+        with phase("encode"):
+            payload = {
+                **rows_payload(cols, rows, shape),
+                "rowCount": len(rows),
+                "truncated": truncated,
+                "preciseDecimals": precise_decimals(output),
+                "queryId": query_id,
+                "cache": cache_info,
+            }
+            if timings:
+                # Encoding of this response is recorded in /metrics but can't be part of it.
+                payload["timings"] = timing.as_ms()
+            return json_response(payload)
+
+
+MAX_PAGE_SIZE = 10000
 
-    # naïve safety (read-only)
-    lower = sql_txt.lower().replace("\n", " ")
-    if any(tok in lower for tok in BLOCKLIST):
-        raise HTTPException(400, "Only read-only queries are allowed. (Detected a mutating statement.)")
 
+async def _primary_key(ep: SqlEndpoint, database_id: str, schema: str, table: str) -> list:
     try:
-        cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, sql_txt, tuple(params))
+        _, rows, _ = await cached_query(ep.server, ep.database, ep.port or 1433, PRIMARY_KEY_SQL, (schema, table),
+                                        database_id=database_id, caller="introspect")
     except Exception as e:
-        # Bubble up driver / token / capacity issues as friendly 503
-        raise HTTPException(status_code=503, detail=str(e))
+        # No usable primary key just means the statement's own ORDER BY has to be enough.
+        log.debug("Primary key lookup for %s.%s failed: %s", schema, table, e)
+        return []
+    return [r[0] for r in rows]
 
-    if max_rows and len(rows) > max_rows:
-        rows = rows[:max_rows]
 
-    return {
-        "columns": cols,
-        "rows": [list(r) for r in rows],
+@router.post("/query/page")
+async def query_page(
+    workspace_id: str,
+    database_id: str,
+    body: dict = Body(..., example={"sql": "SELECT * FROM [dbo].[YourTable] ORDER BY created_at DESC",
+                                    "params": [], "pageSize": 500, "pageToken": None}),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Keyset pagination. The sort key is the statement's ORDER BY columns, plus the primary
+    key of the table when it reads a single one; each page seeks past the last key of the
+    previous page instead of using OFFSET, so deep pages cost the same as the first.
+    Without a primary key (joins, CTEs, keyless tables) set "uniqueSortKey": true to
+    confirm the ORDER BY columns are unique; otherwise the request is rejected.
+    Pass the returned nextPageToken (null on the last page) to get the next page.
+    """
+    ep = await _require_endpoint(session, workspace_id, database_id)
+    sql_txt = (body.get("sql") or "").strip()
+    params = tuple(body.get("params") or [])
+    page_size = int(body.get("pageSize") or 100)
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise HTTPException(400, f"pageSize must be between 1 and {MAX_PAGE_SIZE}.")
+    check_read_only(sql_txt)
+
+    try:
+        stmt = analyze(sql_txt)
+        pk = await _primary_key(ep, database_id, *stmt.single_table) if stmt.single_table else []
+        keys = sort_key(stmt, pk, unique=body.get("uniqueSortKey") is True)
+        fp = fingerprint(sql_txt, params, keys)
+        after = decode_token(body["pageToken"], fp, len(keys)) if body.get("pageToken") else None
+        page_txt, key_params = page_sql(stmt, keys, after, page_size)
+    except PagingError as e:
+        raise HTTPException(400, str(e))
+
+    try:
+        cols, rows, cache_info = await cached_query(
+            ep.server, ep.database, ep.port or 1433, page_txt, params + tuple(key_params),
+            database_id=database_id, max_rows=page_size, query_id=body.get("queryId") or None,
+            use_cache=body.get("cache", True) is not False, guard=True)
+    except Exception as e:
+        raise _query_error(e)
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_token = None
+    if has_more:
+        try:
+            idx = key_indexes(cols, keys)
+        except PagingError as e:
+            raise HTTPException(400, str(e))
+        next_token = encode_token(fp, [rows[-1][i] for i in idx])
+    return json_response({
+        **rows_payload(cols, rows),
         "rowCount": len(rows),
-    }
+        "sortKey": [k.describe() for k in keys],
+        "nextPageToken": next_token,
+        "cache": cache_info,
+    })
+
+
+@router.post("/aggregate")
+async def aggregate(
+    workspace_id: str,
+    database_id: str,
+    body: dict = Body(..., example={
+        "table": "dbo.sales",
+        "groupBy": ["region"],
+        "measures": [{"fn": "sum", "column": "amount", "as": "revenue"}, {"fn": "count"}],
+        "filters": [{"column": "order_date", "op": ">=", "value": "2024-01-01"}],
+        "timeBucket": {"column": "order_date", "grain": "month"},
+        "limit": 500,
+    }),
+    shape: str = SHAPE_QUERY,
+    output: Optional[str] = OUTPUT_QUERY,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Group and aggregate on the server and return only the series: one row per
+    (time bucket, group) with one column per measure, ready for a chart.
+    """
+    ep = await _require_endpoint(session, workspace_id, database_id)
+    try:
+        spec = parse_spec(body)
+        sql_txt, params, dims, measures = build_sql(spec)
+    except AggregateSpecError as e:
+        raise HTTPException(400, str(e))
+    output = output or settings.sql_output_mode
+    try:
+        cols, rows, cache_info = await cached_query(
+            ep.server, ep.database, ep.port or 1433, sql_txt, tuple(params),
+            database_id=database_id, max_rows=spec.limit, use_cache=body.get("cache", True) is not False, guard=True,
+            output=output)
+    except Exception as e:
+        raise _query_error(e)
+    truncated = len(rows) > spec.limit or cut_by_limit(cache_info["admission"], len(rows))
+    rows = rows[: spec.limit]
+    return json_response({
+        **rows_payload(cols, rows, shape),
+        "rowCount": len(rows),
+        "truncated": truncated,
+        "preciseDecimals": precise_decimals(output),
+        "dimensions": dims,
+        "measures": measures,
+        "sql": sql_txt,
+        "cache": cache_info,
+    })
+
+
+@router.get("/queries")
+async def list_running_queries(workspace_id: str, database_id: str):
+    """Queries currently executing against this SQL endpoint."""
+    return {"queries": registry.list(database_id), "checked_at": _now_iso()}
+
+
+@router.delete("/query/{query_id}")
+async def cancel_query(workspace_id: str, database_id: str, query_id: str):
+    if not registry.cancel(query_id, database_id=database_id):
+        raise HTTPException(404, "Query not found (it may have already finished).")
+    return {"status": "cancelled", "queryId": query_id}
+
+
+# ---------------- export ----------------
+
+async def _stream_export(stream: RowStream, fmt: str, compression: str) -> AsyncIterator[bytes]:
+    error: Optional[BaseException] = None
+    try:
+        async for chunk in encode_stream(stream, fmt, compression):
+            yield chunk
+    except Exception as e:
+        # Headers are already sent; a truncated file (no CSV tail / Parquet footer / gzip trailer) is the signal.
+        error = e
+        log.warning("Export aborted after %s rows: %s", stream.row_count, e)
+    finally:
+        await stream.aclose(error)
+
+
+@router.post("/export")
+async def export_query(
+    workspace_id: str,
+    database_id: str,
+    body: dict = Body(..., example={"sql": "SELECT * FROM [dbo].[YourTable]", "params": [], "filename": "your_table"}),
+    format: str = Query("csv", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    compression: str = Query("none", pattern=f"^({'|'.join(EXPORT_COMPRESSIONS)})$"),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Stream a full result set as a file download. No row limit: rows go from the cursor
+    through the encoder to the socket one batch at a time.
+    """
+    ep = await _require_endpoint(session, workspace_id, database_id)
+    sql_txt = (body.get("sql") or "").strip()
+    params = body.get("params") or []
+    check_read_only(sql_txt)
+    try:
+        check_export_dependencies(format, compression)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    stream = iter_query(ep.server, ep.database, ep.port or 1433, sql_txt, tuple(params),
+                        timeout=settings.sql_export_timeout, caller="export",
+                        query_id=body.get("queryId") or None, database_id=database_id)
+    try:
+        await stream.open()
+    except Exception as e:
+        raise _query_error(e)
+    filename = export_filename(body.get("filename"), format, compression)
+    return StreamingResponse(
+        _stream_export(stream, format, compression),
+        media_type=export_media_type(format, compression),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Query-Id": stream.query_id},
+    )
+
+
+# ---------------- asynchronous query jobs ----------------
+
+@router.post("/query/jobs", status_code=202)
+async def submit_query_job(
+    workspace_id: str,
+    database_id: str,
+    body: dict = Body(..., example={"sql": "SELECT * FROM [dbo].[BigTable]", "params": [], "maxRows": 100000}),
+    session: AsyncSession = Depends(get_session),
+):
+    """Start a query in the background; poll GET .../query/jobs/{jobId} and page .../results."""
+    ep = await _require_endpoint(session, workspace_id, database_id)
+    sql_txt = (body.get("sql") or "").strip()
+    params = body.get("params") or []
+    check_read_only(sql_txt)
+    try:
+        job = jobs.submit(ep.server, ep.database, ep.port or 1433, sql_txt, tuple(params),
+                          workspace_id=workspace_id, database_id=database_id,
+                          max_rows=int(body["maxRows"]) if body.get("maxRows") else None)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.describe(jobs.ttl)
+
+
+@router.get("/query/jobs")
+async def list_query_jobs(workspace_id: str, database_id: str):
+    return {"jobs": [j.describe(jobs.ttl) for j in jobs.list(database_id)], "checked_at": _now_iso()}
+
+
+@router.get("/query/jobs/{job_id}")
+async def get_query_job(workspace_id: str, database_id: str, job_id: str):
+    job = jobs.get(job_id, database_id)
+    if job is None:
+        raise HTTPException(404, "Job not found (it may have expired).")
+    return job.describe(jobs.ttl)
+
+
+@router.get("/query/jobs/{job_id}/results")
+async def get_query_job_results(
+    workspace_id: str,
+    database_id: str,
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=50000),
+):
+    """
+    Page through a job's rows. While the job is still running this returns the rows
+    fetched so far; `complete` turns true once the job has finished.
+    """
+    job = jobs.get(job_id, database_id)
+    if job is None:
+        raise HTTPException(404, "Job not found (it may have expired).")
+    if job.status == "failed":
+        raise HTTPException(status_code=503, detail=job.error or "Job failed.")
+    rows = await jobs.page(job, offset, limit)
+    next_offset = offset + len(rows)
+    return json_response({
+        "jobId": job.job_id,
+        "status": job.status,
+        "columns": job.columns,
+        "rows": encode_rows(rows),
+        "offset": offset,
+        "rowCount": job.row_count,
+        "nextOffset": next_offset if next_offset < job.row_count or not job.finished else None,
+        "complete": job.finished,
+        "truncated": job.truncated,
+        "spilled": bool(job.buffer and job.buffer.spilled),
+    })
+
+
+async def _stream_job_export(job, fmt: str, compression: str) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in encode_buffer(job.buffer, job.columns, fmt, compression):
+            yield chunk
+    except Exception as e:
+        # Same signal as a live export: the file ends without its tail. Happens if the job is dropped mid-download.
+        log.warning("Export of job %s aborted: %s", job.job_id, e)
+
+
+@router.get("/query/jobs/{job_id}/export")
+async def export_query_job(
+    workspace_id: str,
+    database_id: str,
+    job_id: str,
+    format: str = Query("csv", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    compression: str = Query("none", pattern=f"^({'|'.join(EXPORT_COMPRESSIONS)})$"),
+    filename: Optional[str] = Query(None),
+):
+    """
+    Download a finished job's rows as a file without re-running the query. Spilled
+    results are read back from the job's spill file through a memory map.
+    """
+    job = jobs.get(job_id, database_id)
+    if job is None:
+        raise HTTPException(404, "Job not found (it may have expired).")
+    if job.status != "succeeded" or job.buffer is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; only succeeded jobs can be exported.")
+    try:
+        check_export_dependencies(format, compression)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    name = export_filename(filename or f"job_{job.job_id}", format, compression)
+    return StreamingResponse(
+        _stream_job_export(job, format, compression),
+        media_type=export_media_type(format, compression),
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+@router.delete("/query/jobs/{job_id}")
+async def cancel_query_job(workspace_id: str, database_id: str, job_id: str):
+    """Cancel a queued/running job, or discard a finished job's results."""
+    if not jobs.cancel(job_id, database_id):
+        raise HTTPException(404, "Job not found (it may have expired).")
+    return {"status": "deleted", "jobId": job_id}
@@ -0,0 +1,32 @@
+# backend/routers/diagnostics.py
+from fastapi import APIRouter
+from datetime import datetime, timezone
+
+from catalog.warmup import warmer
+
+from sql.cache import result_cache
+from sql.executor import executor
+from sql.fairshare import fair_share
+from sql.pool import pool_stats
+from sql.singleflight import singleflight
+
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"])
+
+def _now(): return datetime.now(timezone.utc).isoformat()
+
+@router.get("/sql")
+async def sql_diagnostics():
+    """ODBC executor queue depths, per-session fair-share queues (per server and lane), connection pool state, result cache usage and coalesced queries."""
+    return {
+        "executor": executor.stats(),
+        "fairshare": fair_share.stats(),
+        "pools": pool_stats(),
+        "cache": result_cache.stats(),
+        "singleflight": singleflight.stats(),
+        "checked_at": _now(),
+    }
+
+@router.get("/warmup")
+async def warmup_diagnostics():
+    """Endpoints the connection warmer keeps open, their state (warm, backoff, paused) and last ping."""
+    return {**warmer.stats(), "checked_at": _now()}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from catalog.db import get_session
 from catalog.models import SqlEndpoint
-from sql.odbc import exec_query, choose_driver
+from sql.odbc import exec_query, get_backend
 from datetime import datetime, timezone
 
 router = APIRouter(prefix="/workspaces/{workspace_id}/sqldb/{database_id}", tags=["diagnostics"])
@@ -21,8 +21,8 @@ async def availability(workspace_id: str, database_id: str, session: AsyncSessio
     if not ep.server or not ep.database:
         return {"available": False, "reason": "no-connection-info", "checked_at": _now()}
     try:
-        driver = choose_driver()
-        cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, "SELECT 1")
+        driver = get_backend().driver()
+        cols, rows = await exec_query(ep.server, ep.database, ep.port or 1433, "SELECT 1", caller="probe")
         return {"available": bool(rows), "driver": driver, "checked_at": _now()}
     except Exception as e:
         return {"available": False, "reason": str(e), "checked_at": _now()}
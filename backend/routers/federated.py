@@ -0,0 +1,58 @@
+# backend/routers/federated.py
+from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog.db import get_session
+from sql.federated import FederatedQueryError, parse_sources, require_duckdb, run_federated
+from sql.arrow import require_pyarrow
+from sql.http import check_read_only, require_endpoint
+
+router = APIRouter(prefix="/workspaces/{workspace_id}/federated", tags=["federated"])
+
+@router.post("/query")
+async def federated_query(
+    workspace_id: str,
+    body: dict = Body(..., example={
+        "sources": {
+            "o": {"databaseId": "<warehouse-id>", "table": "dbo.Orders", "columns": ["customer_id", "amount"],
+                  "where": "order_date >= ?", "params": ["2024-01-01"]},
+            "c": {"databaseId": "<lakehouse-endpoint-id>", "table": "dbo.Customers", "columns": ["id", "region"]},
+        },
+        "sql": "SELECT c.region, SUM(o.amount) AS total FROM o JOIN c ON o.customer_id = c.id GROUP BY c.region",
+        "maxRows": 1000,
+    }),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Join/aggregate across SQL endpoints of one workspace. Each source's columns/where
+    are pushed to its endpoint; the subsets are fetched concurrently and `sql` runs
+    locally (DuckDB) over tables named after the source aliases.
+    """
+    try:
+        require_duckdb()
+        require_pyarrow()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    try:
+        sources = parse_sources(body.get("sources") or {})
+        for src in sources:
+            check_read_only(src.source_sql())
+    except FederatedQueryError as e:
+        raise HTTPException(400, str(e))
+    try:
+        max_rows = int(body.get("maxRows") or 10000)
+    except (TypeError, ValueError):
+        raise HTTPException(400, f"maxRows must be an integer, got {body.get('maxRows')!r}")
+    if max_rows < 1:
+        raise HTTPException(400, "maxRows must be positive")
+
+    for src in sources:
+        ep = await require_endpoint(session, workspace_id, src.database_id)
+        src.server, src.database, src.port = ep.server, ep.database, ep.port or 1433
+
+    try:
+        return await run_federated(sources, body.get("sql") or "", max_rows)
+    except FederatedQueryError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
@@ -0,0 +1,117 @@
+# backend/routers/history.py
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from catalog.db import get_session
+from catalog.history import history_writer
+from catalog.models import QueryHistory
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+
+def _filters(stmt, database_id: Optional[str], caller: Optional[str], since_hours: Optional[float]):
+    if database_id:
+        stmt = stmt.where(QueryHistory.database_id == database_id)
+    if caller:
+        stmt = stmt.where(QueryHistory.caller == caller)
+    if since_hours:
+        since = (datetime.now(timezone.utc) - timedelta(hours=since_hours)).isoformat()
+        stmt = stmt.where(QueryHistory.executed_at >= since)
+    return stmt
+
+
+async def _top(session: AsyncSession, order, limit: int, database_id: Optional[str], caller: Optional[str],
+               since_hours: Optional[float]):
+    count = func.count(QueryHistory.id)
+    avg_ms = func.avg(QueryHistory.total_ms)
+    total_ms = func.sum(QueryHistory.total_ms)
+    stmt = select(
+        QueryHistory.fingerprint,
+        count.label("executions"),
+        avg_ms.label("avg_ms"),
+        func.max(QueryHistory.total_ms).label("max_ms"),
+        total_ms.label("total_ms"),
+        func.avg(QueryHistory.execute_ms).label("avg_execute_ms"),
+        func.avg(QueryHistory.queue_ms).label("avg_queue_ms"),
+        func.sum(QueryHistory.rows).label("rows"),
+        func.sum(QueryHistory.bytes).label("bytes"),
+        func.sum(case((QueryHistory.ok == False, 1), else_=0)).label("errors"),    # noqa: E712
+        func.sum(case((QueryHistory.cache_hit == True, 1), else_=0)).label("cache_hits"),    # noqa: E712
+        func.max(QueryHistory.sql_text).label("sql"),
+        func.max(QueryHistory.executed_at).label("last_executed_at"),
+    ).group_by(QueryHistory.fingerprint)
+    stmt = _filters(stmt, database_id, caller, since_hours)
+    order_by = {"slowest": avg_ms, "frequent": count, "expensive": total_ms}[order]
+    rows = (await session.execute(stmt.order_by(order_by.desc()).limit(limit))).mappings().all()
+    return {
+        "by": order,
+        "fingerprints": [
+            {**r, "avg_ms": round(r["avg_ms"] or 0, 2), "total_ms": round(r["total_ms"] or 0, 2),
+             "avg_execute_ms": round(r["avg_execute_ms"], 2) if r["avg_execute_ms"] is not None else None,
+             "avg_queue_ms": round(r["avg_queue_ms"], 2) if r["avg_queue_ms"] is not None else None}
+            for r in rows
+        ],
+    }
+
+
+@router.get("/queries")
+async def recent_queries(
+    limit: int = Query(100, ge=1, le=1000),
+    database_id: Optional[str] = Query(None, alias="databaseId"),
+    caller: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+    since_hours: Optional[float] = Query(None, alias="sinceHours"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Most recent executions, newest first."""
+    stmt = _filters(select(QueryHistory), database_id, caller, since_hours)
+    if fingerprint:
+        stmt = stmt.where(QueryHistory.fingerprint == fingerprint)
+    rows = (await session.execute(stmt.order_by(QueryHistory.executed_at.desc()).limit(limit))).scalars().all()
+    return {"queries": [r.model_dump() for r in rows]}
+
+
+@router.get("/slowest")
+async def slowest_queries(
+    limit: int = Query(20, ge=1, le=500),
+    database_id: Optional[str] = Query(None, alias="databaseId"),
+    caller: Optional[str] = None,
+    since_hours: Optional[float] = Query(24, alias="sinceHours"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Fingerprints with the highest average total time."""
+    return await _top(session, "slowest", limit, database_id, caller, since_hours)
+
+
+@router.get("/frequent")
+async def frequent_queries(
+    limit: int = Query(20, ge=1, le=500),
+    database_id: Optional[str] = Query(None, alias="databaseId"),
+    caller: Optional[str] = None,
+    since_hours: Optional[float] = Query(24, alias="sinceHours"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Fingerprints executed most often."""
+    return await _top(session, "frequent", limit, database_id, caller, since_hours)
+
+
+@router.get("/expensive")
+async def expensive_queries(
+    limit: int = Query(20, ge=1, le=500),
+    database_id: Optional[str] = Query(None, alias="databaseId"),
+    caller: Optional[str] = None,
+    since_hours: Optional[float] = Query(24, alias="sinceHours"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Fingerprints with the most total time spent (executions x duration)."""
+    return await _top(session, "expensive", limit, database_id, caller, since_hours)
+
+
+@router.get("/writer")
+async def history_writer_stats():
+    return history_writer.stats()
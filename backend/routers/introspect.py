@@ -7,6 +7,7 @@ from catalog.db import get_session
 from catalog.models import SqlEndpoint, Schema, Table, Column
 from catalog.upsert import upsert_schemas, upsert_tables, upsert_columns
 from sql.odbc import fetch_schemata, fetch_tables, fetch_columns
+from sql.cache import result_cache
 
 router = APIRouter(prefix="/workspaces/{workspace_id}/sqldb/{database_id}", tags=["introspect"])
 
@@ -116,6 +117,8 @@ async def refresh_introspect(
                     "sampled_at": _now()
                 } for r in cols_raw])
         await session.commit()
+        # schema may have changed under cached results
+        result_cache.invalidate(database_id)
         return {"status": "success", "message": f"Introspection refreshed for database {database_id}"}
     except Exception as e:
         # clean message if endpoint/capacity perms hiccup mid-scan
@@ -0,0 +1,17 @@
+# backend/routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from sql.metrics import metrics
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """SQL phase histograms and row/byte/error counters in Prometheus text format."""
+    return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/sql")
+async def sql_metrics():
+    """Per-phase latency summaries (p50/p95/p99 are bucket upper bounds), totals, and recent executions."""
+    return metrics.summary()
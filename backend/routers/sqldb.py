@@ -1,7 +1,9 @@
 # backend/routers/sqldb.py
 import re
 from contextlib import asynccontextmanager
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import AsyncIterator, List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select, delete
 
@@ -9,6 +11,9 @@ from catalog.db import get_session
 from catalog.models import SqlEndpoint
 from catalog.upsert import upsert_sql_endpoints
 from clients.fabric import resolve_sql_endpoints_for_workspace
+from settings import settings
+from sql.fanout import FanoutTarget, fan_out
+from sql.http import check_read_only, ndjson_line
 
 UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.I)
 
@@ -69,6 +74,58 @@ async def refresh_sqldb(workspace_id: str, session: AsyncSession = Depends(get_s
     return {"status": "success", "message": f"SQL databases refreshed for workspace {workspace_id}", "count": len(rows)}
 
 
+async def _stream_fanout(targets: List[FanoutTarget], missing: List[str], sql_txt: str, params: tuple,
+                         max_rows: int, use_cache: bool) -> AsyncIterator[bytes]:
+    ok, failed = 0, len(missing)
+    for db_id in missing:
+        yield ndjson_line({"databaseId": db_id, "databaseName": None, "status": "error",
+                       "error": "SQL endpoint not found in this workspace."})
+    async for res in fan_out(targets, sql_txt, params, max_rows=max_rows,
+                             concurrency=settings.sql_fanout_concurrency, use_cache=use_cache):
+        if res["status"] == "ok":
+            ok += 1
+        else:
+            failed += 1
+        yield ndjson_line(res)
+    yield ndjson_line({"summary": {"databases": len(targets) + len(missing), "ok": ok, "failed": failed}})
+
+
+@router.post("/fanout")
+async def fanout_query(
+    workspace_id: str,
+    body: dict = Body(..., example={"sql": "SELECT COUNT(*) AS n FROM [dbo].[Orders]", "databaseIds": ["<id-1>", "<id-2>"], "maxRows": 1000}),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Run one read-only query against several databases of this workspace concurrently.
+    Streams NDJSON: one line per database as it finishes (status ok|error), then a summary line.
+    Omitting databaseIds targets every SQL endpoint cached for the workspace.
+    """
+    sql_txt = (body.get("sql") or "").strip()
+    params = tuple(body.get("params") or [])
+    max_rows = int(body.get("maxRows") or 1000)
+    check_read_only(sql_txt)
+
+    eps = (await session.execute(
+        select(SqlEndpoint).where(SqlEndpoint.workspace_id == workspace_id)
+    )).scalars().all()
+    by_id = {ep.database_id: ep for ep in eps}
+    wanted = body.get("databaseIds") or list(by_id)
+    if not wanted:
+        raise HTTPException(404, "No SQL endpoints cached for this workspace. Try /sqldb?fresh=1 or /sqldb/refresh.")
+
+    targets, missing = [], []
+    for db_id in dict.fromkeys(wanted):
+        ep = by_id.get(db_id)
+        if ep is None:
+            missing.append(db_id)
+        else:
+            targets.append(FanoutTarget(db_id, ep.name, ep.server, ep.database, ep.port or 1433))
+    use_cache = body.get("cache", True) is not False
+    return StreamingResponse(_stream_fanout(targets, missing, sql_txt, params, max_rows, use_cache),
+                             media_type="application/x-ndjson")
+
+
 @router.get("/{database_id}")
 async def get_sqldb(
     workspace_id: str,
@@ -1,4 +1,5 @@
 # fabric_explorer/settings.py
+from typing import Dict, List, Optional
 from pydantic import Field, AnyUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,8 +20,132 @@ class Settings(BaseSettings):
     # Catalog DB
     catalog_db_url: str = Field("sqlite+aiosqlite:///./catalog.db", alias="CATALOG_DB_URL")
     
+    # SQL connection pool (sql/pool.py)
+    sql_pool_enabled: bool = Field(True, alias="SQL_POOL_ENABLED")
+    sql_pool_min_size: int = Field(0, alias="SQL_POOL_MIN_SIZE", description="Idle connections kept per host")
+    sql_pool_max_size: int = Field(8, alias="SQL_POOL_MAX_SIZE", description="Open connections per host")
+    sql_pool_idle_timeout: int = Field(300, alias="SQL_POOL_IDLE_TIMEOUT", description="Seconds")
+    sql_pool_acquire_timeout: int = Field(30, alias="SQL_POOL_ACQUIRE_TIMEOUT", description="Seconds")
+    sql_pool_health_check_after: int = Field(30, alias="SQL_POOL_HEALTH_CHECK_AFTER", description="Ping connections idle longer than this (seconds) on checkout")
+    sql_pool_token_margin: int = Field(300, alias="SQL_POOL_TOKEN_MARGIN", description="Recycle connections this many seconds before their access token expires")
+    sql_pool_switch_database: bool = Field(True, alias="SQL_POOL_SWITCH_DATABASE", description="Re-target pooled connections with USE instead of opening one per database")
+    sql_pool_switch_hosts: str = Field(".datawarehouse.fabric.microsoft.com", alias="SQL_POOL_SWITCH_HOSTS", description="Comma-separated host suffixes where USE switching is attempted")
+
+    # Execution backend (sql/odbc.py): "odbc" talks to Fabric / SQL Server; "local" is the in-process
+    # stand-in from sql/standin.py (synthetic AdventureWorksLT data, no driver or AAD) for benchmarks
+    sql_backend: str = Field("odbc", alias="SQL_BACKEND")
+    sql_local_db_path: Optional[str] = Field(None, alias="SQL_LOCAL_DB_PATH", description="Directory for the stand-in's SQLite files, built on first use (default: a temp directory)")
+    sql_local_scale: int = Field(1, alias="SQL_LOCAL_SCALE", description="Multiplier for the synthetic row counts (1 = ~2k orders, ~9k order lines)")
+    sql_local_connect_ms: float = Field(200, alias="SQL_LOCAL_CONNECT_MS", description="Simulated login time per new connection")
+    sql_local_latency_ms: float = Field(20, alias="SQL_LOCAL_LATENCY_MS", description="Simulated round trip per statement")
+    sql_local_jitter_ms: float = Field(5, alias="SQL_LOCAL_JITTER_MS")
+    sql_local_rows_per_second: float = Field(0, alias="SQL_LOCAL_ROWS_PER_SECOND", description="Fetch throughput cap per cursor; 0 = unlimited")
+    sql_local_max_concurrency: int = Field(0, alias="SQL_LOCAL_MAX_CONCURRENCY", description="Statements the simulated server executes at once; 0 = unlimited")
+
+    # Streaming fetch (sql/odbc.py iter_query)
+    sql_stream_batch_rows: int = Field(1000, alias="SQL_STREAM_BATCH_ROWS", description="Rows in the first fetchmany batch")
+    sql_stream_min_batch_rows: int = Field(100, alias="SQL_STREAM_MIN_BATCH_ROWS")
+    sql_stream_max_batch_rows: int = Field(50000, alias="SQL_STREAM_MAX_BATCH_ROWS")
+    sql_stream_batch_bytes: int = Field(2 * 1024 * 1024, alias="SQL_STREAM_BATCH_BYTES", description="Approximate target size of one batch")
+
+    # Value conversion at fetch time for JSON results (sql/converters.py): "python" keeps pyodbc's Decimal /
+    # datetime objects, "fast" converts to float/int and ISO strings, "exact" also keeps decimals as exact strings
+    sql_output_mode: str = Field("fast", alias="SQL_OUTPUT_MODE", description="python | fast | exact; /query and /aggregate can override per request")
+
+    # ODBC executor (sql/executor.py). Caller caps sum to the global cap so no class starves another.
+    sql_exec_max_workers: int = Field(32, alias="SQL_EXEC_MAX_WORKERS", description="Global cap on concurrent ODBC work")
+    sql_exec_per_server: int = Field(8, alias="SQL_EXEC_PER_SERVER", description="Concurrent ODBC work per SQL host")
+    sql_exec_caller_limits: Dict[str, int] = Field(
+        {"query": 10, "agent": 7, "introspect": 5, "probe": 2, "export": 3, "job": 4, "heavy": 1},
+        alias="SQL_EXEC_CALLER_LIMITS",
+        description='JSON map of caller -> cap, e.g. {"query": 16, "probe": 2}',
+    )
+    sql_exec_queue_timeout: float = Field(30, alias="SQL_EXEC_QUEUE_TIMEOUT", description="Seconds a query may wait for a slot")
+    sql_exec_cancel_grace: float = Field(10, alias="SQL_EXEC_CANCEL_GRACE", description="Seconds a cancelled statement keeps its slot while its worker thread stops")
+
+    # Fair share (sql/fairshare.py): weighted fair queuing per session / user ahead of the executor, one queue
+    # per (server, lane). Sessions are keyed by the client-supplied X-Session-Id / X-User-Id headers (trusted as sent)
+    sql_fair_enabled: bool = Field(True, alias="SQL_FAIR_ENABLED")
+    sql_fair_per_key_limit: int = Field(4, alias="SQL_FAIR_PER_KEY_LIMIT", description="Statements one session may run at once per server and lane")
+    sql_fair_max_queue_per_key: int = Field(32, alias="SQL_FAIR_MAX_QUEUE_PER_KEY", description="Statements one session may have queued; more get HTTP 429")
+    sql_fair_max_queue_total: int = Field(512, alias="SQL_FAIR_MAX_QUEUE_TOTAL")
+    sql_fair_weights: Dict[str, float] = Field(
+        {},
+        alias="SQL_FAIR_WEIGHTS",
+        description='JSON map of session key -> weight (default 1), e.g. {"session:etl": 0.5}',
+    )
+    sql_fair_exempt_callers: List[str] = Field(["probe", "job"], alias="SQL_FAIR_EXEMPT_CALLERS", description="Callers that bypass fair share (jobs have their own worker cap)")
+
+    # Cost guard (sql/costguard.py): estimated plan checked before /query and sql_select_tool run. Each estimate
+    # is an extra round trip holding an executor slot and a pooled connection, so a guarded query costs two checkouts
+    sql_cost_guard_mode: str = Field("off", alias="SQL_COST_GUARD_MODE", description="off | reject | queue | limit")
+    sql_cost_guard_callers: List[str] = Field(["query", "agent"], alias="SQL_COST_GUARD_CALLERS")
+    sql_cost_max_subtree_cost: float = Field(500.0, alias="SQL_COST_MAX_SUBTREE_COST", description="Optimizer cost units; 0 disables the check")
+    sql_cost_max_est_rows: int = Field(10_000_000, alias="SQL_COST_MAX_EST_ROWS", description="0 disables the check")
+    sql_cost_limit_rows: int = Field(10000, alias="SQL_COST_LIMIT_ROWS", description="TOP injected in limit mode")
+    sql_cost_estimate_timeout: float = Field(15, alias="SQL_COST_ESTIMATE_TIMEOUT", description="Seconds the plan estimate may take")
+    sql_cost_estimate_timeout_policy: str = Field("heavy", alias="SQL_COST_ESTIMATE_TIMEOUT_POLICY",
+                                                  description="allow | heavy | reject: what a statement whose estimate timed out does")
+    sql_cost_queue_timeout: float = Field(600, alias="SQL_COST_QUEUE_TIMEOUT", description="Seconds a queued heavy query may wait for the heavy lane")
+
+    sql_fanout_concurrency: int = Field(8, alias="SQL_FANOUT_CONCURRENCY", description="Databases queried at once by /sqldb/fanout")
+    # Federated queries (sql/federated.py, needs duckdb)
+    sql_federated_memory_limit: str = Field("1GB", alias="SQL_FEDERATED_MEMORY_LIMIT", description="DuckDB memory_limit; beyond it DuckDB spills to disk")
+    sql_federated_threads: int = Field(4, alias="SQL_FEDERATED_THREADS")
+    sql_federated_timeout: int = Field(600, alias="SQL_FEDERATED_TIMEOUT", description="Statement timeout per source (seconds)")
+    sql_federated_source_max_rows: int = Field(5_000_000, alias="SQL_FEDERATED_SOURCE_MAX_ROWS", description="Rows fetched per source unless the source sets maxRows")
+    sql_export_timeout: int = Field(3600, alias="SQL_EXPORT_TIMEOUT", description="Statement timeout for /export (seconds)")
+
+    # Asynchronous query jobs (sql/jobs.py)
+    sql_jobs_max_workers: int = Field(4, alias="SQL_JOBS_MAX_WORKERS", description="Jobs executing at once; the rest wait queued")
+    sql_jobs_max_pending: int = Field(100, alias="SQL_JOBS_MAX_PENDING", description="Queued + running jobs before new submissions are refused")
+    sql_jobs_ttl: int = Field(900, alias="SQL_JOBS_TTL", description="Seconds a finished job and its results are kept")
+    sql_jobs_max_rows: int = Field(1_000_000, alias="SQL_JOBS_MAX_ROWS", description="Rows retained per job")
+    sql_jobs_timeout: int = Field(3600, alias="SQL_JOBS_TIMEOUT", description="Seconds a job query may run")
+
+    # Result cache (sql/cache.py)
+    sql_cache_enabled: bool = Field(True, alias="SQL_CACHE_ENABLED")
+    sql_cache_ttl: int = Field(60, alias="SQL_CACHE_TTL", description="Seconds a cached result stays valid")
+    sql_cache_ttl_overrides: Dict[str, int] = Field(
+        {},
+        alias="SQL_CACHE_TTL_OVERRIDES",
+        description='JSON map of database_id -> TTL seconds (0 disables caching for that database)',
+    )
+    sql_cache_max_bytes: int = Field(64 * 1024 * 1024, alias="SQL_CACHE_MAX_BYTES", description="Compressed size of all entries")
+    sql_cache_max_entry_bytes: int = Field(8 * 1024 * 1024, alias="SQL_CACHE_MAX_ENTRY_BYTES", description="Larger results are not cached")
+
+    # Spill-to-disk result buffering (sql/spill.py)
+    sql_spill_threshold_bytes: int = Field(64 * 1024 * 1024, alias="SQL_SPILL_THRESHOLD_BYTES", description="Approximate in-memory size of one result before it moves to a temp Arrow file (0 = never spill)")
+    sql_spill_dir: str = Field("", alias="SQL_SPILL_DIR", description="Directory for spill files (default: system temp dir)")
+
+    # Single-flight (sql/singleflight.py): identical concurrent queries share one execution
+    sql_singleflight_enabled: bool = Field(True, alias="SQL_SINGLEFLIGHT_ENABLED")
+
+    # Table previews (GET .../tables/{table}/preview), cached in the catalog DB
+    sql_preview_rows: int = Field(50, alias="SQL_PREVIEW_ROWS", description="Rows returned when the request doesn't say")
+    sql_preview_max_rows: int = Field(1000, alias="SQL_PREVIEW_MAX_ROWS")
+    sql_preview_stale_after: int = Field(900, alias="SQL_PREVIEW_STALE_AFTER", description="Seconds before a cached preview is refreshed in the background")
+
+    # Query history (catalog DB table queryhistory), written in batches off the request path
+    sql_history_enabled: bool = Field(True, alias="SQL_HISTORY_ENABLED")
+    sql_history_flush_interval: float = Field(2.0, alias="SQL_HISTORY_FLUSH_INTERVAL", description="Seconds between batched writes")
+    sql_history_batch_size: int = Field(500, alias="SQL_HISTORY_BATCH_SIZE")
+    sql_history_max_pending: int = Field(10000, alias="SQL_HISTORY_MAX_PENDING", description="Records buffered before the oldest are dropped")
+    sql_history_retention_days: int = Field(14, alias="SQL_HISTORY_RETENTION_DAYS")
+    sql_history_max_sql_chars: int = Field(4000, alias="SQL_HISTORY_MAX_SQL_CHARS")
+
+    # Connection warm-up (catalog/warmup.py): keep a pooled connection open for recently used endpoints
+    sql_warmup_enabled: bool = Field(True, alias="SQL_WARMUP_ENABLED")
+    sql_warmup_max_endpoints: int = Field(8, alias="SQL_WARMUP_MAX_ENDPOINTS", description="Endpoints kept warm, most recently used first")
+    sql_warmup_recent_hours: float = Field(24, alias="SQL_WARMUP_RECENT_HOURS", description="Only endpoints used within this window are warmed")
+    sql_warmup_interval: int = Field(120, alias="SQL_WARMUP_INTERVAL", description="Seconds between keepalive pings; keep below SQL_POOL_IDLE_TIMEOUT")
+    sql_warmup_ping_timeout: int = Field(45, alias="SQL_WARMUP_PING_TIMEOUT", description="Seconds, including a fresh login")
+    sql_warmup_max_backoff: int = Field(1800, alias="SQL_WARMUP_MAX_BACKOFF", description="Longest wait (seconds) before retrying a failing or paused endpoint")
+    sql_warmup_concurrency: int = Field(2, alias="SQL_WARMUP_CONCURRENCY")
+
     # Backend HTTP base URL for agent tools
     backend_base: str = Field("http://127.0.0.1:8000", alias="BACKEND_BASE")
+    agent_max_rows: int = Field(1000, alias="AGENT_MAX_ROWS", description="Row cap for sql_select_tool results")
 
     # Azure OpenAI
     azure_openai_api_key: str = Field(..., alias="AZURE_OPENAI_API_KEY")
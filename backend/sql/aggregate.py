@@ -0,0 +1,206 @@
+# backend/sql/aggregate.py
+"""
+Server-side aggregation for charts.
+
+An aggregate request names a table, the dimensions to group by (optionally one
+time column truncated to a grain), the measures, and filters. It becomes a single
+parameterized statement
+
+    SELECT DATETRUNC(month, [ts]) AS [month], [region], SUM([amount]) AS [sum_amount]
+    FROM [dbo].[sales]
+    WHERE [ts] >= ? AND [region] IN (?, ?)
+    GROUP BY DATETRUNC(month, [ts]), [region]
+    ORDER BY [month], [region]
+
+so only one row per group crosses the network. Identifiers are bracket-quoted
+and every value is a bound parameter; function names, operators and grains come
+from fixed lists.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+MEASURE_FUNCTIONS = {
+    "sum": "SUM({})",
+    "avg": "AVG(CAST({} AS float))",       # AVG over an int column would truncate
+    "min": "MIN({})",
+    "max": "MAX({})",
+    "count": "COUNT({})",
+    "count_distinct": "COUNT(DISTINCT {})",
+}
+FILTER_OPERATORS = ("=", "!=", "<>", "<", "<=", ">", ">=", "in", "not in", "between", "like", "is null", "is not null")
+TIME_GRAINS = ("year", "quarter", "month", "week", "day", "hour", "minute")
+MAX_IN_VALUES = 1000
+
+_ALIAS_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_ ]{0,127}$")
+_NOT_ALIAS_CHARS = re.compile(r"[^A-Za-z0-9_]")
+
+
+class AggregateSpecError(ValueError):
+    pass
+
+
+def _quote(ident: str) -> str:
+    ident = (ident or "").strip()
+    if ident.startswith("[") and ident.endswith("]"):
+        ident = ident[1:-1]
+    if not ident or "\x00" in ident:
+        raise AggregateSpecError(f"Invalid identifier: {ident!r}")
+    return "[" + ident.replace("]", "]]") + "]"
+
+
+def _quote_table(table: str) -> str:
+    parts = [p for p in re.split(r"\.(?![^\[]*\])", (table or "").strip()) if p]
+    if not 1 <= len(parts) <= 3:
+        raise AggregateSpecError(f"Invalid table name: {table!r} (expected schema.table)")
+    return ".".join(_quote(p) for p in parts)
+
+
+def _alias(name: str) -> str:
+    if not _ALIAS_RE.match(name):
+        raise AggregateSpecError(f"Invalid alias: {name!r}")
+    return _quote(name)
+
+
+@dataclass
+class Measure:
+    fn: str
+    column: str = "*"
+    alias: Optional[str] = None
+
+    def name(self) -> str:
+        if self.alias:
+            return self.alias
+        if self.column == "*":
+            return self.fn
+        # Generated from the column name, so make it a valid alias: [Order-Total] -> sum_Order_Total
+        return f"{self.fn}_{_NOT_ALIAS_CHARS.sub('_', self.column.strip().strip('[]'))}"[:128]
+
+
+@dataclass
+class Filter:
+    column: str
+    op: str
+    value: Any = None
+
+
+@dataclass
+class TimeBucket:
+    column: str
+    grain: str
+    alias: Optional[str] = None
+
+    def name(self) -> str:
+        return self.alias or self.grain
+
+
+@dataclass
+class AggregateSpec:
+    table: str
+    group_by: List[str] = field(default_factory=list)
+    measures: List[Measure] = field(default_factory=list)
+    filters: List[Filter] = field(default_factory=list)
+    time_bucket: Optional[TimeBucket] = None
+    limit: int = 1000
+
+
+def parse_spec(body: Dict[str, Any]) -> AggregateSpec:
+    """Build a spec from the JSON body of POST .../aggregate (camelCase keys)."""
+    try:
+        measures = [Measure(fn=str(m.get("fn", "")).lower(), column=m.get("column") or "*", alias=m.get("as"))
+                    for m in body.get("measures") or []]
+        filters = [Filter(column=f["column"], op=str(f.get("op", "=")).lower(), value=f.get("value"))
+                   for f in body.get("filters") or []]
+        tb = body.get("timeBucket")
+        time_bucket = TimeBucket(column=tb["column"], grain=str(tb.get("grain", "day")).lower(), alias=tb.get("as")) \
+            if tb else None
+    except (KeyError, TypeError, AttributeError) as e:
+        raise AggregateSpecError(f"Malformed aggregate request: {e}")
+    group_by = body.get("groupBy") or []
+    if not isinstance(group_by, list) or not all(isinstance(c, str) for c in group_by):
+        raise AggregateSpecError("groupBy must be a list of column names")
+    try:
+        limit = int(body.get("limit") or 1000)
+    except (TypeError, ValueError):
+        raise AggregateSpecError(f"limit must be an integer, got {body.get('limit')!r}")
+    return AggregateSpec(
+        table=body.get("table") or "",
+        group_by=group_by,
+        measures=measures or [Measure("count")],
+        filters=filters,
+        time_bucket=time_bucket,
+        limit=limit,
+    )
+
+
+def _filter_sql(f: Filter, params: List[Any]) -> str:
+    col = _quote(f.column)
+    op = f.op
+    if op not in FILTER_OPERATORS:
+        raise AggregateSpecError(f"Unsupported filter operator {op!r}; use one of {', '.join(FILTER_OPERATORS)}")
+    if op in ("is null", "is not null"):
+        return f"{col} {op.upper()}"
+    if op in ("in", "not in"):
+        values = f.value if isinstance(f.value, list) else [f.value]
+        if not values or len(values) > MAX_IN_VALUES:
+            raise AggregateSpecError(f"'{op}' on {f.column} needs 1..{MAX_IN_VALUES} values")
+        params.extend(values)
+        return f"{col} {op.upper()} ({', '.join('?' for _ in values)})"
+    if op == "between":
+        if not isinstance(f.value, list) or len(f.value) != 2:
+            raise AggregateSpecError(f"'between' on {f.column} needs [low, high]")
+        params.extend(f.value)
+        return f"{col} BETWEEN ? AND ?"
+    params.append(f.value)
+    return f"{col} {op.upper()} ?"
+
+
+def build_sql(spec: AggregateSpec) -> Tuple[str, List[Any], List[str], List[str]]:
+    """(statement, params, dimension names, measure names)."""
+    if spec.limit < 1:
+        raise AggregateSpecError("limit must be positive")
+    select: List[str] = []
+    group: List[str] = []
+    order: List[str] = []
+    dims: List[str] = []
+
+    if spec.time_bucket:
+        tb = spec.time_bucket
+        if tb.grain not in TIME_GRAINS:
+            raise AggregateSpecError(f"Unsupported grain {tb.grain!r}; use one of {', '.join(TIME_GRAINS)}")
+        expr = f"DATETRUNC({tb.grain}, {_quote(tb.column)})"
+        select.append(f"{expr} AS {_alias(tb.name())}")
+        group.append(expr)
+        order.append(_alias(tb.name()))
+        dims.append(tb.name())
+    for col in spec.group_by:
+        select.append(_quote(col))
+        group.append(_quote(col))
+        dims.append(col.strip("[]"))
+
+    names: List[str] = []
+    for m in spec.measures:
+        if m.fn not in MEASURE_FUNCTIONS:
+            raise AggregateSpecError(f"Unsupported measure {m.fn!r}; use one of {', '.join(MEASURE_FUNCTIONS)}")
+        if m.column == "*" and m.fn != "count":
+            raise AggregateSpecError(f"Measure '{m.fn}' needs a column")
+        arg = "*" if m.column == "*" else _quote(m.column)
+        select.append(f"{MEASURE_FUNCTIONS[m.fn].format(arg)} AS {_alias(m.name())}")
+        names.append(m.name())
+    if len(set(n.lower() for n in dims + names)) != len(dims + names):
+        raise AggregateSpecError("Output column names must be unique; set 'as' on measures or the time bucket")
+
+    params: List[Any] = []
+    where = [_filter_sql(f, params) for f in spec.filters]
+
+    sql = f"SELECT {', '.join(select)} FROM {_quote_table(spec.table)}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group:
+        sql += " GROUP BY " + ", ".join(group)
+    if spec.time_bucket:
+        # A time series reads left to right; other groups are ordered like a chart legend.
+        sql += " ORDER BY " + ", ".join(order + [_quote(c) for c in spec.group_by])
+    elif group:
+        sql += f" ORDER BY {_alias(names[0])} DESC"
+    return sql, params, dims, names
@@ -0,0 +1,152 @@
+# backend/sql/arrow.py
+"""
+Apache Arrow view of ODBC results.
+
+Rows come off the cursor as tuples; here they are transposed once per batch into
+typed Arrow columns picked from cursor.description, so consumers (IPC responses,
+forecasting, exports) never touch per-cell Python objects again.
+
+pyarrow is optional: it is imported on first use and a clear error is raised if
+it is missing.
+"""
+import datetime as dt
+import decimal
+import uuid
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+from sql.odbc import RowStream, iter_query
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# IPC end-of-stream marker: continuation token followed by a zero metadata length
+_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("Arrow output requires the 'pyarrow' package (pip install pyarrow).") from e
+    return pyarrow
+
+
+def arrow_type(type_code: Any, precision: Optional[int], scale: Optional[int]):
+    pa = require_pyarrow()
+    if type_code is bool:
+        return pa.bool_()
+    if type_code is int:
+        return pa.int64()
+    if type_code is float:
+        return pa.float64()
+    if type_code is decimal.Decimal:
+        if precision and 0 < precision <= 38:
+            return pa.decimal128(precision, scale or 0)
+        return pa.string()
+    if type_code is dt.datetime:
+        return pa.timestamp("us")
+    if type_code is dt.date:
+        return pa.date32()
+    if type_code is dt.time:
+        return pa.time64("us")
+    if type_code in (bytes, bytearray):
+        return pa.binary()
+    return pa.string()
+
+
+def schema_from_description(description: Sequence[Tuple[Any, ...]]):
+    pa = require_pyarrow()
+    return pa.schema([
+        pa.field(d[0] or f"col{i}", arrow_type(d[1], d[4], d[5]), nullable=True)
+        for i, d in enumerate(description)
+    ])
+
+
+def _to_array(values: List[Any], typ):
+    pa = require_pyarrow()
+    try:
+        return pa.array(values, type=typ)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+        pass
+    if pa.types.is_string(typ):
+        return pa.array([None if v is None else str(v) for v in values], type=typ)
+    # Driver handed back something the declared type can't hold; degrade the column to text.
+    return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def record_batch(schema, rows: Sequence[Sequence[Any]]):
+    """Transpose one batch of row tuples into a RecordBatch matching `schema`."""
+    pa = require_pyarrow()
+    if not rows:
+        return pa.RecordBatch.from_arrays([pa.array([], type=f.type) for f in schema], schema=schema)
+    columns = list(zip(*rows))
+    arrays = []
+    fields = []
+    for field, values in zip(schema, columns):
+        values = list(values)
+        if pa.types.is_string(field.type) and values and isinstance(next((v for v in values if v is not None), None), uuid.UUID):
+            values = [None if v is None else str(v) for v in values]
+        arr = _to_array(values, field.type)
+        arrays.append(arr)
+        fields.append(field if arr.type == field.type else field.with_type(arr.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def conform_batch(rb, schema):
+    """Cast `rb` onto `schema` (the first batch's) when a later batch's types drifted."""
+    if rb.schema == schema:
+        return rb
+    pa = require_pyarrow()
+    try:
+        return pa.Table.from_batches([rb]).cast(schema).combine_chunks().to_batches()[0]
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise RuntimeError(f"Column types changed mid-result and could not be reconciled: {e}") from e
+
+
+async def iter_record_batches(stream: RowStream, max_rows: Optional[int] = None) -> AsyncIterator[Any]:
+    """
+    Re-shape an opened RowStream into RecordBatches (at most max_rows rows in total).
+    Every batch shares the schema of the first one, so they can go into one IPC stream.
+    """
+    declared = schema_from_description(stream.description or ())
+    schema = None
+    sent = 0
+    async for batch in stream:
+        if max_rows is not None:
+            batch = batch[: max_rows - sent]
+        if batch:
+            sent += len(batch)
+            rb = record_batch(declared, batch)
+            if schema is None:
+                schema = rb.schema
+            else:
+                rb = conform_batch(rb, schema)
+            yield rb
+        if max_rows is not None and sent >= max_rows:
+            return
+
+
+async def query_arrow(server: str, database: str, port: int, sql: str,
+                      params: Optional[Tuple[Any, ...]] = None,
+                      timeout: int = 60,
+                      max_rows: Optional[int] = None):
+    """Run a query and return a pyarrow.Table (columns typed from the cursor description)."""
+    pa = require_pyarrow()
+    async with iter_query(server, database, port, sql, params, timeout, max_rows=max_rows) as stream:
+        schema = schema_from_description(stream.description or ())
+        batches = [b async for b in iter_record_batches(stream, max_rows)]
+    if not batches:
+        return schema.empty_table()
+    return pa.Table.from_batches(batches)
+
+
+# ---------- IPC stream encoding ----------
+
+def ipc_schema_message(schema) -> bytes:
+    return schema.serialize().to_pybytes()
+
+
+def ipc_batch_message(batch) -> bytes:
+    return batch.serialize().to_pybytes()
+
+
+def ipc_end_of_stream() -> bytes:
+    return _EOS
@@ -0,0 +1,235 @@
+# backend/sql/cache.py
+"""
+Result cache for read-only queries.
+
+Entries are keyed by (database_id, normalized SQL, params, row cap) and hold the
+columns plus zlib-compressed pickled rows. The cache is bounded by the compressed
+size of its entries (LRU eviction) and every entry expires after the TTL of its
+database (SQL_CACHE_TTL, overridable per database via SQL_CACHE_TTL_OVERRIDES).
+Refreshing a database's catalog drops all of its entries.
+
+Only single SELECT statements without non-deterministic functions are cached.
+Misses of cacheable statements go through single-flight, so identical queries
+arriving together run once; cache:false requests and uncacheable statements
+always run on their own.
+"""
+import asyncio
+import hashlib
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+
+from settings import settings
+from sql.odbc import exec_query
+from sql.costguard import admit
+from sql.fairshare import SHARED, session_key
+from sql.registry import QueryCancelled, registry
+from sql.singleflight import singleflight
+from sql.rewrite import tokenize, strip_trailing_semicolons, main_select_index, is_single_statement
+
+_NON_DETERMINISTIC = {
+    "GETDATE", "GETUTCDATE", "SYSDATETIME", "SYSUTCDATETIME", "SYSDATETIMEOFFSET", "CURRENT_TIMESTAMP",
+    "NEWID", "NEWSEQUENTIALID", "RAND", "CRYPT_GEN_RANDOM", "TABLESAMPLE",
+}
+
+
+def normalize_sql(sql: str) -> str:
+    """Whitespace and comments collapsed; literals and identifiers untouched (collations may be case-sensitive)."""
+    return " ".join(t.text for t in tokenize(strip_trailing_semicolons(sql)))
+
+
+def is_cacheable(sql: str) -> bool:
+    tokens = tokenize(strip_trailing_semicolons(sql))
+    if not is_single_statement(tokens) or main_select_index(tokens) is None:
+        return False
+    return not any(t.kind == "word" and t.upper in _NON_DETERMINISTIC for t in tokens)
+
+
+@dataclass
+class _Entry:
+    database_id: str
+    columns: List[str]
+    blob: bytes
+    row_count: int
+    stored_at: float
+    expires_at: float
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: int, ttl_overrides: Dict[str, int]):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.ttl_overrides = dict(ttl_overrides)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, database_id: str) -> int:
+        return self.ttl_overrides.get(database_id, self.ttl)
+
+    @staticmethod
+    def key(database_id: str, sql: str, params: Tuple[Any, ...] = (), max_rows: Optional[int] = None,
+            output: str = "python") -> str:
+        raw = repr((database_id, normalize_sql(sql), tuple(params), max_rows, output)).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[str], List[Tuple[Any, ...]], float]]:
+        """(columns, rows, age_seconds) for a live entry, else None."""
+        now = time.time()
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e.expires_at <= now:
+                self._remove_locked(key)
+                e = None
+            if e is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return e.columns, pickle.loads(zlib.decompress(e.blob)), now - e.stored_at
+
+    def put(self, key: str, database_id: str, columns: List[str], rows: List[Tuple[Any, ...]]) -> bool:
+        ttl = self.ttl_for(database_id)
+        if ttl <= 0:
+            return False
+        blob = zlib.compress(pickle.dumps([tuple(r) for r in rows], protocol=pickle.HIGHEST_PROTOCOL), 1)
+        if len(blob) > min(self.max_entry_bytes, self.max_bytes):
+            return False
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = _Entry(database_id, list(columns), blob, len(rows), now, now + ttl)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove_locked(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def invalidate(self, database_id: str) -> int:
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e.database_id == database_id]
+            for k in keys:
+                self._remove_locked(k)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove_locked(self, key: str) -> None:
+        e = self._entries.pop(key)
+        self._bytes -= len(e.blob)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+result_cache = ResultCache(
+    max_bytes=settings.sql_cache_max_bytes,
+    max_entry_bytes=settings.sql_cache_max_entry_bytes,
+    ttl=settings.sql_cache_ttl,
+    ttl_overrides=settings.sql_cache_ttl_overrides,
+)
+
+
+async def cached_query(server: str, database: str, port: int, sql: str,
+                       params: Optional[Tuple[Any, ...]] = None,
+                       *,
+                       database_id: str,
+                       max_rows: Optional[int] = None,
+                       caller: str = "query",
+                       query_id: Optional[str] = None,
+                       use_cache: bool = True,
+                       guard: bool = False,
+                       output: str = "python") -> Tuple[List[str], List[Tuple[Any, ...]], Dict[str, Any]]:
+    """
+    exec_query through the result cache. Returns (columns, rows, info) where info is
+    {"hit": bool, "ageSeconds": float | None, "shared": bool, "admission": dict | None};
+    uncacheable statements always miss. "shared" means the rows came from an identical
+    query already running. The returned rows may be shared with other callers: copy
+    before mutating.
+
+    With guard=True a miss first goes through the cost guard (sql/costguard.py), which
+    may raise QueryTooExpensive, move the statement to the heavy lane, or limit it;
+    results of a limited statement are not cached under the original statement.
+
+    `output` is passed to exec_query and is part of the cache key, since it changes the values.
+    """
+    params = tuple(params or ())
+    key = result_cache.key(database_id, sql, params, max_rows, output)
+    cacheable = use_cache and settings.sql_cache_enabled and is_cacheable(sql)
+    if cacheable:
+        found = await anyio.to_thread.run_sync(result_cache.get, key)
+        if found is not None:
+            cols, rows, age = found
+            return cols, rows, {"hit": True, "ageSeconds": round(age, 3), "shared": False, "admission": None}
+
+    async def _execute(exec_id: Optional[str]):
+        admission = await admit(server, database, port, sql, params, caller=caller) if guard else None
+        cols, rows = await exec_query(server, database, port, admission.sql if admission else sql, params,
+                                      max_rows=max_rows, caller=admission.caller if admission else caller,
+                                      query_id=exec_id, database_id=database_id, output=output)
+        if cacheable and (admission is None or admission.action != "limited"):
+            await anyio.to_thread.run_sync(result_cache.put, key, database_id, cols, rows)
+        return cols, rows, admission.describe() if admission else None
+
+    async def _shared(flight: str):
+        # Its own fair-share flow, not that of whichever session arrived first (see sql/fairshare.py).
+        with session_key(f"{SHARED}:{flight[:16]}"):
+            return await _execute(None)
+
+    if cacheable and settings.sql_singleflight_enabled:
+        # The shared execution runs under an id of its own; the caller's query_id only names its wait.
+        # Callers only share it when it would run the same way for each of them: same lane, same guard.
+        waiter = registry.register(server, database, sql, caller=caller, query_id=query_id, database_id=database_id)
+        flight = f"{key}:{caller}:{int(guard)}"
+        (cols, rows, admission), shared = await _join(flight, lambda: _shared(flight), waiter)
+    else:
+        (cols, rows, admission), shared = await _execute(query_id), False
+    return cols, rows, {"hit": False, "ageSeconds": None, "shared": shared, "admission": admission}
+
+
+async def _join(key: str, fn, waiter) -> Tuple[Any, bool]:
+    """
+    singleflight.do() on behalf of one registered caller. Cancelling the caller's id
+    (DELETE .../query/{id}) ends its wait with QueryCancelled; the shared execution is
+    only cancelled once every caller has left.
+    """
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    done = False
+
+    def _cancel() -> None:
+        if not done:
+            task.cancel()
+    waiter.on_cancel = lambda: loop.call_soon_threadsafe(_cancel)
+    try:
+        return await singleflight.do(key, fn)
+    except asyncio.CancelledError:
+        if waiter.cancelled and task.cancelling() <= 1:
+            task.uncancel()
+            raise QueryCancelled(f"Query {waiter.query_id} was cancelled")
+        raise
+    finally:
+        done = True
+        registry.unregister(waiter.query_id)
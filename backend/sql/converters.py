@@ -0,0 +1,114 @@
+# backend/sql/converters.py
+"""
+Driver-level output converters.
+
+By default pyodbc builds a Decimal, datetime or UUID string for every DECIMAL /
+NUMERIC / MONEY, DATETIME(2) and UNIQUEIDENTIFIER cell, and the JSON encoder
+then converts each of those objects again. An output converter registered on the
+connection receives the driver's raw bytes (None for NULL) and returns the final
+value, so results bound for JSON skip both the intermediate object and the second
+pass.
+
+Converters are connection state, and pooled connections are shared between
+callers, so pooled_connection() applies the requested mode on every checkout
+(clearing whatever the previous user registered):
+
+    python   no converters: Decimal, datetime, str (pyodbc's defaults). Used for
+             Arrow, exports, paging keys and anything that binds values back
+             into a statement.
+    fast     DECIMAL/NUMERIC/MONEY -> int (scale 0) or float, DATETIME -> ISO 8601
+             string, UNIQUEIDENTIFIER -> upper-case string
+    exact    as fast, but decimals become exact strings ("1234.5600")
+
+JSON responses report precise_decimals(mode) as "preciseDecimals": true only
+when decimal values in the body are exact strings rather than numbers.
+"""
+import struct
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pyodbc
+
+OUTPUT_MODES = ("python", "fast", "exact")
+
+_TIMESTAMP = struct.Struct("<6hI")      # SQL_TIMESTAMP_STRUCT: year..second, fraction in ns
+_POW10 = [10 ** i for i in range(39)]
+
+
+def _numeric_parts(raw: bytes) -> Tuple[int, int]:
+    """(signed unscaled value, scale) of a decimal as the driver hands it over."""
+    if len(raw) == 19:
+        # SQL_NUMERIC_STRUCT: precision, scale, sign (1 = positive), 16-byte little-endian magnitude
+        mag = int.from_bytes(raw[3:], "little")
+        return (mag if raw[2] else -mag), raw[1]
+    if len(raw) == 8:
+        # money: high 4 bytes then low 4 bytes of a 64-bit value in units of 1/10000
+        hi, lo = struct.unpack("<iI", raw)
+        return (hi << 32) | lo, 4
+    if len(raw) == 4:
+        return struct.unpack("<i", raw)[0], 4       # smallmoney
+    text = raw.decode("ascii").strip()
+    whole, _, frac = text.partition(".")
+    return int(whole + frac), len(frac)
+
+
+def _decimal_fast(raw: Optional[bytes]) -> Any:
+    if raw is None:
+        return None
+    value, scale = _numeric_parts(raw)
+    return value if scale == 0 else value / _POW10[scale]
+
+
+def _decimal_exact(raw: Optional[bytes]) -> Optional[str]:
+    if raw is None:
+        return None
+    value, scale = _numeric_parts(raw)
+    digits = str(abs(value)).rjust(scale + 1, "0")
+    text = f"{digits[:-scale]}.{digits[-scale:]}" if scale else digits
+    return "-" + text if value < 0 else text
+
+
+def _timestamp_iso(raw: Optional[bytes]) -> Optional[str]:
+    if raw is None:
+        return None
+    y, mo, d, h, mi, s, ns = _TIMESTAMP.unpack(raw)
+    text = f"{y:04d}-{mo:02d}-{d:02d}T{h:02d}:{mi:02d}:{s:02d}"
+    return f"{text}.{ns // 1000:06d}" if ns // 1000 else text     # same text as datetime.isoformat()
+
+
+def _guid_str(raw: Optional[bytes]) -> Optional[str]:
+    # SQLGUID: Data1-3 little-endian, Data4 as stored
+    if raw is None:
+        return None
+    h = raw[3::-1].hex() + raw[5:3:-1].hex() + raw[7:5:-1].hex() + raw[8:].hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}".upper()
+
+
+_CONVERTERS: Dict[str, Dict[int, Callable[[bytes], Any]]] = {
+    "python": {},
+    "fast": {
+        pyodbc.SQL_DECIMAL: _decimal_fast,
+        pyodbc.SQL_NUMERIC: _decimal_fast,
+        pyodbc.SQL_TYPE_TIMESTAMP: _timestamp_iso,
+        pyodbc.SQL_GUID: _guid_str,
+    },
+}
+_CONVERTERS["exact"] = {**_CONVERTERS["fast"], pyodbc.SQL_DECIMAL: _decimal_exact, pyodbc.SQL_NUMERIC: _decimal_exact}
+
+
+def check_mode(mode: str) -> str:
+    if mode not in _CONVERTERS:
+        raise ValueError(f"Unknown output mode {mode!r}; use one of {', '.join(OUTPUT_MODES)}")
+    return mode
+
+
+def apply_output_mode(conn: Any, mode: str) -> None:
+    """Replace the connection's output converters with those of `mode`. Blocking-safe and cheap."""
+    converters = _CONVERTERS[check_mode(mode)]
+    conn.clear_output_converters()
+    for sql_type, fn in converters.items():
+        conn.add_output_converter(sql_type, fn)
+
+
+def precise_decimals(mode: str) -> bool:
+    """Whether decimals in a JSON result of this mode are exact strings (python-mode Decimals encode as floats)."""
+    return mode == "exact"
@@ -0,0 +1,227 @@
+# backend/sql/costguard.py
+"""
+Admission control from the optimizer's estimate.
+
+Before a guarded statement runs, its estimated plan is fetched with
+SET SHOWPLAN_XML ON (compiled, not executed) and its estimated subtree cost and
+row count are compared with SQL_COST_MAX_SUBTREE_COST / SQL_COST_MAX_EST_ROWS.
+What happens to a statement over either threshold depends on SQL_COST_GUARD_MODE:
+
+    off     no estimate is fetched
+    reject  QueryTooExpensive is raised, carrying the estimate
+    queue   the statement runs in the "heavy" executor lane (one at a time by default)
+    limit   TOP (SQL_COST_LIMIT_ROWS) is pushed into the statement and it is re-estimated;
+            if it is still over the limits (or can't be limited) it is rejected
+
+If the endpoint can't produce an estimate (a driver error, no plan, a plan that
+doesn't parse) the statement is let through. An estimate that doesn't finish
+within SQL_COST_ESTIMATE_TIMEOUT follows SQL_COST_ESTIMATE_TIMEOUT_POLICY
+(allow | heavy | reject). Back-pressure from the executor (FairQueueFull,
+QueueTimeout, PoolTimeout) is raised as-is: a saturated warehouse is no reason to
+skip the guard.
+
+The estimate is a round trip of its own: it takes an executor slot in the
+statement's lane and a pooled connection, both released before the statement
+itself queues for them again (twice in limit mode, which re-estimates).
+"""
+import logging
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+import pyodbc
+
+from settings import settings
+from sql.executor import executor
+from sql.metrics import phase
+from sql.odbc import pooled_connection
+from sql.registry import QueryTimedOut
+from sql.rewrite import push_down_limit
+
+log = logging.getLogger(__name__)
+
+GUARD_MODES = ("off", "reject", "queue", "limit")
+ESTIMATE_TIMEOUT_POLICIES = ("allow", "heavy", "reject")
+HEAVY_CALLER = "heavy"
+_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+
+@dataclass
+class PlanEstimate:
+    cost: float                 # StatementSubTreeCost
+    rows: float                 # StatementEstRows
+    operators: List[Dict[str, Any]] = field(default_factory=list)     # most expensive operators first
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"subtreeCost": round(self.cost, 4), "estimatedRows": round(self.rows, 1),
+                "topOperators": self.operators}
+
+
+class PlanUnavailable(RuntimeError):
+    """The endpoint ran the showplan request but returned no usable plan."""
+
+
+class QueryTooExpensive(RuntimeError):
+    def __init__(self, message: str, estimate: PlanEstimate):
+        super().__init__(message)
+        self.estimate = estimate
+
+    def detail(self) -> Dict[str, Any]:
+        return {"message": str(self), "estimate": self.estimate.as_dict(), "limits": limits()}
+
+
+@dataclass
+class Admission:
+    sql: str                    # statement to execute (rewritten in limit mode)
+    caller: str                 # executor lane (HEAVY_CALLER in queue mode)
+    action: str                 # skipped | allowed | queued | limited
+    estimate: Optional[PlanEstimate] = None
+    limit_rows: Optional[int] = None    # the TOP pushed into `sql` in limit mode
+
+    def describe(self) -> Dict[str, Any]:
+        return {"action": self.action, "estimate": self.estimate.as_dict() if self.estimate else None,
+                "limitRows": self.limit_rows}
+
+
+def cut_by_limit(admission: Optional[Dict[str, Any]], row_count: int) -> bool:
+    """Whether a result of `row_count` rows was cut short by limit mode's TOP (`admission` as from describe())."""
+    return bool(admission and admission.get("action") == "limited" and row_count >= admission["limitRows"])
+
+
+def limits() -> Dict[str, Any]:
+    return {"maxSubtreeCost": settings.sql_cost_max_subtree_cost, "maxEstimatedRows": settings.sql_cost_max_est_rows}
+
+
+def _object_name(op: ET.Element) -> Optional[str]:
+    # The operator's own <Object> sits in its detail element (TableScan, IndexScan, ...),
+    # not in the RelOps nested below it.
+    for child in op:
+        if child.tag == f"{_NS}RelOp":
+            continue
+        obj = child.find(f"{_NS}Object")
+        if obj is not None:
+            return ".".join(p.strip("[]") for p in (obj.get("Schema"), obj.get("Table")) if p) or None
+    return None
+
+
+def parse_showplan(xml_text: str, top_operators: int = 3) -> PlanEstimate:
+    root = ET.fromstring(xml_text)
+    cost = rows = 0.0
+    for stmt in root.iter(f"{_NS}StmtSimple"):
+        cost = max(cost, float(stmt.get("StatementSubTreeCost") or 0))
+        rows = max(rows, float(stmt.get("StatementEstRows") or 0))
+    ops = []
+    for op in root.iter(f"{_NS}RelOp"):
+        ops.append({
+            "operator": op.get("PhysicalOp"),
+            "subtreeCost": round(float(op.get("EstimatedTotalSubtreeCost") or 0), 4),
+            "estimatedRows": round(float(op.get("EstimateRows") or 0), 1),
+            "object": _object_name(op),
+        })
+    # Cost of an operator minus its children's would be more precise; subtree cost is enough to spot scans.
+    ops.sort(key=lambda o: o["subtreeCost"], reverse=True)
+    return PlanEstimate(cost=cost, rows=rows, operators=ops[:top_operators])
+
+
+async def estimate_plan(server: str, database: str, port: int, sql: str,
+                        params: Tuple[Any, ...] = (), caller: str = "query") -> PlanEstimate:
+    cursors: List[Any] = []
+
+    def _run() -> str:
+        with pooled_connection(server, database, port) as conn:
+            cur = conn.cursor()
+            cursors.append(cur)
+            cur.execute("SET SHOWPLAN_XML ON")
+            try:
+                cur.execute(sql, params)
+                row = cur.fetchone()
+                while row is None and cur.nextset():
+                    row = cur.fetchone()
+            finally:
+                try:
+                    cur.execute("SET SHOWPLAN_XML OFF")
+                except pyodbc.Error as e:
+                    # Not a pyodbc error any more, so pooled_connection discards the connection
+                    # instead of handing it back in showplan mode.
+                    raise PlanUnavailable(f"Could not switch SHOWPLAN_XML off: {e}") from e
+            if row is None:
+                raise PlanUnavailable("SHOWPLAN_XML returned no plan")
+            return row[0]
+
+    with phase("plan"):
+        with anyio.fail_after(settings.sql_cost_estimate_timeout):
+            async with executor.slot(server, caller):
+                xml_text = await executor.run(_run, cancellable=True, on_cancel=lambda: [c.cancel() for c in cursors])
+    return parse_showplan(xml_text)
+
+
+def _over(est: PlanEstimate) -> bool:
+    max_cost, max_rows = settings.sql_cost_max_subtree_cost, settings.sql_cost_max_est_rows
+    return bool((max_cost and est.cost > max_cost) or (max_rows and est.rows > max_rows))
+
+
+def _too_expensive(est: PlanEstimate, suffix: str = "") -> QueryTooExpensive:
+    return QueryTooExpensive(
+        f"Estimated cost {est.cost:.2f} / {est.rows:,.0f} rows exceeds the limits "
+        f"(cost {settings.sql_cost_max_subtree_cost}, rows {settings.sql_cost_max_est_rows}){suffix}. "
+        "Add filters, aggregate on the server, or select fewer columns/rows.",
+        est,
+    )
+
+
+async def admit(server: str, database: str, port: int, sql: str, params: Tuple[Any, ...] = (),
+                *, caller: str = "query") -> Admission:
+    """Decide how (and whether) `sql` may run. Raises QueryTooExpensive in reject/limit mode."""
+    mode = settings.sql_cost_guard_mode
+    if mode not in GUARD_MODES or mode == "off" or caller not in settings.sql_cost_guard_callers:
+        return Admission(sql, caller, "skipped")
+    try:
+        est = await _estimate(server, database, port, sql, params, caller)
+    except TimeoutError:
+        return _estimate_timed_out(sql, caller)
+    if est is None:
+        return Admission(sql, caller, "skipped")
+    if not _over(est):
+        return Admission(sql, caller, "allowed", est)
+    if mode == "queue":
+        return Admission(sql, HEAVY_CALLER, "queued", est)
+    if mode == "limit":
+        limited = push_down_limit(sql, settings.sql_cost_limit_rows)
+        if limited is None or limited == sql:
+            raise _too_expensive(est, " and the statement can't be limited further")
+        try:
+            est_limited = await _estimate(server, database, port, limited, params, caller)
+        except TimeoutError:
+            est_limited = None
+        if est_limited is None:
+            raise _too_expensive(est)
+        if _over(est_limited):
+            raise _too_expensive(est_limited, f" even with TOP ({settings.sql_cost_limit_rows})")
+        return Admission(limited, caller, "limited", est_limited, settings.sql_cost_limit_rows)
+    raise _too_expensive(est)
+
+
+async def _estimate(server: str, database: str, port: int, sql: str, params: Tuple[Any, ...],
+                    caller: str) -> Optional[PlanEstimate]:
+    """The plan estimate, or None when the endpoint can't give one. TimeoutError and executor errors propagate."""
+    try:
+        return await estimate_plan(server, database, port, sql, params, caller)
+    except (pyodbc.Error, PlanUnavailable, ET.ParseError, ValueError) as e:
+        log.info("Plan estimate unavailable, letting the query through: %s", e)
+        return None
+
+
+def _estimate_timed_out(sql: str, caller: str) -> Admission:
+    policy = settings.sql_cost_estimate_timeout_policy
+    if policy not in ESTIMATE_TIMEOUT_POLICIES:
+        policy = "heavy"
+    timeout = settings.sql_cost_estimate_timeout
+    if policy == "reject":
+        raise QueryTimedOut(f"The cost estimate took longer than {timeout}s; the statement was not run. "
+                            "Try again, or narrow the query.")
+    if policy == "allow":
+        log.info("Plan estimate took longer than %ss, letting the query through", timeout)
+        return Admission(sql, caller, "skipped")
+    log.info("Plan estimate took longer than %ss, running the query in the %s lane", timeout, HEAVY_CALLER)
+    return Admission(sql, HEAVY_CALLER, "queued")
@@ -0,0 +1,138 @@
+# backend/sql/encoding.py
+"""
+Column-at-a-time JSON encoding of query results.
+
+fastapi's jsonable_encoder walks every cell and dispatches on its type, which is
+the dominant CPU cost of a large result. Here rows are transposed once (zip) and
+each column's converter is picked once, from its first non-NULL value:
+
+    str / int / float / bool    passed through untouched
+    Decimal                     float (int when the value has no fractional digits)
+    datetime / date / time      ISO 8601 string
+    UUID                        str
+    bytes                       UTF-8 text, or 0x-prefixed hex when not text
+    timedelta                   seconds
+
+so JSON-native columns cost nothing and the rest cost one conversion per cell,
+after which json.dumps runs its C fast path over plain values. The conversions
+are the ones jsonable_encoder applies, so responses keep their shape and values.
+A cell whose type doesn't match its column's converter falls back to
+encode_value(), either in the column pass or in dumps()'s default hook.
+
+Two shapes:
+    rows        [[v, v, ...], ...]                          encode_rows()
+    columnar    {"columns": [...], "data": {"col": [...]}}  encode_columnar()
+"""
+import datetime as dt
+import json
+import uuid
+from decimal import Decimal
+from operator import methodcaller
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+SHAPES = ("rows", "columnar")
+
+_NATIVE = (str, int, float, bool)
+_isoformat = methodcaller("isoformat")
+
+
+def _decimal(v: Decimal) -> Any:
+    exp = v.as_tuple().exponent
+    return int(v) if isinstance(exp, int) and exp >= 0 else float(v)
+
+
+def _bytes(v: Any) -> str:
+    b = bytes(v)
+    try:
+        return b.decode()
+    except UnicodeDecodeError:
+        return "0x" + b.hex()
+
+
+def encode_value(v: Any, fallback: Callable[[Any], Any] = str) -> Any:
+    """One value as a JSON-native value (the slow path; columns use converter_for)."""
+    if v is None or isinstance(v, _NATIVE):
+        return v
+    if isinstance(v, Decimal):
+        return _decimal(v)
+    if isinstance(v, (dt.datetime, dt.date, dt.time)):
+        return v.isoformat()
+    if isinstance(v, uuid.UUID):
+        return str(v)
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return _bytes(v)
+    if isinstance(v, dt.timedelta):
+        return v.total_seconds()
+    return fallback(v)
+
+
+def converter_for(sample: Any) -> Optional[Callable[[Any], Any]]:
+    """Converter for a column whose first non-NULL value is `sample`; None when no conversion is needed."""
+    if sample is None or type(sample) in _NATIVE:
+        return None
+    if isinstance(sample, Decimal):
+        # Fixed-scale columns (money, decimal(p,s>0)) are always fractional: plain float() is exact enough
+        # and much cheaper than checking each value's exponent.
+        exp = sample.as_tuple().exponent
+        return float if isinstance(exp, int) and exp < 0 else _decimal
+    if isinstance(sample, (dt.datetime, dt.date, dt.time)):
+        return _isoformat
+    if isinstance(sample, uuid.UUID):
+        return str
+    if isinstance(sample, (bytes, bytearray, memoryview)):
+        return _bytes
+    return encode_value
+
+
+def encode_column(values: Sequence[Any]) -> Sequence[Any]:
+    sample = next((v for v in values if v is not None), None)
+    conv = converter_for(sample)
+    if conv is None:
+        return values
+    try:
+        return [None if v is None else conv(v) for v in values]
+    except (TypeError, ValueError, AttributeError):
+        return [encode_value(v) for v in values]     # mixed types in one column
+
+
+def encode_rows(rows: Sequence[Sequence[Any]]) -> List[List[Any]]:
+    """Rows as lists of JSON-native values."""
+    if not rows or not len(rows[0]):
+        return [list(r) for r in rows]
+    columns = list(zip(*rows))
+    converted = [encode_column(c) for c in columns]
+    if all(a is b for a, b in zip(converted, columns)):
+        return [list(r) for r in rows]      # nothing to convert
+    return [list(r) for r in zip(*converted)]
+
+
+def column_keys(columns: Sequence[str]) -> List[str]:
+    """Unique, non-empty names: unnamed columns become col<i>, repeats get _2, _3, ..."""
+    keys: List[str] = []
+    seen = set()
+    for i, name in enumerate(columns):
+        key = name or f"col{i}"
+        n = 1
+        while key in seen:
+            n += 1
+            key = f"{name or f'col{i}'}_{n}"
+        seen.add(key)
+        keys.append(key)
+    return keys
+
+
+def encode_columnar(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> Tuple[List[str], Dict[str, Sequence[Any]]]:
+    """(column keys, {key: values}); keys are column_keys(columns)."""
+    keys = column_keys(columns)
+    values = [encode_column(c) for c in zip(*rows)] if rows else [[] for _ in keys]
+    return keys, dict(zip(keys, values))
+
+
+def dumps(obj: Any, fallback: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    Compact JSON. Values that aren't JSON-native are converted with encode_value, or
+    by `fallback` for types it doesn't know (e.g. pydantic models).
+    """
+    def default(o: Any) -> Any:
+        return encode_value(o, fallback or str)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default)
@@ -0,0 +1,236 @@
+# backend/sql/executor.py
+"""
+Dedicated execution lane for blocking ODBC work.
+
+Every query first takes a slot (caller cap -> per-server cap -> global cap, always
+in that order), then runs its blocking steps on worker threads governed by a
+CapacityLimiter of its own, so ODBC work never competes with anyio's default
+40-token limiter used by the rest of the process. Waiting for a slot is bounded
+by SQL_EXEC_QUEUE_TIMEOUT.
+
+Before any of that, the slot goes through the fair-share scheduler of its
+(server, caller) pair (sql/fairshare.py), keyed by the session the work belongs to.
+
+Callers tag their work ("query", "agent", "introspect", "probe", "export", and
+"heavy" for statements the cost guard queued) so one class of traffic can't occupy
+every slot.
+"""
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypeVar
+
+import anyio
+
+from settings import settings
+from sql.fairshare import FairScheduler, current_session_key, fair_share
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+
+class QueueTimeout(RuntimeError):
+    pass
+
+
+class _Gate:
+    """A semaphore that remembers how it is being used."""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self._sem = anyio.Semaphore(self.capacity)
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self, deadline: float) -> None:
+        try:
+            self._sem.acquire_nowait()
+        except anyio.WouldBlock:
+            await self._acquire_queued(deadline)
+        self.running += 1
+        self.acquired += 1
+
+    async def _acquire_queued(self, deadline: float) -> None:
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.monotonic()
+        try:
+            with anyio.fail_after(max(0.0, deadline - started)):
+                await self._sem.acquire()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+            self.wait_seconds += time.monotonic() - started
+
+    def release(self) -> None:
+        self.running -= 1
+        self._sem.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "queued": self.waiting,
+            "max_queued": self.max_waiting,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(1000 * self.wait_seconds / self.acquired, 2) if self.acquired else 0.0,
+        }
+
+
+class OdbcExecutor:
+    def __init__(self, max_workers: int, per_server: int, caller_limits: Dict[str, int], queue_timeout: float,
+                 caller_queue_timeouts: Optional[Dict[str, float]] = None):
+        self.max_workers = max(1, max_workers)
+        self.per_server = per_server
+        self.caller_limits = dict(caller_limits)
+        self.queue_timeout = queue_timeout
+        self.caller_queue_timeouts = dict(caller_queue_timeouts or {})
+        self._threads: Optional[anyio.CapacityLimiter] = None
+        self._global: Optional[_Gate] = None
+        self._servers: Dict[str, _Gate] = {}
+        self._callers: Dict[str, _Gate] = {}
+
+    def _global_gate(self) -> _Gate:
+        if self._global is None:
+            self._global = _Gate("global", self.max_workers)
+        return self._global
+
+    def _server_gate(self, server: str) -> _Gate:
+        key = server.lower()
+        if key not in self._servers:
+            self._servers[key] = _Gate(key, self.per_server)
+        return self._servers[key]
+
+    def _caller_gate(self, caller: str) -> Optional[_Gate]:
+        limit = self.caller_limits.get(caller)
+        if not limit:
+            return None
+        if caller not in self._callers:
+            self._callers[caller] = _Gate(caller, limit)
+        return self._callers[caller]
+
+    @asynccontextmanager
+    async def slot(self, server: str, caller: str = "query") -> AsyncIterator[None]:
+        """Hold one execution slot for `server` for the duration of the block."""
+        queue_timeout = self.caller_queue_timeouts.get(caller, self.queue_timeout)
+        deadline = time.monotonic() + queue_timeout
+        gates = [g for g in (self._caller_gate(caller), self._server_gate(server), self._global_gate()) if g]
+        fair_key = current_session_key() if self._fair(caller) else None
+        fair: Optional[FairScheduler] = None
+        held = []
+        try:
+            if fair_key is not None:
+                # Fair share first: it decides whose statement goes next when everyone is waiting for
+                # this server and lane. Its capacity is the narrowest of these gates, so a turn is only
+                # granted when the gates can admit it.
+                with anyio.fail_after(max(0.0, deadline - time.monotonic())):
+                    fair = await fair_share.acquire(server, caller, min(g.capacity for g in gates), fair_key)
+            for g in gates:
+                await g.acquire(deadline)
+                held.append(g)
+        except TimeoutError:
+            self._release(held, fair, fair_key)
+            raise QueueTimeout(
+                f"Timed out after {queue_timeout}s queued for an ODBC worker "
+                f"(server={server}, caller={caller}). The warehouse or this API is busy; try again shortly."
+            )
+        except BaseException:
+            self._release(held, fair, fair_key)
+            raise
+        try:
+            yield
+        finally:
+            self._release(held, fair, fair_key)
+
+    @staticmethod
+    def _fair(caller: str) -> bool:
+        return settings.sql_fair_enabled and caller not in settings.sql_fair_exempt_callers
+
+    @staticmethod
+    def _release(held: List[_Gate], fair: Optional[FairScheduler], fair_key: Optional[str]) -> None:
+        for g in reversed(held):
+            g.release()
+        if fair is not None:
+            fair.release(fair_key)
+
+    async def run(self, fn: Callable[..., T], *args: Any, cancellable: bool = False,
+                  on_cancel: Optional[Callable[[], Any]] = None) -> T:
+        """
+        Run a blocking step on the ODBC worker threads. Call while holding a slot.
+
+        With cancellable=True the caller may be cancelled (timeout, client gone) while the
+        step runs. on_cancel() is then called to stop the statement (cursor.cancel()), and
+        the caller keeps waiting, shielded, until the thread returns or SQL_EXEC_CANCEL_GRACE
+        passes, so the slot it holds keeps counting the work that is still in flight. A step
+        that hadn't started yet is skipped.
+        """
+        if self._threads is None:
+            self._threads = anyio.CapacityLimiter(self.max_workers)
+        if not cancellable:
+            return await anyio.to_thread.run_sync(fn, *args, limiter=self._threads)
+
+        lock = threading.Lock()
+        started, abandoned, finished = threading.Event(), threading.Event(), threading.Event()
+
+        def _call() -> T:
+            with lock:
+                if abandoned.is_set():
+                    raise RuntimeError("Cancelled before it started")
+                started.set()
+            try:
+                return fn(*args)
+            finally:
+                finished.set()
+
+        try:
+            return await anyio.to_thread.run_sync(_call, limiter=self._threads, abandon_on_cancel=True)
+        except anyio.get_cancelled_exc_class():
+            with lock:
+                abandoned.set()
+                running = started.is_set() and not finished.is_set()
+            if running:
+                await self._drain(finished, on_cancel)
+            raise
+
+    @staticmethod
+    async def _drain(finished: threading.Event, on_cancel: Optional[Callable[[], Any]]) -> None:
+        with anyio.CancelScope(shield=True):
+            if on_cancel is not None:
+                try:
+                    on_cancel()
+                except Exception as e:
+                    log.debug("Cancelling an abandoned ODBC step failed: %s", e)
+            with anyio.move_on_after(settings.sql_exec_cancel_grace) as scope:
+                while not finished.is_set():
+                    await anyio.sleep(0.02)
+            if scope.cancelled_caught:
+                log.warning("ODBC step still running %ss after cancel; releasing its slot", settings.sql_exec_cancel_grace)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "queue_timeout": self.queue_timeout,
+            "global": self._global_gate().stats(),
+            "servers": {k: g.stats() for k, g in self._servers.items()},
+            "callers": {k: g.stats() for k, g in self._callers.items()},
+        }
+
+
+executor = OdbcExecutor(
+    max_workers=settings.sql_exec_max_workers,
+    per_server=settings.sql_exec_per_server,
+    caller_limits=settings.sql_exec_caller_limits,
+    queue_timeout=settings.sql_exec_queue_timeout,
+    # Statements the cost guard sent to the heavy lane are expected to wait their turn.
+    caller_queue_timeouts={"heavy": settings.sql_cost_queue_timeout},
+)
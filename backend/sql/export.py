@@ -0,0 +1,266 @@
+# backend/sql/export.py
+"""
+Incremental encoders for exporting a whole result set.
+
+Each fetched batch is encoded (and optionally compressed) into a chunk as soon as
+it arrives, so an export holds one batch in memory regardless of result size and
+the response is paced by the client: the next fetchmany only happens once the
+previous chunk has been sent. A finished query job is exported the same way from
+its SpillBuffer, one buffered batch at a time.
+
+Parquet needs pyarrow and zstd needs zstandard; both are imported on first use.
+"""
+import csv
+import datetime as dt
+import decimal
+import io
+import json
+import time
+import uuid
+import zlib
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+import anyio
+
+from sql.arrow import require_pyarrow, schema_from_description, record_batch, conform_batch
+from sql.odbc import RowStream
+from sql.spill import SpillBuffer
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+EXPORT_COMPRESSIONS = ("none", "gzip", "zstd")
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "gzip": "application/gzip",
+    "zstd": "application/zstd",
+}
+FILE_SUFFIXES = {"csv": ".csv", "ndjson": ".ndjson", "parquet": ".parquet", "gzip": ".gz", "zstd": ".zst", "none": ""}
+
+
+def _text(v: Any) -> Any:
+    if isinstance(v, (dt.datetime, dt.date, dt.time)):
+        return v.isoformat()
+    if isinstance(v, (bytes, bytearray)):
+        return v.hex()
+    if isinstance(v, (decimal.Decimal, uuid.UUID)):
+        return str(v)
+    return v
+
+
+# ---------- encoders ----------
+
+class CsvEncoder:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return self._rows([self.columns])
+
+    def encode(self, rows: Sequence[Tuple[Any, ...]]) -> bytes:
+        return self._rows([[_text(v) for v in r] for r in rows])
+
+    def finish(self) -> bytes:
+        return b""
+
+    @staticmethod
+    def _rows(rows) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\r\n").writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+
+class NdjsonEncoder:
+    """One JSON object per row, keyed by column name."""
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence[Tuple[Any, ...]]) -> bytes:
+        cols = self.columns
+        return "".join(
+            json.dumps(dict(zip(cols, r)), ensure_ascii=False, default=_text) + "\n" for r in rows
+        ).encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every write batch."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out, self._parts = b"".join(self._parts), []
+        return out
+
+
+class ParquetEncoder:
+    """One row group per fetched batch; the footer is written by finish()."""
+
+    def __init__(self, columns: List[str], description: Sequence[Tuple[Any, ...]]):
+        self.columns = columns
+        self._declared = schema_from_description(description)
+        self._sink = _ChunkSink()
+        self._writer = None
+        self._schema = None
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence[Tuple[Any, ...]]) -> bytes:
+        rb = record_batch(self._declared, rows)
+        self._open(rb.schema)
+        self._writer.write_batch(conform_batch(rb, self._schema))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._open(self._declared)     # empty result: still a valid file with the schema
+        self._writer.close()
+        return self._sink.drain()
+
+    def _open(self, schema) -> None:
+        if self._writer is None:
+            require_pyarrow()
+            import pyarrow.parquet as pq
+            self._schema = schema
+            self._writer = pq.ParquetWriter(self._sink, schema, compression="snappy")
+
+
+def make_encoder(fmt: str, columns: Sequence[str], description: Optional[Sequence[Tuple[Any, ...]]]):
+    columns = list(columns)
+    if fmt == "csv":
+        return CsvEncoder(columns)
+    if fmt == "ndjson":
+        return NdjsonEncoder(columns)
+    if fmt == "parquet":
+        return ParquetEncoder(columns, description or ())
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+# ---------- compression ----------
+
+class _Identity:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _Gzip:
+    def __init__(self, level: int = 6):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)    # wbits=31 -> gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush()
+
+
+class _Zstd:
+    def __init__(self, level: int = 3):
+        self._z = require_zstandard().ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush()
+
+
+def require_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstd compression requires the 'zstandard' package (pip install zstandard).") from e
+    return zstandard
+
+
+def make_compressor(compression: str):
+    if compression == "gzip":
+        return _Gzip()
+    if compression == "zstd":
+        return _Zstd()
+    return _Identity()
+
+
+def check_export_dependencies(fmt: str, compression: str) -> None:
+    """Raise RuntimeError up front if an optional package the export needs is missing."""
+    if fmt == "parquet":
+        require_pyarrow()
+    if compression == "zstd":
+        require_zstandard()
+
+
+def export_filename(base: Optional[str], fmt: str, compression: str) -> str:
+    name = "".join(ch for ch in (base or "export") if ch.isalnum() or ch in "-_.") or "export"
+    return f"{name}{FILE_SUFFIXES[fmt]}{FILE_SUFFIXES[compression]}"
+
+
+def export_media_type(fmt: str, compression: str) -> str:
+    return MEDIA_TYPES[compression] if compression != "none" else MEDIA_TYPES[fmt]
+
+
+async def encode_stream(stream: RowStream, fmt: str, compression: str = "none") -> AsyncIterator[bytes]:
+    """Encode an opened RowStream batch by batch. Encoding runs on a worker thread."""
+    encoder = make_encoder(fmt, stream.columns, stream.description)
+    comp = make_compressor(compression)
+    chunk = comp.compress(encoder.header())
+    if chunk:
+        yield chunk
+    async for batch in stream:
+        started = time.perf_counter()
+        chunk = await anyio.to_thread.run_sync(lambda b=batch: comp.compress(encoder.encode(b)))
+        stream.timing.add("encode", time.perf_counter() - started)
+        if chunk:
+            yield chunk
+    tail = comp.compress(encoder.finish()) + comp.flush()
+    if tail:
+        yield tail
+
+
+async def encode_buffer(buffer: SpillBuffer, columns: Sequence[str], fmt: str,
+                        compression: str = "none") -> AsyncIterator[bytes]:
+    """Encode every row of a finished SpillBuffer; spilled batches are read through its memory map."""
+    encoder = make_encoder(fmt, columns, buffer.description)
+    comp = make_compressor(compression)
+    chunk = comp.compress(encoder.header())
+    if chunk:
+        yield chunk
+    batches = buffer.iter_rows()
+    while True:
+        chunk = await anyio.to_thread.run_sync(lambda: _encode_next(batches, encoder, comp))
+        if chunk is None:
+            break
+        if chunk:
+            yield chunk
+    tail = comp.compress(encoder.finish()) + comp.flush()
+    if tail:
+        yield tail
+
+
+def _encode_next(batches, encoder, comp) -> Optional[bytes]:
+    batch = next(batches, None)
+    return None if batch is None else comp.compress(encoder.encode(batch))
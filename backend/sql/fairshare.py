@@ -0,0 +1,268 @@
+# backend/sql/fairshare.py
+"""
+Weighted fair queuing in front of the ODBC executor.
+
+Work is keyed by the caller's session: the X-Session-Id header (or X-User-Id,
+else the client address), or the agent session for agent runs. The key travels
+in a context variable, so executor.slot() picks it up without any parameter
+threading.
+
+There is one scheduler per (server, lane), sized to that pair's executor caps,
+so turns are granted in fair order at the gate a statement actually waits on:
+sessions queued for a busy server or the one-slot heavy lane only compete with
+each other and never hold turns that work for an idle server needs. Within a
+scheduler each key is one flow:
+
+- a flow runs at most SQL_FAIR_PER_KEY_LIMIT statements at once;
+- when slots are contended, the next waiter is the one with the smallest virtual
+  finish tag (start = max(virtual clock, flow's previous tag), tag = start + 1/weight),
+  so a flow that queued fifty statements gets one turn for every turn of a flow
+  that queued one, instead of holding the line for everyone;
+- a flow may queue SQL_FAIR_MAX_QUEUE_PER_KEY statements and all flows together
+  SQL_FAIR_MAX_QUEUE_TOTAL; beyond that FairQueueFull is raised (HTTP 429).
+
+Weights come from SQL_FAIR_WEIGHTS (key -> weight, default 1).
+
+X-Session-Id / X-User-Id are taken as sent: they are a trust boundary. A client
+that rotates them gets a fresh flow each time and so escapes the per-key limit;
+deployments exposed to untrusted clients should set these headers at the
+gateway from the authenticated identity and strip client-supplied values.
+
+An execution shared by single-flight (sql/cache.py) serves several sessions, so
+it is its own flow ("shared:<flight>") rather than the flow of whichever session
+happened to start it: joiners don't wait behind that session's backlog, and that
+session isn't charged for work done on everyone's behalf.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+from settings import settings
+
+ANONYMOUS = "anonymous"
+SHARED = "shared"       # prefix of the flow of an execution coalesced by single-flight (it belongs to no session)
+
+_session_key: ContextVar[Optional[str]] = ContextVar("sql_session_key", default=None)
+
+
+class FairQueueFull(RuntimeError):
+    pass
+
+
+def current_session_key() -> str:
+    return _session_key.get() or ANONYMOUS
+
+
+@contextmanager
+def session_key(key: Optional[str]) -> Iterator[None]:
+    """Attribute SQL work done inside the block to `key` (no-op for an empty key)."""
+    if not key:
+        yield
+        return
+    token = _session_key.set(key)
+    try:
+        yield
+    finally:
+        _session_key.reset(token)
+
+
+class SessionKeyMiddleware:
+    """
+    ASGI middleware that keys each HTTP request by session / user / client address.
+    The headers are trusted as sent (see the module docstring).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        key = (headers.get(b"x-session-id") or headers.get(b"x-user-id") or b"").decode("latin-1").strip()
+        if key:
+            key = f"session:{key[:128]}"
+        elif scope.get("client"):
+            key = f"client:{scope['client'][0]}"
+        with session_key(key):
+            await self.app(scope, receive, send)
+
+
+class _Waiter:
+    __slots__ = ("tag", "future", "enqueued")
+
+    def __init__(self, tag: float, future: asyncio.Future):
+        self.tag = tag
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class _Flow:
+    def __init__(self, key: str, weight: float):
+        self.key = key
+        self.weight = weight
+        self.running = 0
+        self.waiting: Deque[_Waiter] = deque()
+        self.last_tag = 0.0
+        self.last_active = time.monotonic()
+        self.acquired = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "running": self.running,
+            "queued": len(self.waiting),
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(1000 * self.wait_seconds / self.acquired, 2) if self.acquired else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait_seconds, 2),
+        }
+
+
+class FairScheduler:
+    def __init__(self, capacity: int, per_key: int, max_queue_per_key: int, max_queue_total: int,
+                 weights: Optional[Dict[str, float]] = None, idle_flows: int = 1000):
+        self.capacity = max(1, capacity)
+        self.per_key = max(1, per_key)
+        self.max_queue_per_key = max_queue_per_key
+        self.max_queue_total = max_queue_total
+        self.weights = dict(weights or {})
+        self.idle_flows = idle_flows
+        self._flows: Dict[str, _Flow] = {}
+        self._running = 0
+        self._waiting = 0
+        self._clock = 0.0           # virtual time: tag of the last waiter dispatched
+        self.rejected = 0
+
+    def _flow(self, key: str) -> _Flow:
+        flow = self._flows.get(key)
+        if flow is None:
+            if len(self._flows) >= self.idle_flows:
+                self._prune()
+            flow = self._flows[key] = _Flow(key, max(0.01, float(self.weights.get(key, 1.0))))
+        flow.last_active = time.monotonic()
+        return flow
+
+    def _prune(self) -> None:
+        idle = sorted((f for f in self._flows.values() if not f.running and not f.waiting),
+                      key=lambda f: f.last_active)
+        for f in idle[: max(1, len(idle) // 2)]:
+            del self._flows[f.key]
+
+    async def acquire(self, key: str) -> None:
+        flow = self._flow(key)
+        if len(flow.waiting) >= self.max_queue_per_key or self._waiting >= self.max_queue_total:
+            flow.rejected += 1
+            self.rejected += 1
+            raise FairQueueFull(
+                f"Too many queued queries for {key} ({len(flow.waiting)} waiting, "
+                f"{flow.running} running). Wait for some to finish and retry."
+            )
+        flow.last_tag = max(self._clock, flow.last_tag) + 1.0 / flow.weight
+        waiter = _Waiter(flow.last_tag, asyncio.get_running_loop().create_future())
+        flow.waiting.append(waiter)
+        self._waiting += 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(key)           # granted just as we were cancelled
+            else:
+                flow.waiting.remove(waiter)
+                self._waiting -= 1
+                self._dispatch()
+            raise
+        waited = time.monotonic() - waiter.enqueued
+        flow.acquired += 1
+        flow.wait_seconds += waited
+        flow.max_wait_seconds = max(flow.max_wait_seconds, waited)
+
+    def release(self, key: str) -> None:
+        flow = self._flows[key]
+        flow.running -= 1
+        self._running -= 1
+        flow.last_active = time.monotonic()
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._running < self.capacity:
+            best: Optional[_Flow] = None
+            for f in self._flows.values():
+                if f.waiting and f.running < self.per_key and (best is None or f.waiting[0].tag < best.waiting[0].tag):
+                    best = f
+            if best is None:
+                return
+            waiter = best.waiting.popleft()
+            self._waiting -= 1
+            best.running += 1
+            self._running += 1
+            self._clock = max(self._clock, waiter.tag)
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        busiest = sorted(self._flows.values(), key=lambda f: (f.running + len(f.waiting), f.acquired), reverse=True)
+        return {
+            "capacity": self.capacity,
+            "per_key_limit": self.per_key,
+            "running": self._running,
+            "queued": self._waiting,
+            "rejected": self.rejected,
+            "flows": {f.key: f.stats() for f in busiest[:50]},
+        }
+
+
+class FairShare:
+    """One FairScheduler per (server, lane); the queue total is enforced across all of them."""
+
+    def __init__(self, per_key: int, max_queue_per_key: int, max_queue_total: int,
+                 weights: Optional[Dict[str, float]] = None):
+        self.per_key = per_key
+        self.max_queue_per_key = max_queue_per_key
+        self.max_queue_total = max_queue_total
+        self.weights = dict(weights or {})
+        self._lanes: Dict[Tuple[str, str], FairScheduler] = {}
+        self.rejected = 0
+
+    def _scheduler(self, server: str, caller: str, capacity: int) -> FairScheduler:
+        lane = (server.lower(), caller)
+        sched = self._lanes.get(lane)
+        if sched is None:
+            sched = self._lanes[lane] = FairScheduler(capacity, self.per_key, self.max_queue_per_key,
+                                                      self.max_queue_total, self.weights)
+        return sched
+
+    async def acquire(self, server: str, caller: str, capacity: int, key: str) -> FairScheduler:
+        """Wait for `key`'s fair turn at (server, caller), whose gates admit `capacity` at once."""
+        sched = self._scheduler(server, caller, capacity)
+        queued = sum(s._waiting for s in self._lanes.values())
+        if queued >= self.max_queue_total:
+            self.rejected += 1
+            raise FairQueueFull(f"Too many queued queries ({queued} waiting). Wait for some to finish and retry.")
+        await sched.acquire(key)
+        return sched
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = {f"{server}/{caller}": s.stats() for (server, caller), s in self._lanes.items()}
+        return {
+            "per_key_limit": self.per_key,
+            "running": sum(s["running"] for s in lanes.values()),
+            "queued": sum(s["queued"] for s in lanes.values()),
+            "rejected": self.rejected + sum(s["rejected"] for s in lanes.values()),
+            "lanes": lanes,
+        }
+
+
+fair_share = FairShare(
+    per_key=settings.sql_fair_per_key_limit,
+    max_queue_per_key=settings.sql_fair_max_queue_per_key,
+    max_queue_total=settings.sql_fair_max_queue_total,
+    weights=settings.sql_fair_weights,
+)
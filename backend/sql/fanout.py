@@ -0,0 +1,61 @@
+# backend/sql/fanout.py
+"""
+Run one read-only query against many SQL endpoints at once.
+
+Each target runs through cached_query (so the executor caps, cache, single-flight
+and metrics all apply), at most SQL_FANOUT_CONCURRENCY at a time. Results are
+yielded in completion order, one dict per database; a failing database produces
+an error entry instead of failing the batch.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sql.cache import cached_query
+from sql.encoding import encode_rows
+
+
+@dataclass
+class FanoutTarget:
+    database_id: str
+    name: Optional[str]
+    server: Optional[str]
+    database: Optional[str]
+    port: int = 1433
+
+
+async def fan_out(targets: List[FanoutTarget], sql: str, params: Tuple[Any, ...] = (), *,
+                  max_rows: int, concurrency: int, use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(t: FanoutTarget) -> Dict[str, Any]:
+        head = {"databaseId": t.database_id, "databaseName": t.name}
+        if not t.server or not t.database:
+            return {**head, "status": "error", "error": "SQL endpoint has no active connection info."}
+        async with sem:
+            started = time.perf_counter()
+            try:
+                cols, rows, cache_info = await cached_query(t.server, t.database, t.port or 1433, sql, params,
+                                                            database_id=t.database_id, max_rows=max_rows,
+                                                            use_cache=use_cache)
+            except Exception as e:
+                return {**head, "status": "error", "error": str(e),
+                        "elapsedMs": round((time.perf_counter() - started) * 1000, 1)}
+        truncated = len(rows) > max_rows
+        rows = rows[:max_rows]
+        return {**head, "status": "ok", "columns": cols, "rows": encode_rows(rows),
+                "rowCount": len(rows), "truncated": truncated, "cache": cache_info,
+                "elapsedMs": round((time.perf_counter() - started) * 1000, 1)}
+
+    tasks = [asyncio.ensure_future(_one(t)) for t in targets]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        # Consumer stopped early (client disconnected): cancel what is still running.
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
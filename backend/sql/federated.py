@@ -0,0 +1,209 @@
+# backend/sql/federated.py
+"""
+Federated queries across SQL endpoints.
+
+Each source is a subset of one table (or a custom SELECT) on one warehouse / SQL
+endpoint. Its projection and filter are pushed into the statement sent to that
+endpoint; every source is fetched concurrently as Arrow record batches and
+appended into a scratch DuckDB database, where the caller's SELECT (joins,
+aggregation) runs locally.
+
+DuckDB runs with memory_limit = SQL_FEDERATED_MEMORY_LIMIT and spills to a temp
+directory beyond that; the scratch database is a temp file deleted afterwards.
+External file/network access is switched off before the caller's SQL runs.
+
+duckdb and pyarrow are optional and imported on first use.
+"""
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+
+from settings import settings
+from sql.arrow import require_pyarrow, iter_record_batches, schema_from_description
+from sql.odbc import iter_query
+from sql.rewrite import tokenize, strip_trailing_semicolons, main_select_index, is_single_statement
+
+_ALIAS_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+_PART_RE = re.compile(r"^\[?([^\[\]]+?)\]?$")
+
+
+class FederatedQueryError(ValueError):
+    pass
+
+
+def require_duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("Federated queries require the 'duckdb' package (pip install duckdb).") from e
+    return duckdb
+
+
+@dataclass
+class FederatedSource:
+    alias: str                              # table name in the local query
+    database_id: str
+    table: Optional[str] = None             # schema.table on the source
+    columns: List[str] = field(default_factory=list)    # projection; empty = all
+    where: Optional[str] = None             # filter pushed to the source, may use ? params
+    params: Tuple[Any, ...] = ()
+    sql: Optional[str] = None               # full SELECT instead of table/columns/where
+    max_rows: Optional[int] = None
+    # resolved connection info
+    server: Optional[str] = None
+    database: Optional[str] = None
+    port: int = 1433
+
+    def source_sql(self) -> str:
+        if self.sql:
+            return self.sql
+        if not self.table:
+            raise FederatedQueryError(f"Source '{self.alias}' needs either 'table' or 'sql'.")
+        cols = ", ".join(_quote(c) for c in self.columns) if self.columns else "*"
+        stmt = f"SELECT {cols} FROM {_quote_table(self.table)}"
+        if self.where:
+            stmt += f" WHERE {self.where}"
+        return stmt
+
+
+def _quote(ident: str) -> str:
+    m = _PART_RE.match(ident.strip())
+    if not m:
+        raise FederatedQueryError(f"Invalid identifier: {ident!r}")
+    return "[" + m.group(1).replace("]", "]]") + "]"
+
+
+def _quote_table(table: str) -> str:
+    # Split on dots outside brackets, so [My.Schema].[Orders] stays two parts.
+    parts = [p for p in re.split(r"\.(?![^\[]*\])", table.strip()) if p]
+    if not 1 <= len(parts) <= 3:
+        raise FederatedQueryError(f"Invalid table name: {table!r} (expected schema.table)")
+    return ".".join(_quote(p) for p in parts)
+
+
+def parse_sources(raw: Dict[str, Dict[str, Any]]) -> List[FederatedSource]:
+    if not raw:
+        raise FederatedQueryError("At least one source is required.")
+    out = []
+    for alias, spec in raw.items():
+        if not _ALIAS_RE.match(alias):
+            raise FederatedQueryError(f"Source alias {alias!r} must be a plain identifier.")
+        if not spec.get("databaseId"):
+            raise FederatedQueryError(f"Source '{alias}' is missing databaseId.")
+        out.append(FederatedSource(
+            alias=alias,
+            database_id=spec["databaseId"],
+            table=spec.get("table"),
+            columns=list(spec.get("columns") or []),
+            where=spec.get("where"),
+            params=tuple(spec.get("params") or ()),
+            sql=spec.get("sql"),
+            max_rows=int(spec["maxRows"]) if spec.get("maxRows") else None,
+        ))
+    return out
+
+
+def check_local_sql(sql: str) -> str:
+    sql = strip_trailing_semicolons(sql)
+    tokens = tokenize(sql)
+    if not is_single_statement(tokens) or main_select_index(tokens) is None:
+        raise FederatedQueryError("The federated query must be a single SELECT (or WITH ... SELECT).")
+    return sql
+
+
+async def _load_source(con, src: FederatedSource, sem: asyncio.Semaphore, caller: str) -> Dict[str, Any]:
+    """Stream one source into a DuckDB table named after its alias."""
+    cur = con.cursor()      # DuckDB cursors are separate connections to the same database
+    rows = 0
+    truncated = False
+    limit = src.max_rows or settings.sql_federated_source_max_rows
+    try:
+        async with sem:
+            async with iter_query(src.server, src.database, src.port, src.source_sql(), src.params,
+                                  timeout=settings.sql_federated_timeout, max_rows=limit,
+                                  caller=caller, database_id=src.database_id) as stream:
+                created = False
+                async for rb in iter_record_batches(stream, limit):
+                    await anyio.to_thread.run_sync(_append, cur, src.alias, rb, created)
+                    created = True
+                    rows += rb.num_rows
+                if not created:
+                    empty = schema_from_description(stream.description or ()).empty_table()
+                    await anyio.to_thread.run_sync(_append, cur, src.alias, empty, False)
+                truncated = stream.row_count > limit
+    except FederatedQueryError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Source '{src.alias}' ({src.database_id}): {e}") from e
+    finally:
+        cur.close()
+    return {"alias": src.alias, "databaseId": src.database_id, "rows": rows, "truncated": truncated}
+
+
+def _append(cur, alias: str, data, exists: bool) -> None:
+    cur.register("_incoming", data)
+    try:
+        if exists:
+            cur.execute(f'INSERT INTO "{alias}" SELECT * FROM _incoming')
+        else:
+            cur.execute(f'CREATE TABLE "{alias}" AS SELECT * FROM _incoming')
+    finally:
+        cur.unregister("_incoming")
+
+
+def _run_local(con, sql: str, max_rows: int) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    # No file / extension / network access from here on, and no way to turn it back on.
+    con.execute("SET enable_external_access = false")
+    con.execute("SET lock_configuration = true")
+    cur = con.execute(sql)
+    cols = [d[0] for d in cur.description] if cur.description else []
+    return cols, cur.fetchmany(max_rows + 1)
+
+
+async def run_federated(sources: List[FederatedSource], sql: str, max_rows: int,
+                        caller: str = "query") -> Dict[str, Any]:
+    """Load every source, run `sql` locally and return columns/rows plus per-source stats."""
+    duckdb = require_duckdb()
+    require_pyarrow()
+    sql = check_local_sql(sql)
+    for s in sources:
+        if not s.server or not s.database:
+            raise FederatedQueryError(f"Source '{s.alias}' has no active connection info.")
+
+    workdir = tempfile.mkdtemp(prefix="federated-", dir=settings.sql_spill_dir or None)
+    con = duckdb.connect(os.path.join(workdir, "scratch.duckdb"))
+    try:
+        con.execute(f"SET memory_limit = '{settings.sql_federated_memory_limit}'")
+        con.execute(f"SET temp_directory = '{os.path.join(workdir, 'tmp')}'")
+        con.execute(f"SET threads = {max(1, settings.sql_federated_threads)}")
+        sem = asyncio.Semaphore(max(1, settings.sql_fanout_concurrency))
+        tasks = [asyncio.ensure_future(_load_source(con, s, sem, caller)) for s in sources]
+        try:
+            loaded = await asyncio.gather(*tasks)
+        except BaseException:
+            # One source failed (or we were cancelled): stop the others before closing DuckDB.
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        try:
+            cols, rows = await anyio.to_thread.run_sync(_run_local, con, sql, max_rows)
+        except duckdb.Error as e:
+            raise FederatedQueryError(f"Local query failed: {e}") from e
+    finally:
+        con.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    truncated = len(rows) > max_rows
+    return {
+        "columns": cols,
+        "rows": [list(r) for r in rows[:max_rows]],
+        "rowCount": min(len(rows), max_rows),
+        "truncated": truncated,
+        "sources": loaded,
+    }
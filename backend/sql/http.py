@@ -0,0 +1,37 @@
+# backend/sql/http.py
+"""
+Request checks and response helpers shared by the SQL routers (dbmeta, sqldb,
+federated) and the agent tools.
+"""
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog.models import SqlEndpoint
+from sql.encoding import dumps
+
+BLOCKLIST = ("insert", "update", "delete", "merge", "alter", "drop", "truncate", "create", "grant", "revoke")
+
+
+def check_read_only(sql_txt: str) -> None:
+    # naïve safety (read-only)
+    lower = sql_txt.lower().replace("\n", " ")
+    if any(tok in lower for tok in BLOCKLIST):
+        raise HTTPException(400, "Only read-only queries are allowed. (Detected a mutating statement.)")
+
+
+async def require_endpoint(session: AsyncSession, workspace_id: str, database_id: str) -> SqlEndpoint:
+    """The catalogued endpoint, if it belongs to `workspace_id` and has connection info; else 404 / 503."""
+    ep = await session.get(SqlEndpoint, database_id)
+    if not ep or ep.workspace_id != workspace_id:
+        raise HTTPException(404, "SQL endpoint not found. Try /sqldb?fresh=1 or /sqldb/reload.")
+    if not ep.server or not ep.database:
+        raise HTTPException(
+            503,
+            "SQL endpoint has no active connection info (capacity inactive, endpoint unavailable, "
+            "or missing permissions). Try again later or activate capacity."
+        )
+    return ep
+
+
+def ndjson_line(obj: object) -> bytes:
+    return (dumps(obj) + "\n").encode("utf-8")
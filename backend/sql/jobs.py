@@ -0,0 +1,188 @@
+# backend/sql/jobs.py
+"""
+Asynchronous query jobs.
+
+A job runs one query in the background and keeps its rows in the process for
+SQL_JOBS_TTL seconds after it finishes, so callers can poll for status and page
+through results (or download them, .../export) instead of holding a request open
+for the whole query. At most SQL_JOBS_MAX_WORKERS jobs execute at once; further
+submissions queue, and past SQL_JOBS_MAX_PENDING they are refused. Rows go into a SpillBuffer, so a large
+result moves to a temp Arrow file instead of growing the worker's memory.
+
+The job id doubles as the query id, so a running job shows up in the in-flight
+registry and DELETE .../query/{job_id} cancels it like any other query.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import anyio
+
+from settings import settings
+from sql.odbc import iter_query
+from sql.registry import registry, QueryCancelled
+from sql.spill import SpillBuffer
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+_FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class QueryJob:
+    job_id: str
+    workspace_id: str
+    database_id: str
+    sql: str
+    max_rows: int
+    status: str = QUEUED
+    columns: List[str] = field(default_factory=list)
+    buffer: Optional[SpillBuffer] = None
+    truncated: bool = False
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _FINISHED
+
+    @property
+    def row_count(self) -> int:
+        return self.buffer.row_count if self.buffer is not None else 0
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def describe(self, ttl: int) -> Dict[str, object]:
+        return {
+            "jobId": self.job_id,
+            "status": self.status,
+            "columns": self.columns,
+            "rowCount": self.row_count,
+            "truncated": self.truncated,
+            "spilled": bool(self.buffer and self.buffer.spilled),
+            "error": self.error,
+            "elapsedSeconds": round(self.elapsed(), 3),
+            "queuedSeconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "expiresAt": self.finished_at + ttl if self.finished_at else None,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers: int, max_pending: int, ttl: int, max_rows: int, timeout: int):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self._jobs: Dict[str, QueryJob] = {}
+        self._workers: Optional[asyncio.Semaphore] = None
+
+    def submit(self, server: str, database: str, port: int, sql: str,
+               params: Tuple[Any, ...] = (), *, workspace_id: str, database_id: str,
+               max_rows: Optional[int] = None) -> QueryJob:
+        self.purge_expired()
+        pending = sum(1 for j in self._jobs.values() if not j.finished)
+        if pending >= self.max_pending:
+            raise JobQueueFull(f"{pending} query jobs are already queued or running; try again later.")
+        if self._workers is None:
+            self._workers = asyncio.Semaphore(self.max_workers)
+        job = QueryJob(job_id=str(uuid4()), workspace_id=workspace_id, database_id=database_id, sql=sql,
+                       max_rows=min(max_rows or self.max_rows, self.max_rows))
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, server, database, port, params))
+        return job
+
+    async def _run(self, job: QueryJob, server: str, database: str, port: int, params: Tuple[Any, ...]) -> None:
+        try:
+            async with self._workers:
+                job.status = RUNNING
+                job.started_at = time.time()
+                with anyio.fail_after(self.timeout):
+                    async with iter_query(server, database, port, job.sql, params, timeout=self.timeout,
+                                          max_rows=job.max_rows, caller="job",
+                                          query_id=job.job_id, database_id=job.database_id) as stream:
+                        job.columns = stream.columns
+                        job.buffer = SpillBuffer(stream.description)
+                        async for batch in stream:
+                            room = job.max_rows - job.buffer.row_count
+                            if len(batch) > room:
+                                batch = batch[:room]
+                                job.truncated = True
+                            await anyio.to_thread.run_sync(job.buffer.append, batch)
+                            if job.truncated:
+                                break
+            job.status = SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except QueryCancelled as e:
+            job.status, job.error = CANCELLED, str(e)
+        except TimeoutError:
+            job.status, job.error = FAILED, f"Job exceeded {self.timeout}s and was cancelled"
+        except Exception as e:
+            job.status, job.error = FAILED, str(e)
+        finally:
+            if job.buffer is not None:
+                job.buffer.finish()
+            job.finished_at = time.time()
+            job.task = None
+
+    def get(self, job_id: str, database_id: Optional[str] = None) -> Optional[QueryJob]:
+        self.purge_expired()
+        job = self._jobs.get(job_id)
+        if job is None or (database_id is not None and job.database_id != database_id):
+            return None
+        return job
+
+    async def page(self, job: QueryJob, offset: int, limit: int) -> List[Tuple[Any, ...]]:
+        if job.buffer is None:
+            return []
+        return await anyio.to_thread.run_sync(job.buffer.page, offset, limit)
+
+    def cancel(self, job_id: str, database_id: Optional[str] = None) -> bool:
+        """Cancel a queued or running job, or drop a finished one and its results."""
+        job = self.get(job_id, database_id)
+        if job is None:
+            return False
+        if job.finished:
+            self._drop(job_id)
+            return True
+        registry.cancel(job_id)     # stops the statement on the server
+        if job.task is not None:
+            job.task.cancel()
+        return True
+
+    def list(self, database_id: Optional[str] = None) -> List[QueryJob]:
+        self.purge_expired()
+        return [j for j in self._jobs.values() if database_id is None or j.database_id == database_id]
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        expired = [k for k, j in self._jobs.items() if j.finished_at and now - j.finished_at > self.ttl]
+        for k in expired:
+            self._drop(k)
+        return len(expired)
+
+    def _drop(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id, None)
+        if job is not None and job.buffer is not None:
+            job.buffer.close()      # frees memory / deletes the spill file
+
+
+jobs = JobManager(
+    max_workers=settings.sql_jobs_max_workers,
+    max_pending=settings.sql_jobs_max_pending,
+    ttl=settings.sql_jobs_ttl,
+    max_rows=settings.sql_jobs_max_rows,
+    timeout=settings.sql_jobs_timeout,
+)
@@ -0,0 +1,240 @@
+# backend/sql/metrics.py
+"""
+Per-phase timings for SQL executions.
+
+A QueryTiming is opened around each execution with track() and made current via a
+context variable, so code further down (token acquisition, connect, the worker
+thread running execute/fetch) records into it with phase() without having to pass
+it around. anyio copies the context into worker threads, so the same record is
+visible there. Nested track() calls join the outer record; only the outermost one
+is published.
+
+Phases: plan (cost-guard estimate, see sql/costguard.py), queue (waiting for an
+executor slot), checkout (pool acquire, which includes token + connect when a new
+connection is opened), token, connect, execute, fetch, encode (response
+serialization, recorded by the endpoint).
+
+Published records feed fixed-bucket histograms keyed by (phase, caller, database)
+and a short ring of recent records.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+PHASES = ("plan", "queue", "checkout", "token", "connect", "execute", "fetch", "encode", "total")
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+
+@dataclass
+class QueryTiming:
+    database_id: str
+    caller: str
+    started: float = field(default_factory=time.perf_counter)
+    phases: Dict[str, float] = field(default_factory=dict)   # seconds, accumulated
+    rows: int = 0
+    bytes: int = 0
+    ok: bool = True
+    cache_hit: bool = False
+    sql: Optional[str] = None
+    error: Optional[str] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def as_ms(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {f"{k}_ms": round(v * 1000, 2) for k, v in self.phases.items()}
+        out["rows"] = self.rows
+        out["bytes"] = self.bytes
+        return out
+
+
+_current: ContextVar[Optional[QueryTiming]] = ContextVar("sql_query_timing", default=None)
+
+
+def current_timing() -> Optional[QueryTiming]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block into the current record; a no-op outside track()."""
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(name, time.perf_counter() - started)
+
+
+def open_timing(database_id: str, caller: str) -> Tuple[QueryTiming, bool]:
+    """(record, owned): the current record if there is one, else a new one the caller must finish()."""
+    outer = _current.get()
+    if outer is not None:
+        return outer, False
+    return QueryTiming(database_id=database_id, caller=caller), True
+
+
+@contextmanager
+def using(t: QueryTiming) -> Iterator[QueryTiming]:
+    """Make `t` current for the block without publishing it at the end."""
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+
+def finish(t: QueryTiming, ok: bool = True, error: Optional[BaseException] = None) -> None:
+    t.ok = t.ok and ok and error is None
+    if error is not None and t.error is None:
+        t.error = str(error) or type(error).__name__
+    t.phases["total"] = time.perf_counter() - t.started
+    metrics.record(t)
+
+
+@contextmanager
+def track(database_id: str, caller: str) -> Iterator[QueryTiming]:
+    t, owned = open_timing(database_id, caller)
+    if not owned:
+        try:
+            yield t
+        except BaseException as e:
+            # Keep the innermost error; the outer block may only see a wrapped one.
+            t.error = t.error or str(e) or type(e).__name__
+            raise
+        return
+    error: Optional[BaseException] = None
+    try:
+        with using(t):
+            yield t
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        finish(t, error=error)
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)    # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, ms: float) -> None:
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (None if empty or past the last bucket)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts[:-1]):
+            seen += c
+            if seen >= rank:
+                return float(BUCKETS_MS[i])
+        return None
+
+
+class SqlMetrics:
+    def __init__(self, recent: int = 200):
+        self._lock = threading.Lock()
+        self._hist: Dict[Tuple[str, str, str], _Histogram] = {}
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._bytes: Dict[Tuple[str, str], int] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+        self._listeners: List[Callable[[QueryTiming], None]] = []
+
+    def add_listener(self, fn: Callable[[QueryTiming], None]) -> None:
+        """Call fn(record) for every published record. It runs inline, so it must not block."""
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable[[QueryTiming], None]) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def record(self, t: QueryTiming) -> None:
+        key = (t.caller, t.database_id)
+        with self._lock:
+            for name, seconds in t.phases.items():
+                h = self._hist.get((name, *key))
+                if h is None:
+                    h = self._hist[(name, *key)] = _Histogram()
+                h.observe(seconds * 1000)
+            self._rows[key] = self._rows.get(key, 0) + t.rows
+            self._bytes[key] = self._bytes.get(key, 0) + t.bytes
+            if not t.ok:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            self._recent.append({"caller": t.caller, "databaseId": t.database_id, "ok": t.ok,
+                                 "cacheHit": t.cache_hit, "at": time.time(), **t.as_ms()})
+        for fn in list(self._listeners):
+            fn(t)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            hist = [
+                {"phase": p, "caller": c, "databaseId": d, "count": h.count,
+                 "avg_ms": round(h.sum / h.count, 2) if h.count else 0.0,
+                 "p50_ms": h.quantile(0.5), "p95_ms": h.quantile(0.95), "p99_ms": h.quantile(0.99)}
+                for (p, c, d), h in sorted(self._hist.items())
+            ]
+            totals = [
+                {"caller": c, "databaseId": d, "rows": self._rows.get((c, d), 0),
+                 "bytes": self._bytes.get((c, d), 0), "errors": self._errors.get((c, d), 0)}
+                for (c, d) in sorted(self._rows)
+            ]
+            return {"histograms": hist, "totals": totals, "recent": list(self._recent)}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the histograms and counters."""
+        lines: List[str] = [
+            "# HELP sql_phase_duration_ms Time spent per phase of a SQL execution.",
+            "# TYPE sql_phase_duration_ms histogram",
+        ]
+        with self._lock:
+            for (p, c, d), h in sorted(self._hist.items()):
+                labels = f'phase="{p}",caller="{c}",database_id="{_esc(d)}"'
+                cumulative = 0
+                for i, bound in enumerate(BUCKETS_MS):
+                    cumulative += h.counts[i]
+                    lines.append(f'sql_phase_duration_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'sql_phase_duration_ms_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"sql_phase_duration_ms_sum{{{labels}}} {round(h.sum, 3)}")
+                lines.append(f"sql_phase_duration_ms_count{{{labels}}} {h.count}")
+            for name, data, help_ in (("sql_rows_total", self._rows, "Rows returned."),
+                                      ("sql_bytes_total", self._bytes, "Approximate bytes returned."),
+                                      ("sql_errors_total", self._errors, "Failed executions.")):
+                lines.append(f"# HELP {name} {help_}")
+                lines.append(f"# TYPE {name} counter")
+                for (c, d), v in sorted(data.items()):
+                    lines.append(f'{name}{{caller="{c}",database_id="{_esc(d)}"}} {v}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self._rows.clear()
+            self._bytes.clear()
+            self._errors.clear()
+            self._recent.clear()
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"')
+
+
+metrics = SqlMetrics()
@@ -1,10 +1,21 @@
 # fabric_explorer/sql/odbc.py
-from typing import List, Tuple, Any, Optional
+from typing import List, Tuple, Any, Optional, Iterator, AsyncIterator
 import os
+from abc import ABC, abstractmethod
+import sys
+from contextlib import contextmanager, ExitStack, AsyncExitStack
 from functools import lru_cache
 import pyodbc
 import anyio
-from auth.broker import sql_access_token_buffer
+import time
+from auth.broker import sql_access_token
+from settings import settings
+from sql.converters import apply_output_mode
+from sql.executor import executor
+from sql.metrics import phase, track, open_timing, using, finish
+from sql.pool import get_pool
+from sql.registry import registry, QueryCancelled, QueryTimedOut
+from sql.rewrite import push_down_limit
 
 ACCESS_TOKEN_ATTR = 1256  # SQL_COPT_SS_ACCESS_TOKEN
 
@@ -33,32 +44,369 @@ def build_conn_str(server: str, database: str, port: int = 1433) -> str:
         # IMPORTANT: Do NOT include Authentication=... when using ACCESS_TOKEN (attr 1256)
     )
 
-def _connect(server: str, database: str, port: int) -> pyodbc.Connection:
-    conn_str = build_conn_str(server, database, port)
-    token_buf = sql_access_token_buffer()  # length-prefixed UTF-16-LE
-    return pyodbc.connect(conn_str, attrs_before={ACCESS_TOKEN_ATTR: token_buf})
+# ---------- execution backends ----------
+
+class ExecutionBackend(ABC):
+    """
+    Where connections come from. The pool, executor, registry, cache and metrics sit
+    above it, so every backend runs the same query path. Connections must behave like
+    pyodbc's (cursor/execute/fetchmany/cancel/rollback) and raise pyodbc.Error subclasses.
+    """
+    name = "base"
+
+    @abstractmethod
+    def driver(self) -> str:
+        ...
+
+    @abstractmethod
+    def connect(self, server: str, database: str, port: int) -> Tuple[Any, float]:
+        """(connection, expiry of its credentials as a Unix timestamp)."""
+
+
+class OdbcBackend(ExecutionBackend):
+    """Fabric / SQL Server through msodbcsql, authenticated with an AAD access token."""
+    name = "odbc"
+
+    def driver(self) -> str:
+        return choose_driver()
+
+    def connect(self, server: str, database: str, port: int) -> Tuple[pyodbc.Connection, float]:
+        conn_str = build_conn_str(server, database, port)
+        token_buf, expires_at = sql_access_token()  # length-prefixed UTF-16-LE
+        with phase("connect"):
+            conn = pyodbc.connect(conn_str, attrs_before={ACCESS_TOKEN_ATTR: token_buf})
+        return conn, expires_at
+
+
+_backend: Optional[ExecutionBackend] = None
+
+def get_backend() -> ExecutionBackend:
+    """The backend chosen by SQL_BACKEND: odbc (default) or local (sql/standin.py)."""
+    global _backend
+    if _backend is None:
+        if settings.sql_backend == "local":
+            from sql.standin import LocalBackend    # imports this module
+            _backend = LocalBackend.from_settings()
+        elif settings.sql_backend == "odbc":
+            _backend = OdbcBackend()
+        else:
+            raise RuntimeError(f"Unknown SQL_BACKEND {settings.sql_backend!r} (expected 'odbc' or 'local')")
+    return _backend
+
+def set_backend(backend: Optional[ExecutionBackend]) -> None:
+    """Swap the backend (None: back to SQL_BACKEND). Connections already pooled stay until close_all_pools()."""
+    global _backend
+    _backend = backend
+
+def _open(server: str, database: str, port: int) -> Tuple[Any, float]:
+    return get_backend().connect(server, database, port)
+
+def _connect(server: str, database: str, port: int) -> Any:
+    return _open(server, database, port)[0]
+
+# Errors after which a connection must not go back into the pool
+_BROKEN_CONN_ERRORS = (pyodbc.OperationalError, pyodbc.InterfaceError)
+
+@contextmanager
+def pooled_connection(server: str, database: str, port: int, output: str = "python") -> Iterator[pyodbc.Connection]:
+    """
+    Blocking; call from a worker thread. Falls back to one-shot connections if pooling is off.
+    `output` selects the connection's output converters (sql/converters.py).
+    """
+    if not settings.sql_pool_enabled:
+        with phase("checkout"):
+            conn = _connect(server, database, port)
+        try:
+            apply_output_mode(conn, output)
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    pool = get_pool((server, port), lambda db: _open(server, db, port))
+    with phase("checkout"):
+        pc = pool.acquire(database)
+    discard = True
+    try:
+        apply_output_mode(pc.conn, output)
+    except BaseException:
+        pool.release(pc)
+        raise
+    try:
+        yield pc.conn
+        discard = False
+    except pyodbc.Error as e:
+        discard = isinstance(e, _BROKEN_CONN_ERRORS)
+        raise
+    finally:
+        pool.release(pc, discard=discard)
+
+def _fetch_limited(cur: pyodbc.Cursor, limit: int) -> List[Tuple[Any, ...]]:
+    """Fetch at most `limit` rows; if the server may have more, cancel instead of draining them."""
+    rows: List[Tuple[Any, ...]] = []
+    while len(rows) < limit:
+        batch = cur.fetchmany(min(limit - len(rows), settings.sql_stream_max_batch_rows))
+        if not batch:
+            return rows
+        rows.extend(batch)
+    cur.cancel()
+    return rows
 
 async def exec_query(server: str, database: str, port: int, sql: str,
                      params: Optional[Tuple[Any, ...]] = None,
-                     timeout: int = 60) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+                     timeout: int = 60,
+                     max_rows: Optional[int] = None,
+                     caller: str = "query",
+                     query_id: Optional[str] = None,
+                     database_id: Optional[str] = None,
+                     output: str = "python") -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    """
+    Run one statement and return (columns, rows). `caller` picks the executor lane
+    (query | agent | introspect | probe | export | job). Phase timings are recorded under
+    database_id (or the database name) and caller; see sql/metrics.py.
+
+    The statement is registered under `query_id` (generated if omitted) while it runs.
+    Cancelling the awaiting task, exceeding `timeout`, or registry.cancel(query_id)
+    all cancel the cursor on the server.
+
+    With max_rows, TOP (max_rows + 1) is pushed into the statement when that is safe, and
+    fetching stops at max_rows + 1 rows either way; callers detect truncation with
+    len(rows) > max_rows.
+
+    `output` is the value conversion mode (python | fast | exact, see sql/converters.py);
+    with fast or exact, DECIMAL, DATETIME and UNIQUEIDENTIFIER values arrive ready for JSON.
+    """
+    if max_rows is not None:
+        sql = push_down_limit(sql, max_rows + 1) or sql
+
+    q = registry.register(server, database, sql, caller=caller, query_id=query_id, database_id=database_id)
+
     def _run():
-        with _connect(server, database, port) as conn:
+        with pooled_connection(server, database, port, output) as conn:
             conn.timeout = timeout
             cur = conn.cursor()
-            cur.execute(sql, params or ())
-            cols = [d[0] for d in cur.description] if cur.description else []
-            rows = cur.fetchall() if cur.description else []
+            registry.attach_cursor(q.query_id, cur)
+            try:
+                with phase("execute"):
+                    cur.execute(sql, params or ())
+                cols = [d[0] for d in cur.description] if cur.description else []
+                with phase("fetch"):
+                    if not cur.description:
+                        rows = []
+                    elif max_rows is None:
+                        rows = cur.fetchall()
+                    else:
+                        rows = _fetch_limited(cur, max_rows + 1)
+                return cols, rows
+            finally:
+                registry.detach_cursor(q.query_id)
+    with track(database_id or database, caller) as timing:
+        timing.sql = timing.sql or sql
+        try:
+            queued = time.perf_counter()
+            async with executor.slot(server, caller):
+                timing.add("queue", time.perf_counter() - queued)
+                try:
+                    with anyio.fail_after(timeout):
+                        cols, rows = await executor.run(_run, cancellable=True,
+                                                        on_cancel=lambda: registry.cancel(q.query_id))
+                except TimeoutError:
+                    registry.cancel(q.query_id)
+                    raise QueryTimedOut(f"Query {q.query_id} exceeded {timeout}s and was cancelled")
+            timing.rows += len(rows)
+            timing.bytes += _estimate_bytes(rows)
             return cols, rows
-    try:
-        return await anyio.to_thread.run_sync(_run)
-    except pyodbc.InterfaceError as e:
-        raise RuntimeError(
+        except anyio.get_cancelled_exc_class():
+            registry.cancel(q.query_id)     # caller gave up (client disconnect, agent run abandoned)
+            raise
+        except pyodbc.Error as e:
+            if q.cancelled:
+                raise QueryCancelled(f"Query {q.query_id} was cancelled") from e
+            raise _friendly_error(e) from e
+        finally:
+            registry.unregister(q.query_id)
+
+def _friendly_error(e: pyodbc.Error) -> RuntimeError:
+    if isinstance(e, pyodbc.InterfaceError):
+        return RuntimeError(
             f"ODBC interface error: {e}. "
             "Ensure 64-bit 'ODBC Driver 18 for SQL Server' is installed. "
             "Python sees drivers: " + str(pyodbc.drivers())
-        ) from e
-    except pyodbc.Error as e:
-        raise RuntimeError(f"ODBC error: {e}") from e
+        )
+    return RuntimeError(f"ODBC error: {e}")
+
+# ---------- streaming ----------
+
+def _approx_row_bytes(row: Tuple[Any, ...]) -> int:
+    size = 0
+    for v in row:
+        if isinstance(v, (str, bytes, bytearray)):
+            size += len(v) + 16
+        else:
+            size += 16
+    return size
+
+def _estimate_bytes(rows: List[Tuple[Any, ...]], sample: int = 100) -> int:
+    if not rows:
+        return 0
+    head = rows[:sample]
+    return int(sum(_approx_row_bytes(r) for r in head) * len(rows) / len(head))
+
+class RowStream:
+    """
+    Streams one query's rows as batches fetched with cursor.fetchmany() on a worker thread.
+    The batch size adapts so each batch is roughly SQL_STREAM_BATCH_BYTES. Use as:
+
+        async with iter_query(server, database, port, sql) as stream:
+            stream.columns
+            async for batch in stream:
+                ...
+    """
+
+    def __init__(self, server: str, database: str, port: int, sql: str,
+                 params: Optional[Tuple[Any, ...]] = None, timeout: int = 60,
+                 max_rows: Optional[int] = None, caller: str = "query",
+                 query_id: Optional[str] = None, database_id: Optional[str] = None, output: str = "python"):
+        self.server, self.database, self.port = server, database, port
+        self.output = output
+        self.caller = caller
+        self.query_id = query_id
+        self.database_id = database_id
+        self.sql, self.params, self.timeout = sql, params or (), timeout
+        # Same contract as exec_query: at most max_rows + 1 rows are fetched.
+        self.limit = max_rows + 1 if max_rows is not None else None
+        if self.limit is not None:
+            self.sql = push_down_limit(self.sql, self.limit) or self.sql
+        self.columns: List[str] = []
+        self.description: Optional[Tuple[Tuple[Any, ...], ...]] = None
+        self.row_count = 0
+        self.batch_rows = settings.sql_stream_batch_rows
+        self._stack: Optional[ExitStack] = None
+        self._cursor: Optional[pyodbc.Cursor] = None
+        self._exhausted = False
+        self._slot: Optional[AsyncExitStack] = None
+        self.timing, self._owns_timing = open_timing(database_id or database, caller)
+        self.timing.sql = self.timing.sql or self.sql
+
+    async def open(self) -> "RowStream":
+        q = registry.register(self.server, self.database, self.sql, caller=self.caller,
+                              query_id=self.query_id, database_id=self.database_id)
+        self.query_id = q.query_id
+
+        def _open():
+            stack = ExitStack()
+            try:
+                conn = stack.enter_context(pooled_connection(self.server, self.database, self.port, self.output))
+                conn.timeout = self.timeout
+                cur = conn.cursor()
+                registry.attach_cursor(q.query_id, cur)
+                with phase("execute"):
+                    cur.execute(self.sql, self.params)
+            except BaseException:
+                stack.__exit__(*sys.exc_info())
+                raise
+            return stack, cur
+        # The executor slot is held for the stream's whole life, like the connection.
+        slot = AsyncExitStack()
+        slot.callback(registry.unregister, q.query_id)
+        try:
+            queued = time.perf_counter()
+            await slot.enter_async_context(executor.slot(self.server, self.caller))
+            self.timing.add("queue", time.perf_counter() - queued)
+            with using(self.timing):
+                self._stack, self._cursor = await executor.run(_open)
+        except BaseException as e:
+            await slot.aclose()
+            if self._owns_timing:
+                finish(self.timing, error=e)
+            if isinstance(e, pyodbc.Error):
+                raise self._error(e) from e
+            raise
+        self._slot = slot
+        self.description = self._cursor.description
+        self.columns = [d[0] for d in self.description] if self.description else []
+        return self
+
+    async def aclose(self, exc: Optional[BaseException] = None) -> None:
+        stack, cur, slot = self._stack, self._cursor, self._slot
+        self._stack, self._cursor, self._slot = None, None, None
+        if stack is None:
+            return
+        exc_info = (type(exc), exc, exc.__traceback__) if exc else (None, None, None)
+
+        def _close():
+            if cur is not None and not self._exhausted:
+                # Closed early (limit reached, client gone): stop the server instead of draining.
+                try:
+                    cur.cancel()
+                except pyodbc.Error:
+                    pass
+            stack.__exit__(*exc_info)
+        with anyio.CancelScope(shield=True):
+            try:
+                await executor.run(_close)
+            finally:
+                await slot.aclose()
+                if self._owns_timing:
+                    finish(self.timing, error=exc)
+
+    async def __aenter__(self) -> "RowStream":
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose(exc)
+
+    def __aiter__(self) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        return self._batches()
+
+    async def _batches(self) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        if self._cursor is None or not self.description:
+            self._exhausted = True
+            return
+        cur = self._cursor
+        while True:
+            size = self.batch_rows
+            if self.limit is not None:
+                size = min(size, self.limit - self.row_count)
+                if size <= 0:
+                    return
+            fetch_started = time.perf_counter()
+            try:
+                batch = await executor.run(cur.fetchmany, size)
+            except pyodbc.Error as e:
+                raise self._error(e) from e
+            finally:
+                self.timing.add("fetch", time.perf_counter() - fetch_started)
+            if not batch:
+                self._exhausted = True
+                return
+            self.row_count += len(batch)
+            self.timing.rows += len(batch)
+            self._adapt(batch)
+            yield batch
+
+    def _error(self, e: pyodbc.Error) -> RuntimeError:
+        if self.query_id and registry.is_cancelled(self.query_id):
+            return QueryCancelled(f"Query {self.query_id} was cancelled")
+        return _friendly_error(e)
+
+    def _adapt(self, batch: List[Tuple[Any, ...]]) -> None:
+        sample = batch[:: max(1, len(batch) // 32)]
+        avg = sum(_approx_row_bytes(r) for r in sample) / len(sample)
+        self.timing.bytes += int(avg * len(batch))
+        target = int(settings.sql_stream_batch_bytes / max(avg, 1))
+        self.batch_rows = max(settings.sql_stream_min_batch_rows,
+                              min(settings.sql_stream_max_batch_rows, target))
+
+def iter_query(server: str, database: str, port: int, sql: str,
+               params: Optional[Tuple[Any, ...]] = None,
+               timeout: int = 60,
+               max_rows: Optional[int] = None,
+               caller: str = "query",
+               query_id: Optional[str] = None,
+               database_id: Optional[str] = None,
+               output: str = "python") -> RowStream:
+    return RowStream(server, database, port, sql, params, timeout, max_rows, caller, query_id, database_id, output)
 
 # ---------- metadata helpers ----------
 SCHEMATA_SQL = "SELECT schema_name FROM INFORMATION_SCHEMA.SCHEMATA ORDER BY schema_name;"
@@ -77,13 +425,20 @@ ORDER BY ORDINAL_POSITION;
 """
 
 async def fetch_schemata(server: str, database: str, port: int) -> List[str]:
-    cols, rows = await exec_query(server, database, port, SCHEMATA_SQL)
+    cols, rows = await exec_query(server, database, port, SCHEMATA_SQL, caller="introspect")
     return [r[0] for r in rows]
 
 async def fetch_tables(server: str, database: str, port: int, schema: str) -> List[Tuple[str, str]]:
-    cols, rows = await exec_query(server, database, port, TABLES_SQL, (schema,))
+    cols, rows = await exec_query(server, database, port, TABLES_SQL, (schema,), caller="introspect")
     return [(r[0], r[1]) for r in rows]
 
 async def fetch_columns(server: str, database: str, port: int, schema: str, table: str) -> List[Tuple[Any, ...]]:
-    cols, rows = await exec_query(server, database, port, COLUMNS_SQL, (schema, table))
+    cols, rows = await exec_query(server, database, port, COLUMNS_SQL, (schema, table), caller="introspect")
     return rows
+
+async def fetch_preview(server: str, database: str, port: int, schema: str, table: str, rows: int,
+                        database_id: Optional[str] = None) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    # TOP without ORDER BY lets the engine stop after the first rows it reads.
+    name = ".".join("[" + part.replace("]", "]]") + "]" for part in (schema, table))
+    return await exec_query(server, database, port, f"SELECT TOP ({int(rows)}) * FROM {name}",
+                            max_rows=rows, caller="introspect", database_id=database_id)
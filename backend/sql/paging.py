@@ -0,0 +1,338 @@
+# backend/sql/paging.py
+"""
+Keyset (seek) pagination over an arbitrary read-only SELECT.
+
+The sort key comes from the statement's top-level ORDER BY (plain column
+references only), with the table's primary key appended as a tie-breaker when the
+statement reads a single table; without an ORDER BY the primary key alone is used.
+The key must be unique, since each page starts strictly after the previous page's
+last key and rows tied with it would be skipped. Without a primary key (joins,
+CTEs, tables without an enforced key) the caller has to assert that its ORDER BY
+is unique; every key column must also be in the select list. Each page runs
+
+    [WITH ...] SELECT TOP (n + 1) * FROM (<statement without ORDER BY>) AS [_page]
+    WHERE <row is after the last key seen> ORDER BY <key>
+
+so page 1000 costs the same as page 1. The continuation token carries only the
+last row's key values and a fingerprint of (statement, params, key); the key
+itself is re-derived from the statement on every request.
+"""
+import base64
+import datetime as dt
+import decimal
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sql.rewrite import Token, tokenize, strip_trailing_semicolons, main_select_index, is_single_statement
+
+PAGE_ALIAS = "[_page]"
+
+
+class PagingError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SortKey:
+    column: str
+    desc: bool = False
+
+    def describe(self) -> dict:
+        return {"column": self.column, "desc": self.desc}
+
+
+@dataclass
+class PagedStatement:
+    prefix: str                 # WITH ... part (may be empty)
+    body: str                   # main SELECT without its ORDER BY (kept when it has TOP)
+    order_by: Optional[List[SortKey]]
+    single_table: Optional[Tuple[str, str]]     # (schema, table) when the SELECT reads one table
+    columns: Optional[List[str]] = None         # output column names; None when the select list has a *
+
+
+def _unquote(text: str) -> str:
+    if len(text) >= 2 and text[0] in '["' and text[-1] in ']"':
+        return text[1:-1].replace("]]", "]").replace('""', '"')
+    return text
+
+
+def _split_top_level(tokens: List[Token], depth: int) -> List[List[Token]]:
+    parts: List[List[Token]] = [[]]
+    for t in tokens:
+        if t.kind == "punct" and t.text == "," and t.depth == depth:
+            parts.append([])
+        else:
+            parts[-1].append(t)
+    return parts
+
+
+def _sort_key(item: List[Token]) -> Optional[SortKey]:
+    desc = False
+    if item and item[-1].upper in ("ASC", "DESC"):
+        desc = item[-1].upper == "DESC"
+        item = item[:-1]
+    # [schema.]table.column or column; anything else (expressions, ordinals) is not a keyset column
+    if not item or len(item) % 2 == 0:
+        return None
+    for i, t in enumerate(item):
+        if i % 2 == 1:
+            if t.text != ".":
+                return None
+        elif t.kind not in ("word", "ident"):
+            return None
+    return SortKey(_unquote(item[-1].text), desc)
+
+
+_SELECT_LIST_END = {"FROM", "INTO", "WHERE", "GROUP", "HAVING", "ORDER", "UNION", "INTERSECT", "EXCEPT", "OPTION", "FOR"}
+
+
+def _item_name(item: List[Token]) -> Optional[str]:
+    """Output name of one select-list item: its alias, or the column it references."""
+    if len(item) >= 3 and item[1].text == "=" and item[0].kind in ("word", "ident"):
+        return _unquote(item[0].text)                       # alias = expr
+    last = item[-1]
+    if last.kind == "string" and len(item) >= 2 and item[-2].upper == "AS":
+        return last.text[1:-1].replace("''", "'")
+    if last.kind not in ("word", "ident"):
+        return None
+    if len(item) == 1 or item[-2].text in (".", ")") or item[-2].kind in ("word", "ident", "number", "string"):
+        return _unquote(last.text)                          # column, t.column, expr AS alias, expr alias
+    return None
+
+
+def _select_list(tokens: List[Token], idx: int) -> Optional[List[str]]:
+    """Output column names of the SELECT at tokens[idx] (unnamed items as ""), or None if it selects *."""
+    pos = idx + 1
+    if pos < len(tokens) and tokens[pos].upper in ("ALL", "DISTINCT"):
+        pos += 1
+    if pos < len(tokens) and tokens[pos].upper == "TOP":
+        pos += 1
+        if pos < len(tokens) and tokens[pos].text == "(":
+            while pos < len(tokens) and not (tokens[pos].text == ")" and tokens[pos].depth == 0):
+                pos += 1
+        pos += 1
+        while pos < len(tokens) and tokens[pos].upper in ("PERCENT", "WITH", "TIES"):
+            pos += 1
+    end = pos
+    while end < len(tokens) and not (tokens[end].depth == 0 and tokens[end].upper in _SELECT_LIST_END):
+        end += 1
+    names: List[str] = []
+    for item in _split_top_level(tokens[pos:end], 0):
+        if item and item[-1].text == "*" and (len(item) == 1 or item[-2].text == "."):
+            return None
+        names.append((_item_name(item) or "") if item else "")
+    return names
+
+
+def _single_table(tokens: List[Token], start: int, depth: int) -> Optional[Tuple[str, str]]:
+    words = {t.upper for t in tokens[start:] if t.depth == depth and t.kind == "word"}
+    if words & {"JOIN", "APPLY", "GROUP", "DISTINCT", "UNION", "INTERSECT", "EXCEPT", "PIVOT", "UNPIVOT"}:
+        return None
+    froms = [i for i in range(start, len(tokens)) if tokens[i].depth == depth and tokens[i].upper == "FROM"]
+    if len(froms) != 1:
+        return None
+    name: List[str] = []
+    i = froms[0] + 1
+    while i < len(tokens) and tokens[i].kind in ("word", "ident"):
+        name.append(_unquote(tokens[i].text))
+        if i + 1 < len(tokens) and tokens[i + 1].text == ".":
+            i += 2
+        else:
+            i += 1
+            break
+    if not name or len(name) > 3:
+        return None
+    # a comma after the table means an old-style join
+    rest = tokens[i:]
+    if any(t.text == "," and t.depth == depth for t in rest):
+        return None
+    return (name[-2] if len(name) >= 2 else "dbo"), name[-1]
+
+
+def analyze(sql: str) -> PagedStatement:
+    sql = strip_trailing_semicolons(sql)
+    tokens = tokenize(sql)
+    if not is_single_statement(tokens):
+        raise PagingError("Paging needs a single SELECT statement.")
+    idx = main_select_index(tokens)
+    if idx is None:
+        raise PagingError("Paging needs a SELECT (or WITH ... SELECT) statement.")
+    top_level = [t for t in tokens[idx:] if t.depth == 0 and t.kind == "word"]
+    if any(t.upper in ("OFFSET", "OPTION", "INTO", "FOR") for t in top_level):
+        raise PagingError("Statements with OFFSET/FETCH, OPTION, INTO or FOR can't be paged; drop that clause.")
+    pos = idx + 1
+    if pos < len(tokens) and tokens[pos].upper in ("ALL", "DISTINCT"):
+        pos += 1
+    has_top = pos < len(tokens) and tokens[pos].upper == "TOP"
+
+    order_at = None
+    for i in range(idx, len(tokens) - 1):
+        if tokens[i].depth == 0 and tokens[i].upper == "ORDER" and tokens[i + 1].upper == "BY":
+            order_at = i
+    order_by = None
+    end = len(sql)
+    if order_at is not None:
+        keys = [_sort_key(item) for item in _split_top_level(tokens[order_at + 2:], 0)]
+        if not all(keys):
+            raise PagingError("ORDER BY must list plain column names (no expressions or ordinals) to page by it.")
+        order_by = keys
+        # A derived table may only keep its ORDER BY alongside TOP.
+        if not has_top:
+            end = tokens[order_at].start
+    body_tokens = tokens[:order_at] if order_at is not None else tokens
+    return PagedStatement(
+        prefix=sql[: tokens[idx].start],
+        body=sql[tokens[idx].start: end].rstrip(),
+        order_by=order_by,
+        single_table=_single_table(body_tokens, idx + 1, 0),
+        columns=_select_list(tokens, idx),
+    )
+
+
+def sort_key(stmt: PagedStatement, primary_key: Sequence[str], unique: bool = False) -> List[SortKey]:
+    """
+    ORDER BY columns plus the primary key. `unique` is the caller's word that the ORDER BY
+    alone is unique; without it or a primary key the statement can't be paged safely.
+    """
+    keys = list(stmt.order_by or [])
+    have = {k.column.lower() for k in keys}
+    for col in primary_key:
+        if col.lower() not in have:
+            keys.append(SortKey(col))
+    if not keys:
+        raise PagingError(
+            "Can't derive a stable sort key: add an ORDER BY on unique column(s), "
+            "or query a single table that has a primary key."
+        )
+    if not primary_key and not unique:
+        raise PagingError(
+            "Can't tell whether the sort key is unique, and rows tied on it would be skipped between pages: "
+            'ORDER BY unique column(s) and pass "uniqueSortKey": true, or query a single table that has a primary key.'
+        )
+    if stmt.columns is not None:
+        selected = {c.lower() for c in stmt.columns}
+        missing = [k.column for k in keys if k.column.lower() not in selected]
+        if missing:
+            raise PagingError(f"Sort column(s) {', '.join(missing)} must be part of the selected columns to page by them.")
+    return keys
+
+
+def _col(key: SortKey) -> str:
+    return f"{PAGE_ALIAS}.[{key.column.replace(']', ']]')}]"
+
+
+def _after_predicate(keys: List[SortKey], values: Sequence[Any]) -> Tuple[str, List[Any]]:
+    """Rows strictly after `values` in key order. T-SQL sorts NULLs first ascending, last descending."""
+    ors: List[str] = []
+    params: List[Any] = []
+    for i, key in enumerate(keys):
+        v = values[i]
+        if v is None and key.desc:
+            continue                # nothing sorts after NULL when descending
+        terms: List[str] = []
+        for prev, pv in zip(keys[:i], values[:i]):
+            if pv is None:
+                terms.append(f"{_col(prev)} IS NULL")
+            else:
+                terms.append(f"{_col(prev)} = ?")
+                params.append(pv)
+        c = _col(key)
+        if v is None:
+            terms.append(f"{c} IS NOT NULL")
+        elif key.desc:
+            terms.append(f"({c} < ? OR {c} IS NULL)")
+            params.append(v)
+        else:
+            terms.append(f"{c} > ?")
+            params.append(v)
+        ors.append("(" + " AND ".join(terms) + ")")
+    return ("(" + " OR ".join(ors) + ")") if ors else "1 = 0", params
+
+
+def page_sql(stmt: PagedStatement, keys: List[SortKey], after: Optional[Sequence[Any]],
+             page_size: int) -> Tuple[str, List[Any]]:
+    """Statement for one page (page_size + 1 rows, to tell whether another page exists) and its extra params."""
+    where, params = ("", [])
+    if after is not None:
+        pred, params = _after_predicate(keys, after)
+        where = f" WHERE {pred}"
+    order = ", ".join(f"{_col(k)} {'DESC' if k.desc else 'ASC'}" for k in keys)
+    sql = f"{stmt.prefix}SELECT TOP ({int(page_size) + 1}) * FROM ({stmt.body}) AS {PAGE_ALIAS}{where} ORDER BY {order}"
+    return sql, params
+
+
+# ---------- continuation tokens ----------
+
+def fingerprint(sql: str, params: Sequence[Any], keys: List[SortKey]) -> str:
+    raw = repr((" ".join(t.text for t in tokenize(strip_trailing_semicolons(sql))), list(params),
+                [(k.column.lower(), k.desc) for k in keys]))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def _enc(v: Any) -> Any:
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, dt.datetime):
+        return {"dt": v.isoformat()}
+    if isinstance(v, dt.date):
+        return {"d": v.isoformat()}
+    if isinstance(v, dt.time):
+        return {"t": v.isoformat()}
+    if isinstance(v, decimal.Decimal):
+        return {"n": str(v)}
+    if isinstance(v, uuid.UUID):
+        return {"u": str(v)}
+    if isinstance(v, (bytes, bytearray)):
+        return {"b": base64.b64encode(bytes(v)).decode("ascii")}
+    return str(v)
+
+
+def _dec(v: Any) -> Any:
+    if not isinstance(v, dict) or len(v) != 1:
+        return v
+    (tag, s), = v.items()
+    return {
+        "dt": dt.datetime.fromisoformat, "d": dt.date.fromisoformat, "t": dt.time.fromisoformat,
+        "n": decimal.Decimal, "u": uuid.UUID, "b": base64.b64decode,
+    }[tag](s)
+
+
+def encode_token(fp: str, values: Sequence[Any]) -> str:
+    raw = json.dumps({"f": fp, "v": [_enc(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str, fp: str, n_keys: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        values = [_dec(v) for v in data["v"]]
+    except Exception:
+        raise PagingError("Malformed page token.")
+    if data.get("f") != fp or len(values) != n_keys:
+        raise PagingError("Page token does not belong to this query (SQL, params or sort key changed).")
+    return values
+
+
+def key_indexes(columns: List[str], keys: List[SortKey]) -> List[int]:
+    lower = [c.lower() for c in columns]
+    out = []
+    for k in keys:
+        if k.column.lower() not in lower:
+            raise PagingError(f"Sort column '{k.column}' must be part of the selected columns to page by it.")
+        out.append(lower.index(k.column.lower()))
+    return out
+
+
+PRIMARY_KEY_SQL = (
+    "SELECT kcu.COLUMN_NAME "
+    "FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc "
+    "JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu "
+    "  ON tc.CONSTRAINT_NAME = kcu.CONSTRAINT_NAME AND tc.TABLE_SCHEMA = kcu.TABLE_SCHEMA "
+    " AND tc.TABLE_NAME = kcu.TABLE_NAME "
+    "WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY' AND tc.TABLE_SCHEMA = ? AND tc.TABLE_NAME = ? "
+    "ORDER BY kcu.ORDINAL_POSITION"
+)
@@ -0,0 +1,358 @@
+# backend/sql/pool.py
+"""
+Thread-safe pool of reusable ODBC connections.
+
+Pools are scoped to a host, (server, port): many Fabric warehouses and Lakehouse
+SQL endpoints share one *.datawarehouse.fabric.microsoft.com host, so a connection
+left on one database can be re-targeted to another with USE instead of logging in
+again. Hosts that don't allow switching fall back to per-database reuse.
+
+Connections are checked out and returned from worker threads (see sql/odbc.py),
+so everything here is blocking and guarded by a threading.Condition.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from settings import settings
+
+log = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, int]                           # (server, port)
+Connector = Callable[[str], Tuple[Any, float]]      # database -> (connection, token_expires_at)
+
+# msodbcsql: SQL_COPT_SS_RESET_CONNECTION / SQL_RESET_CONNECTION_YES. Makes the driver run
+# sp_reset_connection before the next batch (drops temp tables, SET options, open transactions).
+RESET_CONNECTION_ATTR = 1204
+RESET_CONNECTION_YES = 1
+
+# Error 40508, "USE statement is not supported to switch between databases" (Azure SQL and
+# Fabric hosts that pin a session to its login database).
+USE_NOT_SUPPORTED = "40508"
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+@dataclass
+class PooledConnection:
+    conn: Any
+    key: PoolKey
+    database: str
+    created_at: float
+    expires_at: float       # recycle deadline (token expiry minus margin)
+    last_used: float
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        key: PoolKey,
+        connect: Connector,
+        *,
+        min_size: int,
+        max_size: int,
+        idle_timeout: float,
+        acquire_timeout: float,
+        health_check_after: float,
+        token_margin: float,
+        switch_database: bool,
+    ):
+        self.key = key
+        self._connect = connect
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+        self.token_margin = token_margin
+        self.switch_database = switch_database
+
+        self._cond = threading.Condition()
+        self._idle: List[PooledConnection] = []     # LIFO: hottest connection on top
+        self._in_use = 0                            # checked out or being opened
+        self._closed = False
+        self.counters: Dict[str, int] = {
+            "opened": 0, "reused": 0, "recycled": 0, "evicted": 0,
+            "health_failures": 0, "timeouts": 0,
+            "switches": 0, "switch_failures": 0,
+        }
+
+    # ---------- checkout / return ----------
+
+    def acquire(self, database: str) -> PooledConnection:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            pc: Optional[PooledConnection] = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError(f"Connection pool {self.key} is closed")
+                    stale = self._evict_locked()
+                    pc = self._take_idle_locked(database)
+                    if pc is not None:
+                        self._in_use += 1
+                        break
+                    if self._in_use + len(self._idle) < self.max_size:
+                        self._in_use += 1
+                        break
+                    if self._idle:
+                        # Full, and only idle connections on other databases that we can't
+                        # re-target: close the coldest one to make room.
+                        stale.append(self._idle.pop(0))
+                        self.counters["evicted"] += 1
+                        self._in_use += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Timed out after {self.acquire_timeout}s waiting for a connection to "
+                            f"{self.key[0]} (pool max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+            self._close_all(stale)
+
+            if pc is None:
+                return self._open_slot(database)
+            if not self._healthy(pc):
+                # Unhealthy: drop it and retry; the slot is given back first.
+                self.counters["health_failures"] += 1
+                self._drop(pc)
+                continue
+            if pc.database != database and not self._retarget(pc, database):
+                self._drop(pc)
+                continue
+            self.counters["reused"] += 1
+            return pc
+
+    def release(self, pc: PooledConnection, discard: bool = False) -> None:
+        if not discard:
+            try:
+                pc.conn.rollback()      # end any implicit transaction left by the query
+            except Exception:
+                discard = True
+        now = time.time()
+        if not discard and now >= pc.expires_at:
+            self.counters["recycled"] += 1
+            discard = True
+        if discard:
+            self._drop(pc)
+            return
+        with self._cond:
+            pc.last_used = now
+            if self._closed:
+                self._in_use -= 1
+                to_close = [pc]
+            else:
+                self._in_use -= 1
+                self._idle.append(pc)
+                to_close = []
+            self._cond.notify()
+        self._close_all(to_close)
+
+    # ---------- maintenance ----------
+
+    def evict_idle(self) -> int:
+        with self._cond:
+            stale = self._evict_locked()
+        self._close_all(stale)
+        return len(stale)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        self._close_all(idle)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            idle_by_db: Dict[str, int] = {}
+            for pc in self._idle:
+                idle_by_db[pc.database] = idle_by_db.get(pc.database, 0) + 1
+            return {
+                "server": self.key[0],
+                "port": self.key[1],
+                "idle": len(self._idle),
+                "idle_by_database": idle_by_db,
+                "in_use": self._in_use,
+                "max_size": self.max_size,
+                "switch_database": self.switch_database,
+                **self.counters,
+            }
+
+    # ---------- internals ----------
+
+    def _take_idle_locked(self, database: str) -> Optional[PooledConnection]:
+        # Prefer a connection already on the target database (most recently used first).
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].database == database:
+                return self._idle.pop(i)
+        if self.switch_database and self._idle:
+            return self._idle.pop()
+        return None
+
+    def _retarget(self, pc: PooledConnection, database: str) -> bool:
+        """
+        Point a pooled connection at another database on the same host, resetting session state.
+        False means the caller should drop the connection. Switching is turned off for the whole
+        host only when the host itself refuses it (USE ran but DB_NAME() didn't change, or error
+        40508); any other error (broken link, no access to that database) just costs this connection.
+        """
+        try:
+            try:
+                pc.conn.set_attr(RESET_CONNECTION_ATTR, RESET_CONNECTION_YES)
+            except Exception:
+                pass    # older pyodbc/driver: the rollback done on release is all we get
+            cur = pc.conn.cursor()
+            cur.execute(f"USE [{database.replace(']', ']]')}]; SELECT DB_NAME();")
+            while cur.description is None and cur.nextset():
+                pass
+            current = cur.fetchone()[0] if cur.description else None
+            cur.close()
+        except Exception as e:
+            self.counters["switch_failures"] += 1
+            if USE_NOT_SUPPORTED in str(e):
+                self._disable_switching(database, e)
+            else:
+                log.info("Switching a connection on %s to %s failed (%s); dropping it", self.key[0], database, e)
+            return False
+        if current is None or current.lower() != database.lower():
+            self.counters["switch_failures"] += 1
+            self._disable_switching(database, f"USE left the session on {current!r}")
+            return False
+        self.counters["switches"] += 1
+        pc.database = database
+        return True
+
+    def _disable_switching(self, database: str, reason: object) -> None:
+        log.info("Host %s does not support switching to %s (%s); using per-database connections",
+                 self.key[0], database, reason)
+        self.switch_database = False
+
+    def _open_slot(self, database: str) -> PooledConnection:
+        """Open a new connection for a slot already reserved in _in_use."""
+        try:
+            conn, token_expires_at = self._connect(database)
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        now = time.time()
+        self.counters["opened"] += 1
+        return PooledConnection(
+            conn=conn,
+            key=self.key,
+            database=database,
+            created_at=now,
+            expires_at=token_expires_at - self.token_margin,
+            last_used=now,
+        )
+
+    def _healthy(self, pc: PooledConnection) -> bool:
+        now = time.time()
+        if now >= pc.expires_at:
+            self.counters["recycled"] += 1
+            return False
+        if now - pc.last_used < self.health_check_after:
+            return True
+        try:
+            cur = pc.conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception as e:
+            log.info("Pooled connection to %s/%s failed health check: %s", pc.key[0], pc.database, e)
+            return False
+
+    def _drop(self, pc: PooledConnection) -> None:
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+        self._close_all([pc])
+
+    def _evict_locked(self) -> List[PooledConnection]:
+        now = time.time()
+        keep: List[PooledConnection] = []
+        stale: List[PooledConnection] = []
+        # _idle is LIFO, so the oldest-idle connections sit at the front.
+        surplus = len(self._idle) + self._in_use - self.min_size
+        for pc in self._idle:
+            if now >= pc.expires_at:
+                self.counters["recycled"] += 1
+                stale.append(pc)
+            elif surplus > 0 and now - pc.last_used > self.idle_timeout:
+                self.counters["evicted"] += 1
+                stale.append(pc)
+                surplus -= 1
+            else:
+                keep.append(pc)
+        self._idle = keep
+        return stale
+
+    @staticmethod
+    def _close_all(conns: List[PooledConnection]) -> None:
+        for pc in conns:
+            try:
+                pc.conn.close()
+            except Exception:
+                pass
+
+
+# ---------- process-wide registry ----------
+
+_POOLS: Dict[PoolKey, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _can_switch(server: str) -> bool:
+    if not settings.sql_pool_switch_database:
+        return False
+    host = server.lower().removeprefix("tcp:")
+    suffixes = [s.strip().lower() for s in settings.sql_pool_switch_hosts.split(",") if s.strip()]
+    return any(host.endswith(sfx) for sfx in suffixes)
+
+
+def get_pool(key: PoolKey, connect: Connector) -> ConnectionPool:
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                key,
+                connect,
+                min_size=settings.sql_pool_min_size,
+                max_size=settings.sql_pool_max_size,
+                idle_timeout=settings.sql_pool_idle_timeout,
+                acquire_timeout=settings.sql_pool_acquire_timeout,
+                health_check_after=settings.sql_pool_health_check_after,
+                token_margin=settings.sql_pool_token_margin,
+                switch_database=_can_switch(key[0]),
+            )
+            _POOLS[key] = pool
+        return pool
+
+
+def evict_idle_connections() -> int:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    return sum(p.evict_idle() for p in pools)
+
+
+def close_all_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for p in pools:
+        p.close()
+
+
+def pool_stats() -> List[Dict[str, object]]:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    return [p.stats() for p in pools]
@@ -0,0 +1,147 @@
+# backend/sql/registry.py
+"""
+In-flight query registry.
+
+Every execution registers under a query id, and attaches its cursor once created,
+so it can be cancelled from elsewhere: DELETE .../query/{query_id}, a client that
+disconnects, or a timeout. Cancelling calls cursor.cancel() (SQLCancel), which is
+safe to call from another thread while the owning thread is blocked in execute/fetch.
+
+A caller waiting on a coalesced execution (sql/singleflight.py) registers its own id
+with an on_cancel hook instead of a cursor: cancelling that id ends only its wait.
+"""
+import asyncio
+import threading
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from uuid import uuid4
+
+from starlette.requests import Request
+
+T = TypeVar("T")
+
+
+class QueryCancelled(RuntimeError):
+    pass
+
+
+class QueryTimedOut(QueryCancelled):
+    pass
+
+
+@dataclass
+class InflightQuery:
+    query_id: str
+    server: str
+    database: str
+    caller: str
+    sql: str
+    database_id: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    cursor: Any = None
+    cancelled: bool = False
+    on_cancel: Optional[Callable[[], None]] = None      # set for callers waiting on a shared execution
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            "queryId": self.query_id,
+            "databaseId": self.database_id,
+            "caller": self.caller,
+            "sql": self.sql[:500],
+            "elapsedSeconds": round(time.time() - self.started_at, 3),
+            "cancelled": self.cancelled,
+            "coalesced": self.on_cancel is not None,
+        }
+
+
+class QueryRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries: Dict[str, InflightQuery] = {}
+
+    def register(self, server: str, database: str, sql: str, *, caller: str,
+                 query_id: Optional[str] = None, database_id: Optional[str] = None) -> InflightQuery:
+        q = InflightQuery(query_id=query_id or str(uuid4()), server=server, database=database,
+                          caller=caller, sql=sql, database_id=database_id)
+        with self._lock:
+            if q.query_id in self._queries:
+                raise ValueError(f"Query id {q.query_id} is already running")
+            self._queries[q.query_id] = q
+        return q
+
+    def attach_cursor(self, query_id: str, cursor: Any) -> None:
+        """Called from the worker thread right before execute()."""
+        with self._lock:
+            q = self._queries.get(query_id)
+            if q is None:
+                return
+            if q.cancelled:
+                raise QueryCancelled(f"Query {query_id} was cancelled")
+            q.cursor = cursor
+
+    def detach_cursor(self, query_id: str) -> None:
+        with self._lock:
+            q = self._queries.get(query_id)
+            if q is not None:
+                q.cursor = None
+
+    def unregister(self, query_id: str) -> None:
+        with self._lock:
+            self._queries.pop(query_id, None)
+
+    def is_running(self, query_id: str) -> bool:
+        with self._lock:
+            return query_id in self._queries
+
+    def is_cancelled(self, query_id: str) -> bool:
+        with self._lock:
+            q = self._queries.get(query_id)
+            return bool(q and q.cancelled)
+
+    def cancel(self, query_id: str, database_id: Optional[str] = None) -> bool:
+        with self._lock:
+            q = self._queries.get(query_id)
+            if q is None or (database_id is not None and q.database_id != database_id):
+                return False
+            q.cancelled = True
+            cursor, on_cancel = q.cursor, q.on_cancel
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass    # statement already finished
+        if on_cancel is not None:
+            on_cancel()
+        return True
+
+    def list(self, database_id: Optional[str] = None) -> List[Dict[str, object]]:
+        with self._lock:
+            qs = list(self._queries.values())
+        return [q.describe() for q in qs if database_id is None or q.database_id == database_id]
+
+
+registry = QueryRegistry()
+
+
+async def run_until_disconnected(request: Request, fn: Callable[[], Awaitable[T]],
+                                 poll_interval: float = 0.5) -> Optional[T]:
+    """
+    Await fn() but cancel it if the HTTP client goes away; cancellation reaches
+    exec_query, which cancels the cursor. Returns None when the client disconnected.
+    """
+    work = asyncio.ensure_future(fn())
+    try:
+        while True:
+            done, _ = await asyncio.wait({work}, timeout=poll_interval)
+            if done:
+                return work.result()
+            if await request.is_disconnected():
+                work.cancel()
+                with suppress(asyncio.CancelledError):
+                    await work
+                return None
+    finally:
+        if not work.done():
+            work.cancel()
@@ -0,0 +1,159 @@
+# backend/sql/rewrite.py
+"""
+Small T-SQL lexer and the statement rewrites built on it.
+
+This is not a parser: it only knows enough (string literals, [bracketed] and
+"quoted" identifiers, comments, parenthesis depth) to find top-level keywords
+safely. Rewrites return None whenever a statement falls outside the shapes they
+understand, and callers fall back to a non-rewriting path.
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+_WORD_RE = re.compile(r"[A-Za-z_@#][A-Za-z0-9_@#$]*")
+_NUM_RE = re.compile(r"\d+(\.\d+)?")
+
+
+@dataclass
+class Token:
+    kind: str       # word | number | string | ident | punct
+    text: str
+    start: int
+    end: int
+    depth: int      # parenthesis depth the token sits at
+
+    @property
+    def upper(self) -> str:
+        return self.text.upper()
+
+
+def tokenize(sql: str) -> List[Token]:
+    out: List[Token] = []
+    i, n, depth = 0, len(sql), 0
+    while i < n:
+        ch = sql[i]
+        if ch.isspace():
+            i += 1
+        elif sql.startswith("--", i):
+            j = sql.find("\n", i)
+            i = n if j < 0 else j + 1
+        elif sql.startswith("/*", i):
+            j = sql.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+        elif ch == "'" or (ch in "Nn" and sql.startswith("'", i + 1)):
+            j = i + (2 if ch != "'" else 1)
+            while j < n:
+                if sql[j] == "'":
+                    if j + 1 < n and sql[j + 1] == "'":
+                        j += 2
+                        continue
+                    break
+                j += 1
+            out.append(Token("string", sql[i:j + 1], i, min(j + 1, n), depth))
+            i = j + 1
+        elif ch in '["':
+            close = "]" if ch == "[" else '"'
+            j = i + 1
+            while j < n:
+                if sql[j] == close:
+                    if j + 1 < n and sql[j + 1] == close:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            out.append(Token("ident", sql[i:j + 1], i, min(j + 1, n), depth))
+            i = j + 1
+        elif ch == "(":
+            out.append(Token("punct", ch, i, i + 1, depth))
+            depth += 1
+            i += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+            out.append(Token("punct", ch, i, i + 1, depth))
+            i += 1
+        else:
+            m = _WORD_RE.match(sql, i) or _NUM_RE.match(sql, i)
+            if m:
+                kind = "number" if m.group(0)[0].isdigit() else "word"
+                out.append(Token(kind, m.group(0), i, m.end(), depth))
+                i = m.end()
+            else:
+                out.append(Token("punct", ch, i, i + 1, depth))
+                i += 1
+    return out
+
+
+def strip_trailing_semicolons(sql: str) -> str:
+    return sql.strip().rstrip(";").rstrip()
+
+
+def main_select_index(tokens: List[Token]) -> Optional[int]:
+    """Index of the outermost SELECT of a single SELECT or WITH ... SELECT statement."""
+    top = [i for i, t in enumerate(tokens) if t.depth == 0]
+    if not top:
+        return None
+    first = tokens[top[0]].upper
+    if first == "SELECT":
+        return top[0]
+    if first == "WITH":
+        # CTE bodies are parenthesized, so the first depth-0 SELECT is the main one.
+        for i in top[1:]:
+            if tokens[i].upper == "SELECT":
+                return i
+    return None
+
+
+def is_single_statement(tokens: List[Token]) -> bool:
+    for i, t in enumerate(tokens):
+        if t.kind == "punct" and t.text == ";" and any(u.text != ";" for u in tokens[i + 1:]):
+            return False
+    return True
+
+
+_SET_OPERATORS = {"UNION", "INTERSECT", "EXCEPT"}
+
+
+def push_down_limit(sql: str, limit: int) -> Optional[str]:
+    """
+    Return `sql` with TOP (limit) injected into its outermost SELECT, or None if that is
+    not safe (set operators, OFFSET/FETCH, SELECT ... INTO, an existing TOP we can't tighten).
+    A statement that already has a literal TOP no larger than `limit` is returned unchanged.
+    """
+    sql = strip_trailing_semicolons(sql)
+    tokens = tokenize(sql)
+    if not is_single_statement(tokens):
+        return None
+    idx = main_select_index(tokens)
+    if idx is None:
+        return None
+    for t in tokens[idx:]:
+        if t.depth == 0 and t.kind == "word" and t.upper in _SET_OPERATORS | {"OFFSET", "INTO"}:
+            return None
+
+    pos = idx + 1
+    if pos < len(tokens) and tokens[pos].upper in ("ALL", "DISTINCT"):
+        pos += 1
+    if pos < len(tokens) and tokens[pos].upper == "TOP":
+        return _tighten_existing_top(sql, tokens, pos, limit)
+
+    insert_at = tokens[pos - 1].end
+    return f"{sql[:insert_at]} TOP ({int(limit)}){sql[insert_at:]}"
+
+
+def _tighten_existing_top(sql: str, tokens: List[Token], pos: int, limit: int) -> Optional[str]:
+    # TOP n | TOP (n), optionally followed by PERCENT / WITH TIES
+    j = pos + 1
+    paren = j < len(tokens) and tokens[j].text == "("
+    if paren:
+        j += 1
+    if j >= len(tokens) or tokens[j].kind != "number" or "." in tokens[j].text:
+        return None
+    if paren and (j + 1 >= len(tokens) or tokens[j + 1].text != ")"):
+        return None
+    after = j + (2 if paren else 1)
+    if after < len(tokens) and tokens[after].upper in ("PERCENT", "WITH"):
+        return None
+    if int(tokens[j].text) <= limit:
+        return sql
+    return f"{sql[:tokens[j].start]}{int(limit)}{sql[tokens[j].end:]}"
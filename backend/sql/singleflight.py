@@ -0,0 +1,76 @@
+# backend/sql/singleflight.py
+"""
+Single-flight coalescing of identical concurrent queries.
+
+The first caller for a key starts the execution as its own task; callers that
+arrive while it is running await the same task instead of opening another
+connection and scan. The execution is only cancelled once every caller waiting
+on it has gone away, so one client disconnecting doesn't fail the others.
+
+The execution belongs to none of its callers, so it runs in a fresh context:
+context variables of whoever happened to arrive first (fair-share session key,
+timing record) don't carry over to it. Anything that decides how the statement
+runs (guard, lane) has to be part of the key.
+"""
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+        self.abandoned = False
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run fn() once per key at a time. Returns (result, shared) - shared is True for joiners."""
+        flight = self._flights.get(key)
+        if flight is not None and flight.abandoned:
+            flight = None
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.get_running_loop().create_task(fn(), context=contextvars.Context()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._done(k, f))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        self.max_waiters = max(self.max_waiters, flight.waiters)
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.abandoned = True
+                flight.task.cancel()    # last one out cancels the statement
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _done(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception()     # retrieved here so an unawaited failure isn't logged as lost
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "max_waiters": self.max_waiters,
+        }
+
+
+singleflight = SingleFlight()
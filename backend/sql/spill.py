@@ -0,0 +1,239 @@
+# backend/sql/spill.py
+"""
+Row buffer with a hard memory ceiling.
+
+Rows are kept as tuples until they pass SQL_SPILL_THRESHOLD_BYTES (approximate);
+from then on everything lives in an Arrow IPC file under SQL_SPILL_DIR and pages
+and exports are read back through a memory map, so a buffer costs at most the
+threshold plus one batch of process memory however large the result is.
+
+A page goes straight to the batch holding its first row. Once the buffer is
+finished the file's footer indexes every batch and one reader serves all pages;
+while rows are still arriving there is no footer yet, so the byte offset of each
+written batch is recorded and the page's batches are read from there.
+
+Spilling needs pyarrow (in requirements.txt, or the "columnar" extra). Without it the
+buffer stays in memory; check_spill_support() warns about that at startup.
+"""
+import logging
+import os
+import tempfile
+import threading
+from bisect import bisect_right
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from settings import settings
+from sql.arrow import require_pyarrow, schema_from_description, record_batch, conform_batch
+from sql.odbc import _approx_row_bytes
+
+log = logging.getLogger(__name__)
+
+Row = Tuple[Any, ...]
+_SPILL_CHUNK_ROWS = 50000
+_ARROW_MAGIC = b"ARROW1\x00\x00"       # starts an IPC file (magic plus padding)
+
+
+class SpillBuffer:
+    """Append-only rows; append() from one writer, page()/iter_rows() from any thread."""
+
+    def __init__(self, description: Optional[Sequence[Tuple[Any, ...]]] = None,
+                 threshold_bytes: Optional[int] = None, directory: Optional[str] = None):
+        self.description = description
+        self.threshold_bytes = settings.sql_spill_threshold_bytes if threshold_bytes is None else threshold_bytes
+        self.directory = directory or settings.sql_spill_dir or None
+        self._lock = threading.Lock()
+        self._rows: List[Row] = []
+        self._mem_bytes = 0
+        self._row_count = 0
+        # spilled state
+        self.path: Optional[str] = None
+        self._sink = None
+        self._writer = None
+        self._schema = None
+        self._batch_starts: List[int] = []      # first row index of each batch written to disk
+        self._batch_ends: List[int] = []        # file offset just past each batch
+        self._map = None                        # memory map of the finished file and its footer reader
+        self._reader = None
+        self._warned = False
+        self._closed = False
+
+    @property
+    def row_count(self) -> int:
+        return self._row_count
+
+    @property
+    def spilled(self) -> bool:
+        return self.path is not None
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._mem_bytes
+
+    def append(self, rows: Sequence[Row]) -> None:
+        if not rows:
+            return
+        if self.spilled:
+            self._write(rows)
+            return
+        added = sum(_approx_row_bytes(r) for r in rows)
+        with self._lock:
+            self._rows.extend(tuple(r) for r in rows)
+            self._mem_bytes += added
+            self._row_count += len(rows)
+        if self.threshold_bytes and self._mem_bytes > self.threshold_bytes:
+            self._spill()
+
+    def _spill(self) -> None:
+        try:
+            pa = require_pyarrow()
+        except RuntimeError as e:
+            if not self._warned:
+                log.warning("Result passed the spill threshold but cannot spill: %s", e)
+                self._warned = True
+            return
+        fd, path = tempfile.mkstemp(prefix="sqlspill-", suffix=".arrow", dir=self.directory)
+        os.close(fd)
+        self._sink = pa.OSFile(path, "wb")
+        with self._lock:
+            rows = list(self._rows)
+        starts, ends, written = [], [], 0
+        for i in range(0, len(rows), _SPILL_CHUNK_ROWS):
+            starts.append(written)
+            written += self._write_batch(rows[i: i + _SPILL_CHUNK_ROWS])
+            ends.append(self._sink.tell())
+        # Readers switch to the file only once it holds everything that was in memory.
+        with self._lock:
+            self.path = path
+            self._batch_starts = starts
+            self._batch_ends = ends
+            self._row_count = written
+            self._rows = []
+            self._mem_bytes = 0
+
+    def _write(self, rows: Sequence[Row]) -> None:
+        written = self._write_batch(rows)
+        end = self._sink.tell()
+        with self._lock:
+            self._batch_starts.append(self._row_count)
+            self._batch_ends.append(end)
+            self._row_count += written
+
+    def _write_batch(self, rows: Sequence[Row]) -> int:
+        pa = require_pyarrow()
+        declared = schema_from_description(self.description or _guess_description(rows))
+        rb = record_batch(declared, rows)
+        if self._writer is None:
+            self._schema = rb.schema
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+        else:
+            rb = conform_batch(rb, self._schema)
+        self._writer.write_batch(rb)
+        self._sink.flush()
+        return rb.num_rows
+
+    def finish(self) -> None:
+        """No more rows; completes the spill file (writes its footer)."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        if self.path and self._map is None and not self._closed:
+            pa = require_pyarrow()
+            source = pa.memory_map(self.path, "r")
+            with self._lock:
+                self._map, self._reader = source, pa.ipc.open_file(source)
+
+    def page(self, offset: int, limit: int) -> List[Row]:
+        with self._lock:
+            if not self.spilled:
+                return self._rows[offset: offset + limit]
+            starts = list(self._batch_starts)
+            total = self._row_count
+        if offset >= total or limit <= 0:
+            return []
+        end = min(total, offset + limit)
+        first = bisect_right(starts, offset) - 1
+        out: List[Row] = []
+        for idx, rb in self._read_batches(first, len(starts)):
+            start = starts[idx]
+            lo, hi = max(offset - start, 0), min(end - start, rb.num_rows)
+            if lo < hi:
+                out.extend(_batch_rows(rb.slice(lo, hi - lo)))
+            if start + rb.num_rows >= end:
+                break
+        return out
+
+    def iter_rows(self, batch_rows: int = 10000) -> Iterator[List[Row]]:
+        """Every row, in chunks; reads spilled batches through the memory map."""
+        if not self.spilled:
+            with self._lock:
+                rows = list(self._rows)
+            for i in range(0, len(rows), batch_rows):
+                yield rows[i: i + batch_rows]
+            return
+        with self._lock:
+            n = len(self._batch_starts)
+        for _, rb in self._read_batches(0, n):
+            yield _batch_rows(rb)
+
+    def _read_batches(self, first: int, count: int) -> Iterator[Tuple[int, Any]]:
+        """Batches first..count-1; only `count` batches are known to be complete while the writer appends."""
+        with self._lock:
+            reader, ends = self._reader, list(self._batch_ends)
+        if reader is not None:
+            for idx in range(first, count):
+                yield idx, reader.get_batch(idx)
+            return
+        pa = require_pyarrow()
+        with pa.memory_map(self.path, "r") as src:
+            if first:
+                src.seek(ends[first - 1])
+            else:
+                src.seek(len(_ARROW_MAGIC))
+                pa.ipc.read_message(src)        # the schema message precedes the first batch
+            for idx in range(first, count):
+                yield idx, pa.ipc.read_record_batch(pa.ipc.read_message(src), self._schema)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.finish()
+        finally:
+            with self._lock:
+                self._rows = []
+                self._mem_bytes = 0
+                source, self._map, self._reader = self._map, None, None
+            if source is not None:
+                source.close()
+            if self.path:
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+
+
+def check_spill_support() -> bool:
+    """Called at startup: spilling is configured but can't happen without pyarrow."""
+    if not settings.sql_spill_threshold_bytes:
+        return True
+    try:
+        require_pyarrow()
+    except RuntimeError:
+        log.warning("SQL_SPILL_THRESHOLD_BYTES is set but pyarrow is not installed: large results will stay in "
+                    "memory, and Arrow, Parquet and federated requests will return 501. "
+                    "Install it with pip install -r requirements.txt (or the 'columnar' extra).")
+        return False
+    return True
+
+
+def _batch_rows(rb) -> List[Row]:
+    return list(zip(*(col.to_pylist() for col in rb.columns)))
+
+
+def _guess_description(rows: Sequence[Row]) -> List[Tuple[Any, ...]]:
+    first = rows[0]
+    return [(f"col{i}", type(v) if v is not None else str, None, None, None, None, True) for i, v in enumerate(first)]
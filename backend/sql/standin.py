@@ -0,0 +1,646 @@
+# backend/sql/standin.py
+"""
+In-process stand-in for Fabric / SQL Server (SQL_BACKEND=local).
+
+Connections are SQLite databases holding synthetic AdventureWorksLT-style data
+(SalesLT.Customer, Product, SalesOrderHeader, ...), built once into
+SQL_LOCAL_DB_PATH (a temp directory by default) and attached read-only to every
+connection. Each schema is an attached database, so [SalesLT].[Product] resolves
+as it does on the server, and INFORMATION_SCHEMA is a static copy of the
+catalog that the introspection queries read. Every server/database name serves
+the same data. No ODBC driver, network or AAD token is involved, but the pool,
+executor, registry, cache and metrics above the connection are the real ones.
+That makes the stand-in useful for benchmarks and offline work.
+
+Only enough T-SQL is translated for the statements this API issues and typical
+ad-hoc SELECTs: TOP (n) becomes LIMIT, OFFSET/FETCH becomes LIMIT/OFFSET, N'..'
+literals lose the N, and DB_NAME, GETDATE, LEN, ISNULL, DATETRUNC, YEAR, MONTH
+and DAY are provided as functions. SET SHOWPLAN_XML is refused, so the cost guard
+fails open. Values come back with the types pyodbc would produce: Decimal for
+money/decimal, datetime for datetime, bool for bit. Output converters
+(sql/converters.py) are called with the bytes the driver would hand them.
+
+Server behaviour is shaped by settings: login time (SQL_LOCAL_CONNECT_MS), per-
+statement round trip (SQL_LOCAL_LATENCY_MS +- SQL_LOCAL_JITTER_MS), fetch
+throughput (SQL_LOCAL_ROWS_PER_SECOND) and concurrently executing statements
+(SQL_LOCAL_MAX_CONCURRENCY). Errors are raised as pyodbc exceptions, so callers
+handle them exactly as they handle driver errors.
+"""
+import datetime as dt
+import decimal
+import os
+import random
+import re
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pyodbc
+
+from settings import settings
+from sql.metrics import phase
+from sql.odbc import ExecutionBackend
+from sql.rewrite import Token, tokenize
+
+DATABASE_NAME = "AdventureWorksLT"
+_INFO = "INFORMATION_SCHEMA"
+_BUILD_LOCK = threading.Lock()
+
+# (schema, table, [(column, T-SQL type, nullable)], primary key)
+TABLES: List[Tuple[str, str, List[Tuple[str, str, bool]], List[str]]] = [
+    ("SalesLT", "ProductCategory", [
+        ("ProductCategoryID", "int", False), ("ParentProductCategoryID", "int", True),
+        ("Name", "nvarchar(50)", False), ("rowguid", "uniqueidentifier", False), ("ModifiedDate", "datetime", False),
+    ], ["ProductCategoryID"]),
+    ("SalesLT", "Product", [
+        ("ProductID", "int", False), ("Name", "nvarchar(50)", False), ("ProductNumber", "nvarchar(25)", False),
+        ("Color", "nvarchar(15)", True), ("StandardCost", "money", False), ("ListPrice", "money", False),
+        ("Size", "nvarchar(5)", True), ("Weight", "decimal(8,2)", True), ("ProductCategoryID", "int", True),
+        ("SellStartDate", "datetime", False), ("DiscontinuedDate", "datetime", True),
+        ("rowguid", "uniqueidentifier", False), ("ModifiedDate", "datetime", False),
+    ], ["ProductID"]),
+    ("SalesLT", "Customer", [
+        ("CustomerID", "int", False), ("NameStyle", "bit", False), ("Title", "nvarchar(8)", True),
+        ("FirstName", "nvarchar(50)", False), ("LastName", "nvarchar(50)", False),
+        ("CompanyName", "nvarchar(128)", True), ("SalesPerson", "nvarchar(256)", True),
+        ("EmailAddress", "nvarchar(50)", True), ("Phone", "nvarchar(25)", True),
+        ("rowguid", "uniqueidentifier", False), ("ModifiedDate", "datetime", False),
+    ], ["CustomerID"]),
+    ("SalesLT", "Address", [
+        ("AddressID", "int", False), ("AddressLine1", "nvarchar(60)", False), ("City", "nvarchar(30)", False),
+        ("StateProvince", "nvarchar(50)", False), ("CountryRegion", "nvarchar(50)", False),
+        ("PostalCode", "nvarchar(15)", False), ("rowguid", "uniqueidentifier", False),
+        ("ModifiedDate", "datetime", False),
+    ], ["AddressID"]),
+    ("SalesLT", "CustomerAddress", [
+        ("CustomerID", "int", False), ("AddressID", "int", False), ("AddressType", "nvarchar(50)", False),
+        ("rowguid", "uniqueidentifier", False), ("ModifiedDate", "datetime", False),
+    ], ["CustomerID", "AddressID"]),
+    ("SalesLT", "SalesOrderHeader", [
+        ("SalesOrderID", "int", False), ("RevisionNumber", "tinyint", False), ("OrderDate", "datetime", False),
+        ("DueDate", "datetime", False), ("ShipDate", "datetime", True), ("Status", "tinyint", False),
+        ("OnlineOrderFlag", "bit", False), ("SalesOrderNumber", "nvarchar(25)", False),
+        ("CustomerID", "int", False), ("ShipToAddressID", "int", True), ("ShipMethod", "nvarchar(50)", False),
+        ("SubTotal", "money", False), ("TaxAmt", "money", False), ("Freight", "money", False),
+        ("TotalDue", "money", False), ("rowguid", "uniqueidentifier", False), ("ModifiedDate", "datetime", False),
+    ], ["SalesOrderID"]),
+    ("SalesLT", "SalesOrderDetail", [
+        ("SalesOrderID", "int", False), ("SalesOrderDetailID", "int", False), ("OrderQty", "smallint", False),
+        ("ProductID", "int", False), ("UnitPrice", "money", False), ("UnitPriceDiscount", "money", False),
+        ("LineTotal", "numeric(38,6)", False), ("rowguid", "uniqueidentifier", False),
+        ("ModifiedDate", "datetime", False),
+    ], ["SalesOrderID", "SalesOrderDetailID"]),
+]
+SCHEMAS = ("dbo", "SalesLT")
+
+_PY_TYPES = {
+    "int": int, "smallint": int, "tinyint": int, "bigint": int, "bit": bool,
+    "money": decimal.Decimal, "decimal": decimal.Decimal, "numeric": decimal.Decimal,
+    "datetime": dt.datetime,
+}
+
+
+def _parse_type(sql_type: str) -> Tuple[str, Optional[int], Optional[int], Optional[int]]:
+    """(DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE) as INFORMATION_SCHEMA reports them."""
+    m = re.match(r"(\w+)(?:\((\d+)(?:,(\d+))?\))?$", sql_type)
+    base, a, b = m.group(1), m.group(2), m.group(3)
+    if base in ("nvarchar", "varchar", "nchar", "char"):
+        return base, int(a), None, None
+    fixed = {"int": (10, 0), "smallint": (5, 0), "tinyint": (3, 0), "bigint": (19, 0), "money": (19, 4)}
+    if base in fixed:
+        return (base, None) + fixed[base]
+    if base in ("decimal", "numeric"):
+        return base, None, int(a or 18), int(b or 0)
+    return base, None, None, None
+
+
+# Column name -> (python type, precision, scale): describes columns whose first value is NULL.
+_COLUMN_TYPES: Dict[str, Tuple[type, Optional[int], Optional[int]]] = {}
+_GUID_COLUMNS = set()
+for _schema, _table, _cols, _pk in TABLES:
+    for _name, _type, _null in _cols:
+        _base, _, _prec, _scale = _parse_type(_type)
+        _COLUMN_TYPES.setdefault(_name.lower(), (_PY_TYPES.get(_base, str), _prec, _scale))
+        if _base == "uniqueidentifier":
+            _GUID_COLUMNS.add(_name.lower())
+
+
+# ---------- synthetic data ----------
+
+def _rows(table: str, scale: int, rng: random.Random) -> List[Tuple[Any, ...]]:
+    def guid() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4)).upper()
+
+    def when(start: dt.datetime, days: int) -> str:
+        return (start + dt.timedelta(days=rng.randrange(days), minutes=rng.randrange(1440))).isoformat(" ")
+
+    def money(lo: float, hi: float) -> str:
+        return str(decimal.Decimal(rng.uniform(lo, hi)).quantize(decimal.Decimal("0.0001")))
+
+    base = dt.datetime(2022, 1, 1)
+    first = ["Orlando", "Keith", "Donna", "Janet", "Lucy", "Rosmarie", "Dominic", "Kathleen", "Katherine", "Johnny",
+             "Christopher", "David", "John", "Jean", "Jinghao", "Linda", "Kerim", "Kevin", "Donald", "Jackie"]
+    last = ["Gee", "Harris", "Carreras", "Gates", "Harrington", "Carroll", "Gash", "Garza", "Harding", "Caprio",
+            "Beck", "Liu", "Beaver", "Handley", "Hanif", "Meisner", "Hanif", "Liu", "Blythe", "Blackwell"]
+    cities = [("Bothell", "Washington", "United States"), ("Toronto", "Ontario", "Canada"),
+              ("London", "England", "United Kingdom"), ("Dallas", "Texas", "United States"),
+              ("Montreal", "Quebec", "Canada"), ("Phoenix", "Arizona", "United States")]
+    n_products, n_customers, n_addresses, n_orders = 300 * scale, 850 * scale, 450 * scale, 2000 * scale
+
+    if table == "ProductCategory":
+        top = ["Bikes", "Components", "Clothing", "Accessories"]
+        subs = ["Mountain Bikes", "Road Bikes", "Touring Bikes", "Handlebars", "Bottom Brackets", "Brakes", "Chains",
+                "Cranksets", "Derailleurs", "Forks", "Headsets", "Mountain Frames", "Pedals", "Road Frames", "Saddles",
+                "Touring Frames", "Wheels", "Bib-Shorts", "Caps", "Gloves", "Jerseys", "Shorts", "Socks", "Tights",
+                "Vests", "Bike Racks", "Bike Stands", "Bottles and Cages", "Cleaners", "Fenders", "Helmets",
+                "Hydration Packs", "Lights", "Locks", "Panniers", "Pumps", "Tires and Tubes"]
+        rows = [(i + 1, None, name, guid(), when(base, 30)) for i, name in enumerate(top)]
+        rows += [(len(top) + i + 1, rng.randint(1, len(top)), name, guid(), when(base, 30))
+                 for i, name in enumerate(subs)]
+        return rows
+    if table == "Product":
+        rows = []
+        for i in range(n_products):
+            cost = decimal.Decimal(money(2, 2200))
+            weight = decimal.Decimal(rng.uniform(100, 1500)).quantize(decimal.Decimal("0.01"))
+            discontinued = when(base + dt.timedelta(days=700), 300) if rng.random() < 0.1 else None
+            rows.append((
+                680 + i, f"{rng.choice(['HL', 'ML', 'LL', 'Sport', 'Touring', 'Road'])} "
+                         f"{rng.choice(['Frame', 'Wheel', 'Jersey', 'Helmet', 'Pedal', 'Seat', 'Fork'])} {i}",
+                f"PR-{i:05d}", rng.choice(["Black", "Red", "Silver", "Blue", "Yellow", None]),
+                str(cost), str((cost * decimal.Decimal("1.6")).quantize(decimal.Decimal("0.0001"))),
+                rng.choice(["S", "M", "L", "XL", "44", "48", "52", None]),
+                str(weight) if rng.random() < 0.6 else None, rng.randint(5, 41), when(base, 365), discontinued,
+                guid(), when(base, 1000),
+            ))
+        return rows
+    if table == "Customer":
+        return [(
+            i + 1, False, rng.choice(["Mr.", "Ms.", "Sr.", "Sra.", None]), rng.choice(first), rng.choice(last),
+            f"{rng.choice(['A Bike', 'Progressive', 'Advanced', 'Metropolitan', 'Rural'])} "
+            f"{rng.choice(['Store', 'Sports', 'Cycles', 'Bike Works', 'Outlet'])} {i}",
+            f"adventure-works\\{rng.choice(['pamela0', 'david8', 'jillian0', 'garrett1', 'shu0'])}",
+            f"customer{i}@adventure-works.com", f"{rng.randint(100, 999)}-555-{rng.randint(0, 9999):04d}",
+            guid(), when(base, 1000),
+        ) for i in range(n_customers)]
+    if table == "Address":
+        return [(
+            i + 1, f"{rng.randint(1, 9999)} {rng.choice(['Main', 'Oak', 'Pine', 'Lake', 'Hill'])} St.",
+            *rng.choice(cities), f"{rng.randint(10000, 99999)}", guid(), when(base, 1000),
+        ) for i in range(n_addresses)]
+    if table == "CustomerAddress":
+        return [(c + 1, (c % n_addresses) + 1, rng.choice(["Main Office", "Shipping"]), guid(), when(base, 1000))
+                for c in range(n_customers) if rng.random() < 0.5]
+    if table == "SalesOrderHeader":
+        rows = []
+        for i in range(n_orders):
+            ordered = base + dt.timedelta(days=rng.randrange(1000))
+            sub = decimal.Decimal(money(10, 20000))
+            tax = (sub * decimal.Decimal("0.08")).quantize(decimal.Decimal("0.0001"))
+            freight = (sub * decimal.Decimal("0.025")).quantize(decimal.Decimal("0.0001"))
+            rows.append((
+                71774 + i, 2, ordered.isoformat(" "), (ordered + dt.timedelta(days=12)).isoformat(" "),
+                (ordered + dt.timedelta(days=7)).isoformat(" ") if rng.random() < 0.95 else None,
+                5, False, f"SO{71774 + i}", rng.randint(1, n_customers), rng.randint(1, n_addresses),
+                rng.choice(["CARGO TRANSPORT 5", "OVERNIGHT J-FAST", "ZY - EXPRESS"]),
+                str(sub), str(tax), str(freight), str(sub + tax + freight), guid(), ordered.isoformat(" "),
+            ))
+        return rows
+    if table == "SalesOrderDetail":
+        rows = []
+        detail_id = 110562
+        for i in range(n_orders):
+            for _ in range(rng.randint(1, 8)):
+                qty = rng.randint(1, 20)
+                price = decimal.Decimal(money(2, 2400))
+                discount = rng.choice([decimal.Decimal("0"), decimal.Decimal("0.02"), decimal.Decimal("0.05")])
+                line = (qty * price * (1 - discount)).quantize(decimal.Decimal("0.000001"))
+                rows.append((71774 + i, detail_id, qty, 680 + rng.randrange(n_products), str(price), str(discount),
+                             str(line), guid(), when(base, 1000)))
+                detail_id += 1
+        return rows
+    raise KeyError(table)
+
+
+def _info_rows() -> Dict[str, List[Tuple[Any, ...]]]:
+    out: Dict[str, List[Tuple[Any, ...]]] = {
+        "SCHEMATA": [(DATABASE_NAME, s, "dbo") for s in SCHEMAS],
+        "TABLES": [], "COLUMNS": [], "TABLE_CONSTRAINTS": [], "KEY_COLUMN_USAGE": [],
+    }
+    for schema, table, cols, pk in TABLES:
+        out["TABLES"].append((DATABASE_NAME, schema, table, "BASE TABLE"))
+        for pos, (name, sql_type, nullable) in enumerate(cols, 1):
+            data_type, max_len, prec, scale = _parse_type(sql_type)
+            out["COLUMNS"].append((DATABASE_NAME, schema, table, name, pos, None, "YES" if nullable else "NO",
+                                   data_type, max_len, prec, scale))
+        constraint = f"PK_{table}"
+        out["TABLE_CONSTRAINTS"].append((constraint, schema, table, "PRIMARY KEY"))
+        out["KEY_COLUMN_USAGE"] += [(constraint, schema, table, c, pos) for pos, c in enumerate(pk, 1)]
+    return out
+
+
+_INFO_DDL = {
+    "SCHEMATA": "CATALOG_NAME, SCHEMA_NAME, SCHEMA_OWNER",
+    "TABLES": "TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, TABLE_TYPE",
+    "COLUMNS": "TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION int, COLUMN_DEFAULT, "
+               "IS_NULLABLE, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH int, NUMERIC_PRECISION int, NUMERIC_SCALE int",
+    "TABLE_CONSTRAINTS": "CONSTRAINT_NAME, TABLE_SCHEMA, TABLE_NAME, CONSTRAINT_TYPE",
+    "KEY_COLUMN_USAGE": "CONSTRAINT_NAME, TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION int",
+}
+
+
+def _write(path: str, statements: Sequence[Tuple[str, List[Tuple[Any, ...]]]]) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        for ddl, rows in statements:
+            db.execute(ddl)
+            if rows:
+                db.executemany(f"INSERT INTO {ddl.split()[2]} VALUES ({', '.join('?' * len(rows[0]))})", rows)
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp, path)       # concurrent builders write identical files; last one wins
+
+
+def build_dataset(directory: str, scale: int = 1, seed: int = 7) -> Dict[str, str]:
+    """Create the schema databases in `directory` unless present; returns {schema: file}."""
+    files = {name: os.path.join(directory, f"{name}.sqlite") for name in ("SalesLT", _INFO)}
+    with _BUILD_LOCK:
+        if all(os.path.exists(f) for f in files.values()):
+            return files
+        os.makedirs(directory, exist_ok=True)
+        rng = random.Random(seed)
+        tables = []
+        for schema, table, cols, pk in TABLES:
+            col_ddl = ", ".join(f"[{n}] {t}{'' if null else ' NOT NULL'}" for n, t, null in cols)
+            ddl = f"CREATE TABLE [{table}] ({col_ddl}, PRIMARY KEY ({', '.join(f'[{c}]' for c in pk)}))"
+            tables.append((ddl, _rows(table, scale, rng)))
+        _write(files["SalesLT"], tables)
+        info = _info_rows()
+        _write(files[_INFO], [(f"CREATE TABLE [{t}] ({_INFO_DDL[t]})", info[t]) for t in _INFO_DDL])
+    return files
+
+
+# ---------- T-SQL -> SQLite ----------
+
+def _scope_end(tokens: List[Token], i: int, sql: str) -> int:
+    """Offset just past the SELECT at tokens[i]: its closing parenthesis, or the end of the statement."""
+    depth = tokens[i].depth
+    for t in tokens[i + 1:]:
+        if t.depth < depth or (t.depth == depth and t.text == ";"):
+            return t.start
+    return len(sql.rstrip().rstrip(";").rstrip())
+
+
+def to_sqlite(sql: str) -> str:
+    tokens = tokenize(sql)
+    edits: List[Tuple[int, int, str]] = []      # (start, end, replacement)
+    for i, t in enumerate(tokens):
+        if t.kind == "string" and t.text[0] in "Nn":
+            edits.append((t.start, t.start + 1, ""))
+        elif (t.upper == "DATETRUNC" and i + 2 < len(tokens) and tokens[i + 1].text == "("
+              and tokens[i + 2].kind == "word"):
+            grain = tokens[i + 2]
+            edits.append((grain.start, grain.end, f"'{grain.text.lower()}'"))
+        elif t.upper == "SELECT":
+            j = i + 1
+            if j < len(tokens) and tokens[j].upper in ("ALL", "DISTINCT"):
+                j += 1
+            if j >= len(tokens) or tokens[j].upper != "TOP":
+                continue
+            paren = j + 1 < len(tokens) and tokens[j + 1].text == "("
+            k = j + 2 if paren else j + 1
+            if k >= len(tokens) or tokens[k].kind != "number":
+                continue                # TOP (@n), TOP (?), TOP n PERCENT: left for SQLite to reject
+            if paren and (k + 1 >= len(tokens) or tokens[k + 1].text != ")"):
+                continue
+            edits.append((tokens[j].start, tokens[k + 1 if paren else k].end, ""))
+            end = _scope_end(tokens, i, sql)
+            edits.append((end, end, f" LIMIT {tokens[k].text}"))
+        elif (t.upper == "OFFSET" and i + 2 < len(tokens) and tokens[i + 1].kind == "number"
+              and tokens[i + 2].upper in ("ROW", "ROWS")):
+            offset, end, limit = tokens[i + 1].text, tokens[i + 2].end, "-1"
+            k = i + 3
+            if (k + 4 < len(tokens) and tokens[k].upper == "FETCH" and tokens[k + 2].kind == "number"
+                    and tokens[k + 4].upper == "ONLY"):
+                limit, end = tokens[k + 2].text, tokens[k + 4].end
+            edits.append((t.start, end, f"LIMIT {limit} OFFSET {offset}"))
+    for start, end, text in sorted(edits, key=lambda e: (e[0], e[1]), reverse=True):
+        sql = sql[:start] + text + sql[end:]
+    return sql
+
+
+# ---------- DB-API objects ----------
+
+def _to_decimal(raw: bytes) -> decimal.Decimal:
+    return decimal.Decimal(raw.decode())
+
+
+def _to_datetime(raw: bytes) -> dt.datetime:
+    return dt.datetime.fromisoformat(raw.decode())
+
+
+# Only connections opened with detect_types use these.
+for _name in ("money", "decimal", "numeric"):
+    sqlite3.register_converter(_name, _to_decimal)
+sqlite3.register_converter("datetime", _to_datetime)
+sqlite3.register_converter("bit", lambda raw: raw not in (b"0", b""))
+
+
+def _numeric_struct(v: decimal.Decimal) -> bytes:
+    sign, digits, exp = v.as_tuple()
+    mag = int("".join(map(str, digits)) or "0") * 10 ** max(exp, 0)
+    return struct.pack("<BbB", 38, max(-exp, 0), 0 if sign else 1) + mag.to_bytes(16, "little")
+
+
+def _timestamp_struct(v: dt.datetime) -> bytes:
+    return struct.pack("<6hI", v.year, v.month, v.day, v.hour, v.minute, v.second, v.microsecond * 1000)
+
+
+def _guid_struct(v: str) -> bytes:
+    return uuid.UUID(v).bytes_le
+
+
+def _driver_bytes(name: str, type_code: type) -> Optional[Tuple[int, Callable[[Any], bytes]]]:
+    """(SQL type, value -> driver bytes) for columns pyodbc would pass to an output converter."""
+    if type_code is decimal.Decimal:
+        return pyodbc.SQL_DECIMAL, _numeric_struct
+    if type_code is dt.datetime:
+        return pyodbc.SQL_TYPE_TIMESTAMP, _timestamp_struct
+    if (name or "").lower() in _GUID_COLUMNS:
+        return pyodbc.SQL_GUID, _guid_struct
+    return None
+
+
+def _param(v: Any) -> Any:
+    if isinstance(v, decimal.Decimal):
+        return str(v)
+    if isinstance(v, (dt.datetime, dt.date, dt.time)):
+        return v.isoformat(" ") if isinstance(v, dt.datetime) else v.isoformat()
+    if isinstance(v, uuid.UUID):
+        return str(v).upper()
+    return v
+
+
+def _datetrunc(grain: str, value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    d = dt.datetime.fromisoformat(str(value))
+    if grain in ("year", "quarter", "month"):
+        month = 1 if grain == "year" else (d.month - 1) // 3 * 3 + 1 if grain == "quarter" else d.month
+        d = d.replace(month=month, day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif grain == "week":
+        d = (d - dt.timedelta(days=(d.weekday() + 1) % 7)).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif grain == "day":
+        d = d.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif grain == "hour":
+        d = d.replace(minute=0, second=0, microsecond=0)
+    elif grain == "minute":
+        d = d.replace(second=0, microsecond=0)
+    return d.isoformat(" ")
+
+
+def _date_part(attr: str):
+    return lambda v: getattr(dt.datetime.fromisoformat(str(v)), attr) if v is not None else None
+
+
+def _error(e: sqlite3.Error) -> pyodbc.Error:
+    if "interrupted" in str(e):
+        return pyodbc.OperationalError("HY008", f"[HY008] Operation canceled ({e})")
+    return pyodbc.ProgrammingError("42000", f"[42000] {e}")
+
+
+class LocalCursor:
+    def __init__(self, conn: "LocalConnection"):
+        self._conn = conn
+        self._cur = conn._db.cursor()
+        self._peek: Optional[Tuple[Any, ...]] = None
+        self._peeked = False
+        self.description: Optional[Tuple[Tuple[Any, ...], ...]] = None
+        self.rowcount = -1
+        self._convert: Optional[List[Optional[Callable[[Any], Any]]]] = None
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> "LocalCursor":
+        conn, backend = self._conn, self._conn._backend
+        conn._cancelled.clear()
+        self.description, self._peek, self._peeked, self._convert = None, None, False, None
+        stripped = sql.strip()
+        head = stripped.split(None, 1)[0].upper() if stripped else ""
+        if head == "USE":
+            name, _, rest = stripped[3:].partition(";")
+            conn.database = name.strip().strip("[]")
+            if not rest.strip():
+                return self
+            sql = rest
+        elif head == "SET":
+            if "SHOWPLAN" in stripped.upper():
+                raise pyodbc.ProgrammingError("42000", "[42000] SHOWPLAN is not supported by the local stand-in")
+            return self         # session options are accepted and ignored
+        with backend.statement_slot(conn._cancelled):
+            backend.wait(backend.latency(), conn._cancelled)
+            try:
+                self._cur.execute(to_sqlite(sql), tuple(_param(p) for p in params))
+                if self._cur.description:
+                    self._peek, self._peeked = self._cur.fetchone(), True
+            except sqlite3.Error as e:
+                raise _error(e) from e
+        if self._cur.description:
+            self.description = tuple(self._describe(i, d[0]) for i, d in enumerate(self._cur.description))
+            self._convert = self._converters()
+        return self
+
+    def _converters(self) -> Optional[List[Optional[Callable[[Any], Any]]]]:
+        registered = self._conn._output_converters
+        if not registered:
+            return None
+        fns: List[Optional[Callable[[Any], Any]]] = []
+        for d in self.description:
+            native = _driver_bytes(d[0], d[1])
+            fn = registered.get(native[0]) if native else None
+            fns.append((lambda v, fn=fn, to_bytes=native[1]: fn(None if v is None else to_bytes(v))) if fn else None)
+        return fns if any(fns) else None
+
+    def _describe(self, i: int, name: str) -> Tuple[Any, ...]:
+        value = self._peek[i] if self._peek is not None else None
+        known = _COLUMN_TYPES.get((name or "").lower())
+        if value is None:
+            type_code, precision, scale = known or (str, None, None)
+        else:
+            type_code = type(value)
+            precision, scale = known[1:] if known and known[0] is type_code else (None, None)
+        return (name, type_code, None, None, precision, scale, True)
+
+    def _take(self, n: Optional[int]) -> List[Tuple[Any, ...]]:
+        if self.description is None:
+            raise pyodbc.ProgrammingError("24000", "[24000] No results. Previous SQL was not a query.")
+        rows: List[Tuple[Any, ...]] = []
+        if self._peeked:
+            self._peeked = False
+            if self._peek is None:
+                return rows
+            rows.append(self._peek)
+        try:
+            if n is None:
+                rows.extend(self._cur.fetchall())
+            elif len(rows) < n:
+                rows.extend(self._cur.fetchmany(n - len(rows)))
+        except sqlite3.Error as e:
+            raise _error(e) from e
+        if self._convert and rows:
+            fns = self._convert
+            rows = [tuple(f(v) if f else v for f, v in zip(fns, r)) for r in rows]
+        backend = self._conn._backend
+        if rows and backend.rows_per_second:
+            backend.wait(len(rows) / backend.rows_per_second, self._conn._cancelled)
+        return rows
+
+    def fetchone(self) -> Optional[Tuple[Any, ...]]:
+        rows = self._take(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size: int = 1) -> List[Tuple[Any, ...]]:
+        return self._take(size)
+
+    def fetchall(self) -> List[Tuple[Any, ...]]:
+        return self._take(None)
+
+    def nextset(self) -> bool:
+        return False
+
+    def cancel(self) -> None:
+        self._conn._cancelled.set()
+        self._conn._db.interrupt()
+
+    def close(self) -> None:
+        self._cur.close()
+
+
+class LocalConnection:
+    def __init__(self, backend: "LocalBackend", files: Dict[str, str], database: str):
+        self._backend = backend
+        self._cancelled = threading.Event()
+        self.database = database
+        self.timeout = 0
+        self._output_converters: Dict[int, Callable[[Optional[bytes]], Any]] = {}
+        self._db = sqlite3.connect("file::memory:", uri=True, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False, isolation_level=None)
+        for schema, path in files.items():
+            self._db.execute("ATTACH DATABASE ? AS [%s]" % schema, (f"file:{path}?mode=ro",))
+        self._db.execute("ATTACH DATABASE ':memory:' AS [dbo]")
+        fns = {
+            ("DB_NAME", 0): lambda: self.database,
+            ("GETDATE", 0): lambda: dt.datetime.now().isoformat(" "),
+            ("SYSDATETIME", 0): lambda: dt.datetime.now().isoformat(" "),
+            ("NEWID", 0): lambda: str(uuid.uuid4()).upper(),
+            ("LEN", 1): lambda v: len(str(v).rstrip()) if v is not None else None,
+            ("ISNULL", 2): lambda v, d: d if v is None else v,
+            ("DATETRUNC", 2): _datetrunc,
+            ("YEAR", 1): _date_part("year"),
+            ("MONTH", 1): _date_part("month"),
+            ("DAY", 1): _date_part("day"),
+        }
+        for (name, nargs), fn in fns.items():
+            self._db.create_function(name, nargs, fn, deterministic=name not in ("GETDATE", "SYSDATETIME", "NEWID"))
+
+    def cursor(self) -> LocalCursor:
+        return LocalCursor(self)
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> LocalCursor:
+        return self.cursor().execute(sql, params)
+
+    def set_attr(self, attr: int, value: Any) -> None:
+        pass
+
+    def add_output_converter(self, sql_type: int, fn: Callable[[Optional[bytes]], Any]) -> None:
+        self._output_converters[sql_type] = fn
+
+    def clear_output_converters(self) -> None:
+        self._output_converters.clear()
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self._db.close()
+
+
+@dataclass
+class LocalBackend(ExecutionBackend):
+    directory: str
+    scale: int = 1
+    connect_ms: float = 0.0
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rows_per_second: float = 0.0
+    max_concurrency: int = 0
+
+    name = "local"
+
+    def __post_init__(self):
+        self._files: Optional[Dict[str, str]] = None
+        self._statements = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency > 0 else None
+
+    @classmethod
+    def from_settings(cls) -> "LocalBackend":
+        directory = settings.sql_local_db_path or os.path.join(
+            tempfile.gettempdir(), f"fabric-explorer-standin-x{settings.sql_local_scale}")
+        return cls(
+            directory=directory,
+            scale=settings.sql_local_scale,
+            connect_ms=settings.sql_local_connect_ms,
+            latency_ms=settings.sql_local_latency_ms,
+            jitter_ms=settings.sql_local_jitter_ms,
+            rows_per_second=settings.sql_local_rows_per_second,
+            max_concurrency=settings.sql_local_max_concurrency,
+        )
+
+    def driver(self) -> str:
+        return f"local stand-in (SQLite {sqlite3.sqlite_version})"
+
+    def connect(self, server: str, database: str, port: int) -> Tuple[LocalConnection, float]:
+        if self._files is None:
+            self._files = build_dataset(self.directory, self.scale)
+        with phase("connect"):
+            time.sleep(self.connect_ms / 1000)
+            conn = LocalConnection(self, self._files, database)
+        return conn, time.time() + 3600        # like an AAD token: the pool recycles before it "expires"
+
+    def latency(self) -> float:
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    @staticmethod
+    def wait(seconds: float, cancelled: threading.Event) -> None:
+        if seconds > 0 and cancelled.wait(seconds):
+            raise pyodbc.OperationalError("HY008", "[HY008] Operation canceled")
+
+    def statement_slot(self, cancelled: threading.Event):
+        return _StatementSlot(self._statements, cancelled)
+
+
+class _StatementSlot:
+    """Holds one of the backend's concurrent-statement slots; waiting is interrupted by cancel()."""
+
+    def __init__(self, sem: Optional[threading.BoundedSemaphore], cancelled: threading.Event):
+        self._sem, self._cancelled = sem, cancelled
+
+    def __enter__(self) -> None:
+        if self._sem is None:
+            return
+        while not self._sem.acquire(timeout=0.05):
+            if self._cancelled.is_set():
+                raise pyodbc.OperationalError("HY008", "[HY008] Operation canceled")
+
+    def __exit__(self, *exc) -> None:
+        if self._sem is not None:
+            self._sem.release()
@@ -0,0 +1,83 @@
+# backend/tests/test_converters.py
+import struct
+import uuid
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("pyodbc", exc_type=ImportError)     # also skips when the ODBC driver manager is missing
+
+from sql.converters import _decimal_exact, _decimal_fast, _guid_str, _timestamp_iso
+
+
+def numeric_struct(value: str, precision: int = 38) -> bytes:
+    """SQL_NUMERIC_STRUCT for a decimal literal, as the driver hands it to an output converter."""
+    d = Decimal(value)
+    sign, digits, exp = d.as_tuple()
+    scale = -exp if exp < 0 else 0
+    mag = int("".join(map(str, digits))) * (10 ** exp if exp > 0 else 1)
+    return bytes([precision, scale, 0 if sign else 1]) + mag.to_bytes(16, "little")
+
+
+def money(value: str) -> bytes:
+    units = int(Decimal(value) * 10000)
+    return struct.pack("<iI", units >> 32, units & 0xFFFFFFFF)
+
+
+def smallmoney(value: str) -> bytes:
+    return struct.pack("<i", int(Decimal(value) * 10000))
+
+
+DECIMALS = [
+    # raw, fast, exact
+    (numeric_struct("1234.5600"), 1234.56, "1234.5600"),
+    (numeric_struct("-1234.5600"), -1234.56, "-1234.5600"),
+    (numeric_struct("0.0500"), 0.05, "0.0500"),
+    (numeric_struct("-0.0500"), -0.05, "-0.0500"),
+    (numeric_struct("42"), 42, "42"),
+    (numeric_struct("-42"), -42, "-42"),
+    (numeric_struct("0"), 0, "0"),
+    (numeric_struct("99999999999999999999999999999999999999"),
+     99999999999999999999999999999999999999, "99999999999999999999999999999999999999"),
+    (numeric_struct("-9999999999999999999999999999.9999999999"),
+     -9999999999999999999999999999.9999999999, "-9999999999999999999999999999.9999999999"),
+    (numeric_struct("0.00000000000000000000000000000000000001"), 1e-38, "0.00000000000000000000000000000000000001"),
+    (money("922337203685477.5807"), 922337203685477.5807, "922337203685477.5807"),
+    (money("-922337203685477.5808"), -922337203685477.5808, "-922337203685477.5808"),
+    (money("-1.2500"), -1.25, "-1.2500"),
+    (money("0"), 0.0, "0.0000"),
+    (smallmoney("214748.3647"), 214748.3647, "214748.3647"),
+    (smallmoney("-214748.3648"), -214748.3648, "-214748.3648"),
+    (smallmoney("-0.0001"), -0.0001, "-0.0001"),
+    (b"-12.340", -12.34, "-12.340"),
+    (b"7", 7, "7"),
+    (None, None, None),
+]
+
+
+@pytest.mark.parametrize("raw, fast, exact", DECIMALS)
+def test_decimal_converters(raw, fast, exact):
+    assert _decimal_fast(raw) == fast
+    assert type(_decimal_fast(raw)) is type(fast)
+    assert _decimal_exact(raw) == exact
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (struct.pack("<6hI", 2024, 2, 29, 23, 59, 58, 123456000), "2024-02-29T23:59:58.123456"),
+    (struct.pack("<6hI", 1, 1, 1, 0, 0, 0, 0), "0001-01-01T00:00:00"),
+    (struct.pack("<6hI", 2024, 1, 2, 3, 4, 5, 999), "2024-01-02T03:04:05"),   # sub-microsecond only
+    (None, None),
+])
+def test_timestamp_iso(raw, expected):
+    assert _timestamp_iso(raw) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "00112233-4455-6677-8899-AABBCCDDEEFF",
+    "6F9619FF-8B86-D011-B42D-00C04FC964FF",
+    "00000000-0000-0000-0000-000000000000",
+])
+def test_guid_byte_order(text):
+    # SQLGUID stores Data1-3 little-endian, which is what uuid's bytes_le is
+    assert _guid_str(uuid.UUID(text).bytes_le) == text
+    assert _guid_str(None) is None
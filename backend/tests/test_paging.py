@@ -0,0 +1,81 @@
+# backend/tests/test_paging.py
+import datetime as dt
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from sql.paging import PagingError, SortKey, analyze, decode_token, encode_token, page_sql, sort_key
+
+A, B = "[_page].[a]", "[_page].[b]"
+
+
+@pytest.mark.parametrize("keys, after, where, params", [
+    # ascending: NULLs sort first, so after NULL comes every non-NULL value
+    ([SortKey("a")], [5], f"(({A} > ?))", [5]),
+    ([SortKey("a")], [None], f"(({A} IS NOT NULL))", []),
+    # descending: NULLs sort last, so they follow every value and nothing follows them
+    ([SortKey("a", True)], [5], f"((({A} < ? OR {A} IS NULL)))", [5]),
+    ([SortKey("a", True)], [None], "1 = 0", []),
+    # compound keys: ties on a leading NULL compare with IS NULL, not = NULL
+    ([SortKey("a"), SortKey("b")], [1, 2], f"(({A} > ?) OR ({A} = ? AND {B} > ?))", [1, 1, 2]),
+    ([SortKey("a"), SortKey("b")], [None, 2], f"(({A} IS NOT NULL) OR ({A} IS NULL AND {B} > ?))", [2]),
+    ([SortKey("a"), SortKey("b", True)], [1, None], f"(({A} > ?))", [1]),
+    ([SortKey("a", True), SortKey("b")], [None, None], f"(({A} IS NULL AND {B} IS NOT NULL))", []),
+])
+def test_page_sql_null_ordering(keys, after, where, params):
+    stmt = analyze("SELECT a, b FROM dbo.t ORDER BY a")
+    sql, got = page_sql(stmt, keys, after, 50)
+    order = ", ".join(f"[_page].[{k.column}] {'DESC' if k.desc else 'ASC'}" for k in keys)
+    assert sql == f"SELECT TOP (51) * FROM (SELECT a, b FROM dbo.t) AS [_page] WHERE {where} ORDER BY {order}"
+    assert got == params
+    assert sql.count("?") == len(got)
+
+
+def test_page_sql_first_page_keeps_cte_prefix():
+    stmt = analyze("WITH x AS (SELECT id FROM dbo.t) SELECT id FROM x ORDER BY id DESC;")
+    sql, params = page_sql(stmt, [SortKey("id", True)], None, 10)
+    assert sql == "WITH x AS (SELECT id FROM dbo.t) SELECT TOP (11) * FROM (SELECT id FROM x) AS [_page] ORDER BY [_page].[id] DESC"
+    assert params == []
+
+
+@pytest.mark.parametrize("sql, primary_key, unique, expected", [
+    ("SELECT * FROM dbo.t", ["id"], False, [SortKey("id")]),
+    ("SELECT name, id FROM dbo.t ORDER BY name DESC", ["id"], False, [SortKey("name", True), SortKey("id")]),
+    ("SELECT a.x FROM a JOIN b ON a.id = b.id ORDER BY a.x", [], True, [SortKey("x")]),
+])
+def test_sort_key(sql, primary_key, unique, expected):
+    assert sort_key(analyze(sql), primary_key, unique) == expected
+
+
+@pytest.mark.parametrize("sql, primary_key, unique", [
+    ("SELECT a.x FROM a JOIN b ON a.id = b.id ORDER BY a.x", [], False),     # uniqueness unknown
+    ("SELECT a.x FROM a JOIN b ON a.id = b.id", [], True),                   # no key at all
+    ("SELECT name FROM dbo.t ORDER BY name", ["id"], False),                  # key column not selected
+])
+def test_sort_key_refusals(sql, primary_key, unique):
+    with pytest.raises(PagingError):
+        sort_key(analyze(sql), primary_key, unique)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT a FROM t ORDER BY a OFFSET 10 ROWS",
+    "SELECT a FROM t ORDER BY LEN(a)",
+    "SELECT a FROM t ORDER BY 1",
+    "SELECT a FROM t; SELECT b FROM t",
+    "UPDATE t SET a = 1",
+])
+def test_analyze_refusals(sql):
+    with pytest.raises(PagingError):
+        analyze(sql)
+
+
+@pytest.mark.parametrize("value", [
+    None, 0, -1.5, "x", Decimal("-0.0100"), dt.datetime(2024, 1, 2, 3, 4, 5, 6), dt.date(2024, 1, 2),
+    uuid.UUID("6F9619FF-8B86-D011-B42D-00C04FC964FF"), b"\x00\xff",
+])
+def test_token_round_trip(value):
+    token = encode_token("fp", [value, 1])
+    assert decode_token(token, "fp", 2) == [value, 1]
+    with pytest.raises(PagingError):
+        decode_token(token, "other", 2)
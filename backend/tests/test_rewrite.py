@@ -0,0 +1,44 @@
+# backend/tests/test_rewrite.py
+import pytest
+
+from sql.rewrite import push_down_limit
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT a FROM t", "SELECT TOP (100) a FROM t"),
+    ("select a from t;", "select TOP (100) a from t"),
+    ("SELECT DISTINCT a FROM t", "SELECT DISTINCT TOP (100) a FROM t"),
+    ("SELECT ALL a FROM t", "SELECT ALL TOP (100) a FROM t"),
+    ("WITH x AS (SELECT TOP 5000 a FROM t) SELECT a FROM x",
+     "WITH x AS (SELECT TOP 5000 a FROM t) SELECT TOP (100) a FROM x"),
+    ("SELECT a FROM t WHERE b IN (SELECT b FROM u UNION SELECT b FROM v)",
+     "SELECT TOP (100) a FROM t WHERE b IN (SELECT b FROM u UNION SELECT b FROM v)"),
+    ("SELECT a FROM t ORDER BY a", "SELECT TOP (100) a FROM t ORDER BY a"),
+    # an existing literal TOP is tightened, or kept when it is already small enough
+    ("SELECT TOP 5000 a FROM t", "SELECT TOP 100 a FROM t"),
+    ("SELECT TOP (5000) a FROM t", "SELECT TOP (100) a FROM t"),
+    ("SELECT DISTINCT TOP (5000) a FROM t", "SELECT DISTINCT TOP (100) a FROM t"),
+    ("SELECT TOP 10 a FROM t", "SELECT TOP 10 a FROM t"),
+    ("SELECT TOP (100) a FROM t", "SELECT TOP (100) a FROM t"),
+])
+def test_push_down_limit_injects_top(sql, expected):
+    assert push_down_limit(sql, 100) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT a FROM t UNION SELECT a FROM u",
+    "SELECT a FROM t INTERSECT SELECT a FROM u",
+    "SELECT a FROM t EXCEPT SELECT a FROM u",
+    "SELECT a FROM t ORDER BY a OFFSET 0 ROWS FETCH NEXT 10 ROWS ONLY",
+    "SELECT a INTO #tmp FROM t",
+    "SELECT TOP 10 PERCENT a FROM t",
+    "SELECT TOP (5000) WITH TIES a FROM t ORDER BY a",
+    "SELECT TOP (@n) a FROM t",
+    "SELECT TOP (1.5) a FROM t",
+    "SELECT a FROM t; SELECT b FROM u",
+    "UPDATE t SET a = 1",
+    "EXEC sp_who",
+    "",
+])
+def test_push_down_limit_refuses(sql):
+    assert push_down_limit(sql, 100) is None